@@ -1,24 +1,17 @@
 import asyncio
-import os
 from logging.config import fileConfig
 
 from alembic import context
-from dotenv import load_dotenv
 from sqlalchemy import pool
 from sqlalchemy.engine import Connection
 from sqlalchemy.ext.asyncio import async_engine_from_config
 from app.metadata import metadata
+from app.container import asyncpg_connect_args
+from app.settings import settings
 
-# Загрузить переменные окружения из .env файла
-load_dotenv()
-
-# Получить DB_URI из переменной окружения
-db_uri = os.getenv("DB_URI")
-if db_uri is None:
-    raise ValueError("Переменная окружения DB_URI не установлена.")
-
-# Установить sqlalchemy.url для Alembic
-context.config.set_main_option('sqlalchemy.url', db_uri)
+# Установить sqlalchemy.url для Alembic (DB_URI из окружения или .env, без него Settings не создастся).
+# DB_DIRECT_URI - подключение мимо PgBouncer: CREATE INDEX CONCURRENTLY и DDL не идут через пул транзакций
+context.config.set_main_option('sqlalchemy.url', settings.db_direct_uri or settings.db_uri)
 
 # Настройка логирования
 if context.config.config_file_name is not None:
@@ -55,6 +48,7 @@ async def run_async_migrations() -> None:
         context.config.get_section(context.config.config_ini_section, {}),
         prefix="sqlalchemy.",
         poolclass=pool.NullPool,
+        connect_args=asyncpg_connect_args(),
     )
 
     async with connectable.connect() as connection:
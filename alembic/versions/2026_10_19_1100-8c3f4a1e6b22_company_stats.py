@@ -0,0 +1,112 @@
+"""Company stats aggregate table
+
+Revision ID: 8c3f4a1e6b22
+Revises: 5b1e2c7d9a10
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8c3f4a1e6b22"
+down_revision: Union[str, None] = "5b1e2c7d9a10"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Прибавляет к агрегатам дельты по компаниям из подзапроса deltas(company_id, d, a)
+UPSERT_DELTAS = """
+        INSERT INTO company_stats
+            (company_id, employee_count, active_count, change_timestamp)
+        SELECT company_id, sum(d), sum(a), now()
+        FROM ({deltas}) AS deltas
+        GROUP BY company_id
+        ON CONFLICT (company_id) DO UPDATE SET
+            employee_count = company_stats.employee_count
+                + EXCLUDED.employee_count,
+            active_count = company_stats.active_count + EXCLUDED.active_count,
+            change_timestamp = now();
+"""
+NEW_ROWS = "SELECT company_id, 1 AS d, is_active::int AS a FROM new_rows"
+OLD_ROWS = "SELECT company_id, -1 AS d, -is_active::int AS a FROM old_rows"
+
+# Триггеры уровня выражения с transition tables: массовая вставка
+# на тысячи строк обновляет агрегат одним запросом, а не построчно.
+TRIGGER_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION company_stats_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        {UPSERT_DELTAS.format(deltas=NEW_ROWS)}
+    ELSIF TG_OP = 'DELETE' THEN
+        {UPSERT_DELTAS.format(deltas=OLD_ROWS)}
+    ELSIF TG_OP = 'UPDATE' THEN
+        {UPSERT_DELTAS.format(deltas=NEW_ROWS + " UNION ALL " + OLD_ROWS)}
+    ELSIF TG_OP = 'TRUNCATE' THEN
+        DELETE FROM company_stats;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade() -> None:
+    op.create_table(
+        "company_stats",
+        sa.Column("company_id", sa.Integer(), nullable=False),
+        sa.Column("employee_count", sa.Integer(), nullable=False),
+        sa.Column("active_count", sa.Integer(), nullable=False),
+        sa.Column(
+            "change_timestamp", sa.DateTime(timezone=True), nullable=False
+        ),
+        sa.PrimaryKeyConstraint("company_id"),
+    )
+    # Начальное заполнение по текущим данным
+    op.execute(
+        """
+        INSERT INTO company_stats
+            (company_id, employee_count, active_count, change_timestamp)
+        SELECT company_id, count(*), count(*) FILTER (WHERE is_active), now()
+        FROM employee
+        GROUP BY company_id
+        """
+    )
+    op.execute(TRIGGER_FUNCTION)
+    op.execute(
+        """
+        CREATE TRIGGER employee_stats_insert AFTER INSERT ON employee
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION company_stats_apply()
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER employee_stats_update AFTER UPDATE ON employee
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION company_stats_apply()
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER employee_stats_delete AFTER DELETE ON employee
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION company_stats_apply()
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER employee_stats_truncate AFTER TRUNCATE ON employee
+        FOR EACH STATEMENT EXECUTE FUNCTION company_stats_apply()
+        """
+    )
+
+
+def downgrade() -> None:
+    for name in ("insert", "update", "delete", "truncate"):
+        op.execute(f"DROP TRIGGER IF EXISTS employee_stats_{name} ON employee")
+    op.execute("DROP FUNCTION IF EXISTS company_stats_apply()")
+    op.drop_table("company_stats")
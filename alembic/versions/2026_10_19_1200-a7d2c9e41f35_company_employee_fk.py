@@ -0,0 +1,66 @@
+"""Company-employee foreign key and lookup indexes
+
+Revision ID: a7d2c9e41f35
+Revises: 8c3f4a1e6b22
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a7d2c9e41f35"
+down_revision: Union[str, None] = "8c3f4a1e6b22"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY не блокирует запись в таблицы, но требует выполнения вне транзакции
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_employee_company_id "
+            "ON employee (company_id)"
+        )
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_app_users_login "
+            "ON app_users (login)"
+        )
+    # NOT VALID: ограничение сразу действует для новых строк без полного
+    # сканирования employee под блокировкой
+    op.execute(
+        """
+        ALTER TABLE employee
+        ADD CONSTRAINT employee_company_id_fkey FOREIGN KEY (company_id)
+        REFERENCES company (id) ON DELETE CASCADE NOT VALID
+        """
+    )
+    # Проверка существующих строк берет только SHARE UPDATE EXCLUSIVE.
+    # Если остались сотрудники удаленных компаний, ограничение остается
+    # NOT VALID до их очистки вручную (ALTER TABLE ... VALIDATE CONSTRAINT).
+    op.execute(
+        """
+        DO $$
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM employee e
+                WHERE NOT EXISTS (SELECT 1 FROM company c WHERE c.id = e.company_id)
+            ) THEN
+                RAISE NOTICE 'employee_company_id_fkey: есть сотрудники без компании, VALIDATE пропущен';
+            ELSE
+                ALTER TABLE employee VALIDATE CONSTRAINT employee_company_id_fkey;
+            END IF;
+        END
+        $$
+        """
+    )
+
+
+def downgrade() -> None:
+    op.execute(
+        "ALTER TABLE employee DROP CONSTRAINT IF EXISTS employee_company_id_fkey"
+    )
+    op.execute("DROP INDEX IF EXISTS ix_app_users_login")
+    op.execute("DROP INDEX IF EXISTS ix_employee_company_id")
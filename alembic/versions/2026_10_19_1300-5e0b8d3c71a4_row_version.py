@@ -0,0 +1,35 @@
+"""Row version for optimistic locking of company and employee
+
+Revision ID: 5e0b8d3c71a4
+Revises: a7d2c9e41f35
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5e0b8d3c71a4"
+down_revision: Union[str, None] = "a7d2c9e41f35"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Константный DEFAULT не переписывает таблицу (PostgreSQL 11+): существующие строки получают версию 1
+    op.add_column(
+        "company",
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+    )
+    op.add_column(
+        "employee",
+        sa.Column("version", sa.Integer(), server_default="1", nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("employee", "version")
+    op.drop_column("company", "version")
@@ -0,0 +1,32 @@
+"""Server defaults for outbox timestamps and attempts
+
+Revision ID: a24cc1058fad
+Revises: 5e0b8d3c71a4
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a24cc1058fad"
+down_revision: Union[str, None] = "5e0b8d3c71a4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Без DEFAULT в БД вставка события мимо ORM (INSERT ... SELECT, триггеры, SQL вручную)
+    # падала на NOT NULL. Меняется только каталог, таблица не переписывается
+    op.alter_column("outbox", "create_timestamp", server_default=sa.func.now())
+    op.alter_column("outbox", "attempts", server_default="0")
+    op.alter_column("outbox", "next_attempt_at", server_default=sa.func.now())
+
+
+def downgrade() -> None:
+    op.alter_column("outbox", "next_attempt_at", server_default=None)
+    op.alter_column("outbox", "attempts", server_default=None)
+    op.alter_column("outbox", "create_timestamp", server_default=None)
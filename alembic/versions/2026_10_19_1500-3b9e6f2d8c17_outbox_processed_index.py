@@ -0,0 +1,30 @@
+"""Index on processed outbox events for the retention sweep
+
+Revision ID: 3b9e6f2d8c17
+Revises: a24cc1058fad
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "3b9e6f2d8c17"
+down_revision: Union[str, None] = "a24cc1058fad"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Очистка старых обработанных событий выбирает их по processed_at без полного сканирования outbox
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_outbox_processed_at "
+            "ON outbox (processed_at) WHERE processed_at IS NOT NULL"
+        )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_outbox_processed_at")
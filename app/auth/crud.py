@@ -1,35 +1,38 @@
-import json
 import logging
+import uuid
+from typing import List
 
-import redis
-from fastapi import APIRouter, HTTPException, Depends
-from passlib.context import CryptContext
-from sqlalchemy import select
+from fastapi import APIRouter, HTTPException, Depends, Request
+from sqlalchemy import lambda_stmt, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
+from starlette.concurrency import run_in_threadpool
 
 from app.auth.jwt import create_access_token, decode_access_token
-from app.auth.schemas import AuthRequest, AuthResponse
+from app.auth.schemas import AuthRequest, AuthResponse, LogoutResponse, SessionResponse
+from app.auth.sessions import create_session, list_sessions, revoke_all_sessions, revoke_sessions
+from app.container import container
 from app.database import get_db
+from app.settings import settings
 from app.users.schemas import UserTable
-from app.utils.radis import get_redis
+from app.utils.rate_limit import client_ip, get_limiter, limit_by_ip
+from app.utils.tracing import traced
 
-# Настройка логирования
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 
 @router.post("/auth/login",
              tags=["auth"],
              summary="Получение токена",
              description="Полученный токен необходимо использовать для дальнейшей работы сервиса."
-                         "Токен может получить только заведенный в систему пользователь.",
+                         "Токен может получить только заведенный в систему пользователь.\n"
+                         "Каждый вход - отдельная сессия: прежние токены продолжают действовать "
+                         "до выхода (/auth/logout, /auth/logout_all) или окончания срока.",
              status_code=status.HTTP_200_OK,
              response_model=AuthResponse,
+             dependencies=[Depends(limit_by_ip("login_ip"))],
              responses={
                  200: {"description": "Успешная аутентификация"},
                  401: {
@@ -42,6 +45,7 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
                          }
                      }
                  },
+                 429: {"description": "Слишком много попыток входа"},
                  422: {
                      "description": "Ошибка валидации",
                      "content": {
@@ -59,25 +63,29 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
                      }
                  }
              })
-async def auth_login(auth_request: AuthRequest, db: AsyncSession = Depends(get_db)):
-    redis = await get_redis()
+async def auth_login(auth_request: AuthRequest, request: Request, db: AsyncSession = Depends(get_db)):
+    # Подбор пароля к одному логину отсекаем до запроса в БД и проверки bcrypt
+    await get_limiter("login_user").hit(auth_request.username)
     # Создаем запрос к базе данных
-    query = select(UserTable).where(UserTable.login == auth_request.username)
+    # lambda_stmt: конструкция запроса кешируется, от вызова к вызову меняется только логин
+    username = auth_request.username
+    query = lambda_stmt(lambda: select(UserTable).where(UserTable.login == username))
     result = await db.execute(query)
 
     # Извлекаем пользователя из результата
     user = result.scalars().first()
 
-    # Проверяем, существует ли пользователь и соответствует ли пароль
-    if not user or not pwd_context.verify(auth_request.password, user.password):
+    # Проверяем, существует ли пользователь и соответствует ли пароль.
+    # bcrypt занимает CPU десятки миллисекунд - выносим из event loop в пул потоков
+    if not user or not await run_in_threadpool(container.pwd_context.verify, auth_request.password, user.password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                             detail="Неверный логин или пароль")
 
-    # Создание access token
-    access_token = create_access_token(data={"sub": user.login, "role": user.role})
-
-    # Сохраняем токен в Redis с временем жизни, например, 1 час (3600 секунд)
-    await redis.set(f"user_token:{user.login}", access_token, ex=3600)
+    # Создание access token; jti - ID его сессии в Redis, по нему токен отзывается
+    session_id = uuid.uuid4().hex
+    access_token = create_access_token(data={"sub": user.login, "role": user.role, "jti": session_id})
+    await create_session(user.login, session_id, ttl=settings.access_token_expire_minutes * 60,
+                         user_agent=request.headers.get("user-agent"), ip=client_ip(request))
 
     return AuthResponse(
         user_token=access_token,
@@ -86,38 +94,89 @@ async def auth_login(auth_request: AuthRequest, db: AsyncSession = Depends(get_d
     )
 
 
-async def get_token_from_redis(login: str, redis_token: redis.Redis = Depends(get_redis)):
-    """
-    Функция извлечения токена из Redis по логину пользователя.
-    """
-    token = await redis_token.get(f"user_token:{login}")
-    return token.decode("utf-8") if token else print("Token not found")
+@router.post("/auth/logout",
+             tags=["auth"],
+             summary="Выход",
+             description="Завершает сессию токена: он перестает действовать сразу во всех воркерах. "
+                         "Остальные сессии пользователя продолжают действовать.",
+             status_code=status.HTTP_200_OK,
+             response_model=LogoutResponse,
+             responses={
+                 200: {"description": "Сессия завершена"},
+                 401: {"description": "Токен недействителен или сессия уже завершена"}
+             })
+async def auth_logout(client_token: str):
+    decode = await decode_access_token(client_token)
+    revoked = await revoke_sessions(decode["user_login"], [decode["session_id"]])
+    return LogoutResponse(revoked=revoked)
 
 
+@router.post("/auth/logout_all",
+             tags=["auth"],
+             summary="Выход на всех устройствах",
+             description="Завершает все сессии пользователя, включая текущую.",
+             status_code=status.HTTP_200_OK,
+             response_model=LogoutResponse,
+             responses={
+                 200: {"description": "Сессии завершены"},
+                 401: {"description": "Токен недействителен или сессия уже завершена"}
+             })
+async def auth_logout_all(client_token: str):
+    decode = await decode_access_token(client_token)
+    revoked = await revoke_all_sessions(decode["user_login"])
+    logger.info("Пользователь %s завершил все сессии: %s", decode["user_login"], revoked)
+    return LogoutResponse(revoked=revoked)
+
+
+@router.get("/auth/sessions",
+            tags=["auth"],
+            summary="Активные сессии",
+            description="Действующие входы пользователя токена, новые первыми.",
+            status_code=status.HTTP_200_OK,
+            response_model=List[SessionResponse],
+            responses={
+                200: {"description": "Список сессий"},
+                401: {"description": "Токен недействителен или сессия уже завершена"}
+            })
+async def auth_sessions(client_token: str):
+    decode = await decode_access_token(client_token)
+    sessions = await list_sessions(decode["user_login"])
+    return [SessionResponse(**session, current=session["session_id"] == decode["session_id"])
+            for session in sessions]
+
+
+@traced()
 async def is_user_admin(client_token: str):
     # Декодирование токена и проверка роли
     decode = await decode_access_token(client_token)
 
     # Проверяем роль пользователя
     if decode["user_role"] != "admin":
-        logging.error("Доступ запрещен: пользователь не является администратором.")
+        logger.warning("Доступ запрещен: пользователь не является администратором.")
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Доступ запрещен: только администраторы могут выполнять это действие."
         )
-    return True
+    return decode
+
+
+def is_superadmin(decode: dict) -> bool:
+    """Проверка по уже декодированному токену (см. decode_access_token)."""
+    return decode["user_role"] == "admin" and decode["user_login"] == "voldemort"
 
 
+@traced()
 async def is_user_superadmin(client_token: str):
     # Декодирование токена и проверка роли
     decode = await decode_access_token(client_token)
 
     # Проверяем роль пользователя и имя
-    if not (decode["user_role"] == "admin" and decode["user_login"] == "voldemort"):
-        logging.error(f"Доступ запрещен: попытка входа с логином {decode["user_login"]} и ролью {decode["user_role"]}")
+    if not is_superadmin(decode):
+        logger.warning("Доступ запрещен: попытка входа с логином %s и ролью %s",
+                       decode["user_login"], decode["user_role"])
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail=f"Только высшие силы смогу получить доступ к этому ресурсу."
                    f"А ты {decode["user_login"]} с ролью {decode["user_role"]} пересмотри свою магическую силу."
         )
-    return True
+    return decode
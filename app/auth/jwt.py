@@ -1,42 +1,44 @@
 import logging
-import os
+import uuid
 from datetime import datetime, timedelta, timezone
 
 import jwt
-from dotenv import load_dotenv
 from fastapi import HTTPException
+from redis.exceptions import RedisError
 from starlette import status
 
-logging.basicConfig(level=logging.INFO)
+from app.auth.sessions import is_session_active
+from app.settings import settings
+from app.utils.tracing import traced
+
+logger = logging.getLogger(__name__)
 
-# Загружаем переменные окружения
-load_dotenv()
-SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 300
 
 # Проверяем, установлен ли SECRET_KEY
-if not SECRET_KEY:
+if not settings.secret_key:
     raise ValueError("SECRET_KEY is not set in the environment variables.")
 
 
 def create_access_token(data: dict, expires_delta=None):
     to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + (
-        expires_delta if expires_delta else timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    now = datetime.now(timezone.utc)
+    expire = now + (
+        expires_delta if expires_delta else timedelta(minutes=settings.access_token_expire_minutes))
     # Убедитесь, что 'exp' является целым числом
-    to_encode.update({"exp": int(expire.timestamp())})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    logging.info(f"Токен без декодирования создан: {encoded_jwt}")
+    to_encode.update({"exp": int(expire.timestamp()), "iat": int(now.timestamp())})
+    # jti - ID сессии токена (app.auth.sessions), по нему токен отзывается
+    to_encode.setdefault("jti", uuid.uuid4().hex)
+    encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=ALGORITHM)
+    logger.debug("Токен создан для %s", data.get("sub"))
     return encoded_jwt
 
 
+@traced()
 async def decode_access_token(token: str):
     try:
-        logging.info(f"Декодирование токена: {token}")
-
         # Декодируем токен
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, settings.secret_key, algorithms=[ALGORITHM])
 
         # Извлекаем логин пользователя из payload
         user_login = payload.get("sub")
@@ -44,40 +46,61 @@ async def decode_access_token(token: str):
         user_role = payload.get("role")
         # Извлекаем срок действия токена пользователя из payload
         token_expire = payload.get("exp")
+        # Извлекаем ID сессии из payload
+        session_id = payload.get("jti")
 
         # Проверка на наличие роли
         if user_role is None:
-            logging.error("Роль пользователя отсутствует в токене")
+            logger.error("Роль пользователя отсутствует в токене")
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Роль пользователя не найдена"
             )
 
+        # Токен действует, пока жива его сессия: после выхода подпись
+        # остается верной, но сессии уже нет. Токены без jti выданы до
+        # появления сессий и отозвать их нельзя - требуем войти заново
+        if session_id is None or not await is_session_active(session_id):
+            logger.warning("Сессия токена %s завершена", user_login)
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Сессия завершена, войдите заново"
+            )
+
         # Возвращаем словарь с информацией
         decoded_info = {
             "user_login": user_login,
             "user_role": user_role,
-            "token_expire": token_expire
+            "token_expire": token_expire,
+            "session_id": session_id
         }
 
         return decoded_info
 
     except jwt.ExpiredSignatureError:
-        logging.error("Токен истек")
+        logger.warning("Токен истек")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Токен истек"
         )
 
     except jwt.InvalidTokenError:
-        logging.error("Неверный токен")
+        logger.warning("Неверный токен")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Неверный токен"
         )
 
+    except RedisError as e:
+        # Без хранилища сессий нельзя проверить, что токен не отозван
+        logger.error("Проверка сессии недоступна: %r", e)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Проверка токена временно недоступна"
+        )
+
     except KeyError as e:
-        logging.error(f"Ошибка decrypted payload: {e}")
+        logger.error("Ошибка decrypted payload: %s", e)
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Ошибка при декодировании токена"
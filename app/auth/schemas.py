@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel, Field
 from enum import Enum
 
@@ -20,3 +22,16 @@ class AuthResponse(BaseModel):
     role: RoleEnum = Field(..., description="Роль")
     display_name: str
     # login: str
+
+
+class SessionResponse(BaseModel):
+    session_id: str = Field(..., description="ID сессии (jti токена)")
+    created_at: int = Field(..., description="Вход, Unix-время")
+    expires_at: int = Field(..., description="Окончание действия токена, Unix-время")
+    user_agent: Optional[str] = Field(None, description="User-Agent при входе")
+    ip: Optional[str] = Field(None, description="IP при входе")
+    current: bool = Field(False, description="Сессия токена, с которым выполнен запрос")
+
+
+class LogoutResponse(BaseModel):
+    revoked: int = Field(..., description="Сколько сессий завершено")
@@ -0,0 +1,208 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+from redis.exceptions import RedisError
+
+from app.settings import settings
+from app.utils.radis import get_redis, redis_pipeline
+
+logger = logging.getLogger(__name__)
+
+# Сессия = выданный токен. Пока есть ключ session:{jti}, токен действует;
+# выход удаляет ключ, поэтому проверка - один EXISTS, O(1) по числу сессий.
+# user_sessions:{login} - сессии пользователя (jti -> срок действия) для списка
+# сессий, выхода со всех устройств и ограничения числа входов
+SESSIONS_CHANNEL = "auth:sessions:revoked"
+
+
+def _session_key(jti: str) -> str:
+    return f"session:{jti}"
+
+
+def _user_sessions_key(login: str) -> str:
+    return f"user_sessions:{login}"
+
+
+class SessionCache:
+    """
+    Локальный кеш процесса: сессии, которые недавно подтвердил Redis.
+
+    Запись живет settings.session_cache_ttl секунд, кеш ограничен
+    settings.session_cache_size записями (вытесняются самые старые).
+    Отозванные сессии удаляются сразу по сообщению из SESSIONS_CHANNEL
+    (SessionInvalidationListener), TTL страхует от потерянных сообщений.
+
+    revision растет при каждом отзыве и очистке: проверка, начатая до отзыва,
+    не может вернуть в кеш уже отозванную сессию (см. is_session_active).
+    """
+
+    def __init__(self, ttl: float = settings.session_cache_ttl, max_size: int = settings.session_cache_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.revision = 0
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+
+    def contains(self, jti: str) -> bool:
+        valid_until = self._entries.get(jti)
+        if valid_until is None:
+            return False
+        if valid_until < time.monotonic():
+            del self._entries[jti]
+            return False
+        return True
+
+    def add(self, jti: str, revision: int):
+        """Кеширует сессию, если с момента revision ничего не отзывалось."""
+        if self.ttl <= 0 or revision != self.revision:
+            return
+        self._entries[jti] = time.monotonic() + self.ttl
+        self._entries.move_to_end(jti)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def discard(self, jtis: Iterable[str]):
+        self.revision += 1
+        for jti in jtis:
+            self._entries.pop(jti, None)
+
+    def clear(self):
+        self.revision += 1
+        self._entries.clear()
+
+
+session_cache = SessionCache()
+
+
+async def create_session(login: str, jti: str, ttl: int, user_agent: Optional[str] = None,
+                         ip: Optional[str] = None):
+    """
+    Регистрирует сессию нового токена на ttl секунд (срок действия токена).
+
+    Сверх settings.max_sessions_per_user самые старые сессии пользователя завершаются.
+    """
+    now = time.time()
+    expires_at = now + ttl
+    async with redis_pipeline(transaction=True) as pipe:
+        pipe.hset(_session_key(jti), mapping={
+            "login": login,
+            "created_at": int(now),
+            "expires_at": int(expires_at),
+            "user_agent": (user_agent or "")[:256],
+            "ip": ip or "",
+        })
+        pipe.expire(_session_key(jti), ttl)
+        # Истекшие сессии в индексе пользователя чистятся при каждом входе
+        pipe.zremrangebyscore(_user_sessions_key(login), "-inf", now)
+        pipe.zadd(_user_sessions_key(login), {jti: expires_at})
+        pipe.expire(_user_sessions_key(login), ttl)
+
+    if settings.max_sessions_per_user > 0:
+        client = await get_redis()
+        oldest = await client.zrange(_user_sessions_key(login), 0, -(settings.max_sessions_per_user + 1))
+        if oldest:
+            await revoke_sessions(login, [old.decode() for old in oldest])
+            logger.info("Пользователь %s: завершено старых сессий сверх лимита: %s", login, len(oldest))
+
+
+async def is_session_active(jti: str) -> bool:
+    if session_cache.contains(jti):
+        return True
+    # Отзыв, пришедший пока ждем Redis, меняет revision - тогда ответ EXISTS не кешируется
+    revision = session_cache.revision
+    client = await get_redis()
+    if not await client.exists(_session_key(jti)):
+        return False
+    session_cache.add(jti, revision)
+    return True
+
+
+async def revoke_sessions(login: str, jtis: List[str]) -> int:
+    """Завершает сессии и рассылает их ID всем процессам для очистки локальных кешей."""
+    if not jtis:
+        return 0
+    async with redis_pipeline(transaction=True) as pipe:
+        pipe.delete(*map(_session_key, jtis))
+        pipe.zrem(_user_sessions_key(login), *jtis)
+        pipe.publish(SESSIONS_CHANNEL, json.dumps(jtis))
+    session_cache.discard(jtis)
+    return len(jtis)
+
+
+async def revoke_all_sessions(login: str) -> int:
+    client = await get_redis()
+    jtis = [jti.decode() for jti in await client.zrange(_user_sessions_key(login), 0, -1)]
+    return await revoke_sessions(login, jtis)
+
+
+async def list_sessions(login: str) -> List[Dict[str, Any]]:
+    """Действующие сессии пользователя, новые первыми."""
+    client = await get_redis()
+    jtis = [jti.decode() for jti in await client.zrevrangebyscore(_user_sessions_key(login), "+inf", time.time())]
+    async with client.pipeline(transaction=False) as pipe:
+        for jti in jtis:
+            pipe.hgetall(_session_key(jti))
+        rows = await pipe.execute()
+    sessions = []
+    for jti, raw in zip(jtis, rows):
+        if not raw:
+            continue
+        session = {key.decode(): value.decode() for key, value in raw.items()}
+        sessions.append({
+            "session_id": jti,
+            "created_at": int(session["created_at"]),
+            "expires_at": int(session["expires_at"]),
+            "user_agent": session.get("user_agent") or None,
+            "ip": session.get("ip") or None,
+        })
+    return sessions
+
+
+class SessionInvalidationListener:
+    """
+    Подписка процесса на SESSIONS_CHANNEL: отозванные сессии сразу удаляются
+    из локального кеша, поэтому выход действует во всех воркерах без ожидания TTL.
+
+    При потере подписки кеш очищается: пропущенные сообщения могли отзывать
+    закешированные сессии. Держит одно соединение Redis на процесс.
+    """
+
+    def __init__(self, cache: SessionCache = session_cache):
+        self.cache = cache
+        self._task: Optional[asyncio.Task] = None
+
+    async def _listen(self):
+        client = await get_redis()
+        async with client.pubsub(ignore_subscribe_messages=True) as pubsub:
+            await pubsub.subscribe(SESSIONS_CHANNEL)
+            self.cache.clear()
+            while True:
+                message = await pubsub.get_message(timeout=1.0)
+                if message is not None:
+                    self.cache.discard(json.loads(message["data"]))
+
+    async def _run(self):
+        while True:
+            try:
+                await self._listen()
+            except RedisError as e:
+                logger.warning("Подписка на отзыв сессий прервана: %r", e)
+                self.cache.clear()
+                await asyncio.sleep(1)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="session-invalidation")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+
+session_listener = SessionInvalidationListener()
@@ -1,24 +1,39 @@
-from typing import Dict
+import asyncio
+from itertools import starmap
+from typing import Dict, List, Optional
 
 from fastapi import HTTPException
-from sqlalchemy import delete, select, text
+from sqlalchemy import (JSON, Integer, any_, bindparam, delete, func, lambda_stmt, literal_column, select, text,
+                        update)
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
-from typing_extensions import Optional
 import logging
 
 from app.auth.crud import is_user_admin
-from app.auth.jwt import decode_access_token
-from app.company.schemas import Base, CompanyTable, CompanyCreateRequest, UpdateCompanyDto
-from app.database import engine
+from app.company.schemas import (Base, COMPANY_READ_COLUMNS, CompanyTable, CompanyStatsTable, CompanyCreateRequest,
+                                 CompanyRead, CompanyStatsRead, CompanyWithEmployeeCountRead,
+                                 CompanyWithEmployeesRead, UpdateCompanyDto)
+from app.container import container
 from app.employee.schemas import EmployeeTable
+from app.outbox.crud import add_outbox_event
+from app.settings import settings
+from app.utils.dataloader import get_loader
+from app.utils.etag import precondition_failed
+from app.utils.singleflight import coalesced
+from app.utils.tracing import traced
 
 logger = logging.getLogger(__name__)
 
+# Частые запросы собраны через lambda_stmt: select(...) не строится заново на каждый
+# запрос - ключ кеша компиляции берется по коду лямбды, меняются только параметры
+_COMPANY_IDS = bindparam("ids", type_=ARRAY(Integer))
+_COMPANIES_BY_IDS = lambda_stmt(lambda: select(*COMPANY_READ_COLUMNS).where(CompanyTable.id == any_(_COMPANY_IDS)))
+
 
 async def create_company_table():
-    async with engine.begin() as conn:
+    async with container.engine.begin() as conn:
         await conn.run_sync(create_company_table_sync)
 
 
@@ -27,11 +42,10 @@ def create_company_table_sync(conn):
 
 
 async def create_test_companies(db: AsyncSession):
-    # Очистка таблицы пользователей и компаний
-    await db.execute(text("TRUNCATE TABLE employee RESTART IDENTITY"))
-    # await db.execute(delete(EmployeeTable))
-    await db.execute(text("TRUNCATE TABLE company RESTART IDENTITY"))  # Очистка таблицы company чтобы ID начинался с 1
-    # await db.execute(delete(CompanyTable))
+    # Очистка таблиц сотрудников и компаний одним выражением: на company ссылается внешний ключ
+    # employee, поэтому отдельно ее очистить нельзя. RESTART IDENTITY - чтобы ID начинались с 1.
+    # Агрегаты company_stats очищаются триггером на TRUNCATE employee
+    await db.execute(text("TRUNCATE TABLE employee, company RESTART IDENTITY"))
     await db.commit()
 
     # Список тестовых компаний
@@ -50,6 +64,30 @@ async def create_test_companies(db: AsyncSession):
     await db.commit()
 
 
+@traced()
+async def _batch_load_companies(db: AsyncSession, company_ids: List[int]) -> Dict[int, CompanyRead]:
+    # Один запрос на всю пачку: WHERE id = ANY(:ids)
+    result = await db.execute(_COMPANIES_BY_IDS, {"ids": company_ids})
+    return {row.id: CompanyRead(*row) for row in result}
+
+
+async def load_company(db: AsyncSession, company_id: int) -> Optional[CompanyRead]:
+    """
+    Возвращает компанию по ID или None.
+
+    Одновременные вызовы в рамках запроса собираются в один SELECT,
+    повторные - берутся из кеша загрузчика сессии.
+    """
+    loader = get_loader(db, "company", lambda ids: _batch_load_companies(db, ids))
+    return await loader.load(company_id)
+
+
+async def load_companies(db: AsyncSession, company_ids: List[int]) -> List[Optional[CompanyRead]]:
+    loader = get_loader(db, "company", lambda ids: _batch_load_companies(db, ids))
+    return await loader.load_many(company_ids)
+
+
+@traced()
 async def create_company(db: AsyncSession, company_data: CompanyCreateRequest):
     # Создаем объект компании
     db_company = CompanyTable(**company_data.dict())
@@ -58,6 +96,10 @@ async def create_company(db: AsyncSession, company_data: CompanyCreateRequest):
     db.add(db_company)
 
     try:
+        # Получаем ID компании и пишем событие в outbox в той же транзакции
+        await db.flush()
+        add_outbox_event(db, "company.created", "company", db_company.id, company_data.dict())
+
         # Асинхронно коммитим изменения в базе данных
         await db.commit()
 
@@ -70,14 +112,18 @@ async def create_company(db: AsyncSession, company_data: CompanyCreateRequest):
         raise HTTPException(status_code=400, detail="Ошибка при создании компании") from e
 
 
-async def get_companies(db: AsyncSession, active_only: Optional[bool] = None):
+@traced()
+@coalesced
+async def get_companies(db: AsyncSession, active_only: Optional[bool] = None,
+                        limit: Optional[int] = None, offset: int = 0):
     try:
-        query = select(CompanyTable)
+        query = lambda_stmt(lambda: select(*COMPANY_READ_COLUMNS).order_by(CompanyTable.id))
         if active_only is not None:  # Проверяем, передан ли параметр
-            query = query.where(CompanyTable.is_active == active_only)
+            query += lambda q: q.where(CompanyTable.is_active == active_only)
+        query += lambda q: q.limit(limit).offset(offset)
 
         result = await db.execute(query)
-        companies = result.scalars().all()
+        companies = list(starmap(CompanyRead, result.tuples()))
 
         return companies
     except HTTPException as e:
@@ -89,41 +135,191 @@ async def get_companies(db: AsyncSession, active_only: Optional[bool] = None):
             return {"error": "Внутренняя ошибка сервера"}
 
 
+@traced()
+@coalesced
+async def get_companies_with_employee_count(db: AsyncSession, active_only: Optional[bool] = None,
+                                            limit: Optional[int] = None, offset: int = 0):
+    """Страница компаний с числом сотрудников - один запрос с JOIN на company_stats."""
+    query = (
+        select(*COMPANY_READ_COLUMNS, func.coalesce(CompanyStatsTable.employee_count, 0).label("employee_count"))
+        .outerjoin(CompanyStatsTable, CompanyStatsTable.company_id == CompanyTable.id)
+        .order_by(CompanyTable.id)
+        .limit(limit)
+        .offset(offset)
+    )
+    if active_only is not None:
+        query = query.where(CompanyTable.is_active == active_only)
+
+    result = await db.execute(query)
+    return list(starmap(CompanyWithEmployeeCountRead, result.tuples()))
+
+
+@traced()
+@coalesced
+async def get_company_with_employees(db: AsyncSession, company_id: int):
+    """
+    Компания вместе со списком сотрудников одним запросом.
+
+    LEFT JOIN employee + json_agg: сотрудники собираются в JSON-массив
+    на стороне PostgreSQL, вместо отдельных запросов компании и списка.
+    """
+    employee = func.json_build_object(
+        "id", EmployeeTable.id,
+        "first_name", EmployeeTable.first_name,
+        "last_name", EmployeeTable.last_name,
+        "middle_name", EmployeeTable.middle_name,
+        "company_id", EmployeeTable.company_id,
+        "email", EmployeeTable.email,
+        "phone", EmployeeTable.phone,
+        "birthdate", EmployeeTable.birthdate,
+        "is_active", EmployeeTable.is_active,
+        "version", EmployeeTable.version,
+    )
+    employees = func.coalesce(
+        func.json_agg(aggregate_order_by(employee, EmployeeTable.id))
+        .filter(EmployeeTable.id.is_not(None)),
+        literal_column("'[]'::json"),
+        type_=JSON,
+    )
+    query = (
+        select(*COMPANY_READ_COLUMNS, employees.label("employees"))
+        .outerjoin(EmployeeTable, EmployeeTable.company_id == CompanyTable.id)
+        .where(CompanyTable.id == company_id)
+        .group_by(CompanyTable.id)
+    )
+    row = (await db.execute(query)).first()
+    if row is None:
+        logger.warning("Компания с ID %s не найдена", company_id)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Компания не найдена")
+
+    return CompanyWithEmployeesRead(*row)
+
+
+@traced()
+@coalesced
 async def get_company(db: AsyncSession, company_id: int):
     # Создаем запрос, используя future API
-    query = select(CompanyTable).where(CompanyTable.id == company_id)
+    query = lambda_stmt(lambda: select(*COMPANY_READ_COLUMNS).where(CompanyTable.id == company_id))
     result = await db.execute(query)  # Выполняем запрос асинхронно
-    db_company = result.scalar()
-    if not db_company:
-        logger.warning(f"Компания с ID {company_id} не найдена")
+    row = result.first()
+    if row is None:
+        logger.warning("Компания с ID %s не найдена", company_id)
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Компания не найдена")
 
-    return db_company
+    return CompanyRead(*row)
+
+
+@traced()
+@coalesced
+async def get_company_stats(db: AsyncSession, active_only: Optional[bool] = None):
+    """
+    Численность и доля активных сотрудников по компаниям.
 
+    Читается из company_stats, которую поддерживают триггеры на employee,
+    поэтому стоимость запроса зависит от числа компаний, а не сотрудников.
+    """
+    employee_count = func.coalesce(CompanyStatsTable.employee_count, 0)
+    active_count = func.coalesce(CompanyStatsTable.active_count, 0)
+    query = (
+        select(CompanyTable.id, CompanyTable.name, CompanyTable.is_active, employee_count, active_count)
+        .outerjoin(CompanyStatsTable, CompanyStatsTable.company_id == CompanyTable.id)
+        .order_by(CompanyTable.id)
+    )
+    if active_only is not None:
+        query = query.where(CompanyTable.is_active == active_only)
+
+    result = await db.execute(query)
+    return [
+        CompanyStatsRead(
+            company_id=company_id,
+            name=name,
+            is_active=is_active,
+            employee_count=total,
+            active_count=active,
+            inactive_count=total - active,
+            active_ratio=round(active / total, 4) if total else 0.0,
+        )
+        for company_id, name, is_active, total, active in result
+    ]
+
+
+async def refresh_company_stats(db: AsyncSession):
+    """Полный пересчет company_stats по employee - сверка на случай расхождений."""
+    # Без блокировки триггер параллельной транзакции мог добавить свою дельту между
+    # подсчетом и записью, а пересчет затер бы ее значением из своего снимка.
+    # SHARE ROW EXCLUSIVE конфликтует с записью триггеров (ROW EXCLUSIVE): пересчет
+    # ждет завершения начатых изменений employee, новые ждут конца пересчета
+    await db.execute(text("LOCK TABLE company_stats IN SHARE ROW EXCLUSIVE MODE"))
+    await db.execute(text(
+        "INSERT INTO company_stats (company_id, employee_count, active_count, change_timestamp) "
+        "SELECT company_id, count(*), count(*) FILTER (WHERE is_active), now() FROM employee GROUP BY company_id "
+        "ON CONFLICT (company_id) DO UPDATE SET employee_count = EXCLUDED.employee_count, "
+        "active_count = EXCLUDED.active_count, change_timestamp = now()"
+    ))
+    await db.execute(text(
+        "DELETE FROM company_stats s WHERE NOT EXISTS (SELECT 1 FROM employee e WHERE e.company_id = s.company_id)"
+    ))
+    await db.commit()
 
-async def update_company_data(db: AsyncSession, company_id: int, company_data: UpdateCompanyDto, client_token: str):
-    logger.info(f"Попытка изменения данных компании с ID {company_id}")
-    logger.info(f"client_token: {client_token}")
+
+async def run_company_stats_refresh(interval: int = settings.company_stats_refresh_interval):
+    """Фоновая периодическая сверка агрегатов, запускается из lifespan."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with container.session_factory() as db:
+                await refresh_company_stats(db)
+        except Exception:
+            logger.exception("Ошибка пересчета company_stats")
+
+
+async def _update_company(db: AsyncSession, company_id: int, values: Dict,
+                          expected_version: Optional[int]) -> CompanyRead:
+    """
+    Изменение компании одним UPDATE ... RETURNING с увеличением версии.
+
+    С expected_version строка меняется, только если ее версия совпадает
+    (оптимистичная блокировка): без чтения перед записью и без SELECT FOR UPDATE.
+    Блокировка строки держится лишь от UPDATE до коммита.
+    """
+    query = (
+        update(CompanyTable)
+        .where(CompanyTable.id == company_id)
+        .values(**values, version=CompanyTable.version + 1)
+        .returning(*COMPANY_READ_COLUMNS)
+        .execution_options(synchronize_session=False)
+    )
+    if expected_version is not None:
+        query = query.where(CompanyTable.version == expected_version)
+    row = (await db.execute(query)).first()
+    if row is not None:
+        return CompanyRead(*row)
+
+    # Строка не изменилась: компании нет или версия уже другая
+    current_version = await db.scalar(select(CompanyTable.version).where(CompanyTable.id == company_id))
+    if current_version is None:
+        logger.warning("Компания с ID %s не найдена", company_id)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Компания не найдена")
+    logger.info("Конфликт версий компании %s: ожидалась %s, текущая %s",
+                company_id, expected_version, current_version)
+    raise precondition_failed(current_version)
+
+
+@traced()
+async def update_company_data(db: AsyncSession, company_id: int, company_data: UpdateCompanyDto, client_token: str,
+                              expected_version: Optional[int] = None) -> CompanyRead:
+    logger.debug("Попытка изменения данных компании с ID %s", company_id)
     try:
         # Декодирование токена и проверка роли
         await is_user_admin(client_token)
 
-        # Создаем запрос для получения компании по ID
-        result = await db.execute(select(CompanyTable).where(CompanyTable.id == company_id))
-        db_company = result.scalars().first()  # Получаем первую найденную запись
-        if not db_company:
-            logger.warning(f"Компания с ID {company_id} не найдена")
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Компания не найдена")
-
-        db_company = await get_company(db, company_id)  # Предполагается, что get_company асинхронная
-
-        for var, value in vars(company_data).items():
-            if value is not None:  # Обновляем только те поля, которые были указаны
-                setattr(db_company, var, value)
+        changes = {var: value for var, value in vars(company_data).items()
+                   if value is not None}  # Обновляем только те поля, которые были указаны
+        db_company = await _update_company(db, company_id, changes, expected_version)
+        add_outbox_event(db, "company.updated", "company", company_id, changes)
 
         # Коммитим изменения в базе данных
         await db.commit()
-        await db.refresh(db_company)
 
         return db_company
     except HTTPException as e:
@@ -131,40 +327,32 @@ async def update_company_data(db: AsyncSession, company_id: int, company_data: U
         raise e
     except Exception as e:
         # Обработка других ошибок
-        logging.error(f"Ошибка при обновлении компании: {str(e)}")
+        logger.error("Ошибка при обновлении компании: %s", e)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
-async def update_company_status(db: AsyncSession, company_id: int, is_active: bool, client_token: str):
-    logger.info(f"Попытка изменения статуса компании с ID {company_id}")
-    logger.info(f"client_token: {client_token}")
+@traced()
+async def update_company_status(db: AsyncSession, company_id: int, is_active: bool, client_token: str,
+                                expected_version: Optional[int] = None) -> CompanyRead:
+    logger.debug("Попытка изменения статуса компании с ID %s", company_id)
     try:
         # Декодирование токена и проверка роли
         await is_user_admin(client_token)
 
-        # Создаем запрос для получения компании по ID
-        result = await db.execute(select(CompanyTable).where(CompanyTable.id == company_id))
-        db_company = result.scalars().first()  # Получаем первую найденную запись
-        if not db_company:
-            logger.warning(f"Компания с ID {company_id} не найдена")
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Компания не найдена")
-
-        elif db_company:
-            # Обновляем статус компании
-            db_company.is_active = is_active
+        # Обновляем статус компании
+        db_company = await _update_company(db, company_id, {"is_active": is_active}, expected_version)
+        add_outbox_event(db, "company.status_changed", "company", company_id, {"is_active": is_active})
 
-            # Выполняем коммит изменений
-            await db.commit()
-
-            # Обновляем объект после коммита
-            await db.refresh(db_company)
-            return db_company
+        # Выполняем коммит изменений
+        await db.commit()
+        return db_company
 
     except Exception as e:
-        logger.error(f"Ошибка при обновлении статуса компании: {str(e)}")
+        logger.error("Ошибка при обновлении статуса компании: %s", e)
         raise
 
 
+@traced()
 async def delete_company(db: AsyncSession, company_id: int, client_token: str) -> Dict:
     """
     Функция для удаления компании.
@@ -181,8 +369,7 @@ async def delete_company(db: AsyncSession, company_id: int, client_token: str) -
         HTTPException: В случае ошибки, выбрасывается HTTP-исключение с соответствующим кодом состояния и описанием.
     """
 
-    logger.info(f"Попытка удаления компании с ID {company_id}")
-    logger.info(f"client_token: {client_token}")
+    logger.debug("Попытка удаления компании с ID %s", company_id)
 
     try:
         # Декодирование токена и проверка роли
@@ -193,13 +380,14 @@ async def delete_company(db: AsyncSession, company_id: int, client_token: str) -
         db_company = result.scalars().first()  # Получаем первую найденную запись
 
         if not db_company:
-            logger.warning(f"Компания с ID {company_id} не найдена")
+            logger.warning("Компания с ID %s не найдена", company_id)
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Компания не найдена")
 
         await db.delete(db_company)  # Асинхронное удаление
+        add_outbox_event(db, "company.deleted", "company", company_id)
         await db.commit()  # Асинхронный коммит
 
-        logger.info(f"Компания с ID {company_id} успешно удалена")
+        logger.debug("Компания с ID %s успешно удалена", company_id)
         return {"detail": "Компания успешно удалена", "company_id": company_id}
 
     except HTTPException as e:
@@ -208,7 +396,7 @@ async def delete_company(db: AsyncSession, company_id: int, client_token: str) -
         raise e
 
     except Exception as e:
-        logger.error(f"Внутренняя ошибка сервера: {str(e)}")
+        logger.error("Внутренняя ошибка сервера: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Внутренняя ошибка сервера"
@@ -1,12 +1,15 @@
 import logging
-from typing import Optional
+from typing import Literal, Optional, Union
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Header, Query, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from . import crud, schemas
 from .schemas import UpdateCompanyStatusDto
-from ..database import get_db
+from ..database import get_db, get_read_db
+from ..utils.etag import parse_if_match, version_etag
+from ..utils.idempotency import idempotency_subject, idempotent
+from ..utils.rate_limit import limit_by_ip
 
 logger = logging.getLogger(__name__)
 
@@ -16,8 +19,9 @@ router = APIRouter(prefix="/company", tags=["company"])
 @router.get(
     "/list",
     summary="Получение списка компаний",
-    description="Запрос выводит все компании в зависимости от статуса активности",
-    response_model=list[schemas.CompanyCreateResponse],
+    description="Запрос выводит все компании в зависимости от статуса активности. "
+    "include=employee_count добавляет число сотрудников без отдельных запросов",
+    response_model=list[Union[schemas.CompanyWithEmployeeCountResponse, schemas.CompanyCreateResponse]],
     status_code=status.HTTP_200_OK,
     responses={
         200: {"description": "Успешно))"},
@@ -25,7 +29,11 @@ router = APIRouter(prefix="/company", tags=["company"])
     },
 )
 async def read_companies(
-    db: AsyncSession = Depends(get_db), active: Optional[bool] = None
+    db: AsyncSession = Depends(get_read_db),
+    active: Optional[bool] = None,
+    include: Optional[Literal["employee_count"]] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
 ):
     """
     Обработчик GET-запроса для получения списка компаний.
@@ -33,6 +41,9 @@ async def read_companies(
     Args:
         db (AsyncSession): Сессия базы данных.
         active (Optional[bool]): Фильтр по статусу активности компании (True - активные, False - неактивные).
+        include (Optional[str]): employee_count - добавить к каждой компании число сотрудников.
+        limit (Optional[int]): Размер страницы.
+        offset (int): Смещение от начала списка (компании упорядочены по ID).
 
     Returns:
         List[schemas.Company]: Список компаний, соответствующих фильтру.
@@ -40,28 +51,67 @@ async def read_companies(
     Raises:
         HTTPException: В случае ошибки, выбрасывается HTTP-исключение с соответствующим кодом состояния.
     """
-    companies = await crud.get_companies(db, active_only=active)
+    if include == "employee_count":
+        return await crud.get_companies_with_employee_count(
+            db, active_only=active, limit=limit, offset=offset
+        )
+    companies = await crud.get_companies(db, active_only=active, limit=limit, offset=offset)
     return companies
 
 
+@router.get(
+    "/stats",
+    summary="Статистика сотрудников по компаниям",
+    description="Запрос выводит для каждой компании число сотрудников, "
+    "число активных и неактивных и долю активных",
+    response_model=list[schemas.CompanyStatsResponse],
+    status_code=status.HTTP_200_OK,
+    responses={
+        200: {"description": "Успешно"},
+    },
+)
+async def read_company_stats(
+    db: AsyncSession = Depends(get_read_db), active: Optional[bool] = None
+):
+    """
+    Обработчик GET-запроса для дашбордов по численности сотрудников.
+
+    Args:
+        db (AsyncSession): Сессия базы данных.
+        active (Optional[bool]): Фильтр по статусу активности компании.
+
+    Returns:
+        List[schemas.CompanyStatsResponse]: Агрегаты по компаниям.
+    """
+    return await crud.get_company_stats(db, active_only=active)
+
+
 @router.get(
     "/{company_id}",
     summary="Получение данных компании по ID",
-    description="Запрос выводит информацию о конкретной компании",
-    response_model=schemas.CompanyCreateResponse,
+    description="Запрос выводит информацию о конкретной компании. "
+    "include=employees добавляет список сотрудников в том же ответе",
+    response_model=Union[schemas.CompanyWithEmployeesResponse, schemas.CompanyCreateResponse],
     status_code=status.HTTP_200_OK,
     responses={
-        200: {"description": "Запрос успешно прошел"},
+        200: {"description": "Запрос успешно прошел, версия компании - в заголовке ETag"},
         404: {"description": "Компания не найдена"},
     },
 )
-async def read_company(company_id: int, db: AsyncSession = Depends(get_db)):
+async def read_company(
+    company_id: int,
+    response: Response,
+    db: AsyncSession = Depends(get_read_db),
+    include: Optional[Literal["employees"]] = None,
+):
     """
     Обработчик GET-запроса для получения информации о компании по ID.
 
     Args:
         company_id (int): ID компании, информацию о которой необходимо получить.
+        response (Response): Ответ, в заголовок ETag которого пишется версия компании.
         db (AsyncSession): Сессия базы данных.
+        include (Optional[str]): employees - вернуть компанию вместе с сотрудниками одним запросом.
 
     Returns:
         schemas.Company: Информация о компании.
@@ -69,8 +119,14 @@ async def read_company(company_id: int, db: AsyncSession = Depends(get_db)):
     Raises:
         HTTPException: В случае, если компания с указанным ID не найдена, выбрасывается исключение с кодом 404.
     """
+    if include == "employees":
+        company = await crud.get_company_with_employees(db, company_id=company_id)
+        response.headers["ETag"] = version_etag(company.version)
+        return company
     company = await crud.get_company(db, company_id=company_id)
-    return company
+    response.headers["ETag"] = version_etag(company.version)
+    # Явно выбираем модель: иначе Union подобрал бы ее по полям ORM-объекта
+    return schemas.CompanyCreateResponse.model_validate(company, from_attributes=True)
 
 
 @router.delete(
@@ -80,6 +136,7 @@ async def read_company(company_id: int, db: AsyncSession = Depends(get_db)):
     "Доступно только для пользователей с ролью admin",
     response_model=schemas.DeleteCompanyDto,
     status_code=status.HTTP_200_OK,
+    dependencies=[Depends(limit_by_ip("write_ip"))],
     responses={
         200: {"description": "Компания успешно удалена"},
         404: {"description": "Компания не найдена"},
@@ -115,20 +172,30 @@ async def delete_company(
     description="Запрос создает новую компанию по заданным параметрам",
     response_model=schemas.CompanyCreateResponse,
     status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(limit_by_ip("write_ip"))],
     responses={
         201: {"description": "Компания успешно создана"},
         400: {"description": "Ошибка при создании компании"},
+        409: {"description": "Запрос с этим Idempotency-Key еще выполняется"},
+        422: {"description": "Idempotency-Key уже использован с другим телом запроса"},
     },
 )
 async def create_new_company(
-    company_data: schemas.CompanyCreateRequest, db: AsyncSession = Depends(get_db)
+    company_data: schemas.CompanyCreateRequest,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    idempotency_key: Optional[str] = Header(
+        None, alias="Idempotency-Key", description="Ключ для безопасного повтора запроса"
+    ),
 ):
     """
     Обработчик POST-запроса для создания новой компании.
 
     Args:
         company_data (schemas.Company): Данные новой компании.
+        request (Request): Запрос; IP клиента ограничивает действие Idempotency-Key.
         db (AsyncSession): Сессия базы данных.
+        idempotency_key (Optional[str]): Повтор с тем же ключом вернет сохраненный ответ без создания дубля.
 
     Returns:
         schemas.CreateCompanyDto: Информация о созданной компании.
@@ -136,28 +203,44 @@ async def create_new_company(
     Raises:
         HTTPException: В случае ошибки валидации или создания компании, выбрасывается исключение с соответствующим кодом состояния.
     """
-    return await crud.create_company(db=db, company_data=company_data)
+    return await idempotent(
+        "company.create",
+        idempotency_key,
+        payload=company_data,
+        response_model=schemas.CompanyCreateResponse,
+        status_code=status.HTTP_201_CREATED,
+        call=lambda: crud.create_company(db=db, company_data=company_data),
+        subject=idempotency_subject(request),
+    )
 
 
 @router.patch(
     "/update/{company_id}",
     summary="Обновление данных компании",
     description="Запрос изменяет имя и описание компании. "
-    "Доступно только для пользователей с ролью admin",
+    "Доступно только для пользователей с ролью admin. "
+    "С заголовком If-Match (ETag из GET) изменение применяется, только если компанию "
+    "никто не изменил с момента чтения",
     response_model=schemas.UpdateCompanyDto,
     status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(limit_by_ip("write_ip"))],
     responses={
-        202: {"description": "Компания успешно обновлена"},
+        202: {"description": "Компания успешно обновлена, новая версия - в заголовке ETag"},
         404: {"description": "Компания не найдена"},
         400: {"description": "Ошибка при обновлении компании"},
         403: {"description": "Доступ запрещен"},
+        412: {"description": "Компания изменена другим запросом, актуальная версия - в заголовке ETag"},
     },
 )
 async def patch_company(
     company_id: int,
     updated_company: schemas.UpdateCompanyDto,
     client_token: str,
+    response: Response,
     db: AsyncSession = Depends(get_db),
+    if_match: Optional[str] = Header(
+        None, alias="If-Match", description="Версия компании (ETag), на основе которой сделано изменение"
+    ),
 ):
     """
     Обработчик PATCH-запроса для обновления данных компании.
@@ -166,40 +249,53 @@ async def patch_company(
         company_id (int): ID компании, данные которой необходимо обновить.
         updated_company (schemas.UpdateCompanyDto): Новые данные компании.
         client_token (str): Токен доступа клиента для проверки роли администратора.
+        response (Response): Ответ, в заголовок ETag которого пишется новая версия.
         db (AsyncSession): Сессия базы данных.
+        if_match (Optional[str]): Ожидаемая версия компании; без заголовка изменение безусловное.
 
     Returns:
         schemas.UpdateCompanyDto: Обновленные данные компании.
 
     Raises:
         HTTPException: В случае, если компания не найдена, токен невалиден или пользователь не является администратором, выбрасывается исключение с соответствующим кодом состояния.
+            412 - если версия из If-Match устарела.
     """
-    return await crud.update_company_data(
+    company = await crud.update_company_data(
         db,
         company_id=company_id,
         company_data=updated_company,
         client_token=client_token,
+        expected_version=parse_if_match(if_match),
     )
+    response.headers["ETag"] = version_etag(company.version)
+    return company
 
 
 @router.patch(
     "/status_update/{company_id}",
     summary="Обновление статуса компании",
     description="Запрос обновляет статус компании в зависимости от заданного значения."
-    "Доступно только для пользователей с ролью admin",
+    "Доступно только для пользователей с ролью admin. "
+    "Поддерживает If-Match так же, как изменение данных компании",
     response_model=schemas.UpdateCompanyStatusDto,
     status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(limit_by_ip("write_ip"))],
     responses={
-        202: {"description": "Статус компании успешно обновлен"},
+        202: {"description": "Статус компании успешно обновлен, новая версия - в заголовке ETag"},
         401: {"description": "Неверный токен"},
         404: {"description": "Компания не найдена"},
+        412: {"description": "Компания изменена другим запросом, актуальная версия - в заголовке ETag"},
     },
 )
 async def update_status(
     company_id: int,
     company_status: UpdateCompanyStatusDto,
     client_token: str,
+    response: Response,
     db: AsyncSession = Depends(get_db),
+    if_match: Optional[str] = Header(
+        None, alias="If-Match", description="Версия компании (ETag), на основе которой сделано изменение"
+    ),
 ):
     """
     Обработчик PATCH-запроса для обновления статуса компании.
@@ -208,7 +304,9 @@ async def update_status(
         company_id (int): ID компании, статус которой необходимо обновить.
         company_status (UpdateCompanyStatusDto): Новый статус компании.
         client_token (str): Токен доступа клиента для проверки роли администратора.
+        response (Response): Ответ, в заголовок ETag которого пишется новая версия.
         db (AsyncSession): Сессия базы данных.
+        if_match (Optional[str]): Ожидаемая версия компании; без заголовка изменение безусловное.
 
     Returns:
         schemas.UpdateCompanyStatusDto: Обновленный статус компании.
@@ -216,16 +314,18 @@ async def update_status(
     Raises:
         HTTPException: В случае, если компания не найдена, токен невалиден или пользователь не является администратором, выбрасывается исключение с соответствующим кодом состояния.
     """
-    logger.info(f"Обновление статуса компании {company_id} с токеном {client_token}")
+    logger.debug("Обновление статуса компании %s", company_id)
 
     db_company = await crud.update_company_status(
         db,
         company_id=company_id,
         is_active=company_status.is_active,
         client_token=client_token,
+        expected_version=parse_if_match(if_match),
     )
+    response.headers["ETag"] = version_etag(db_company.version)
 
-    logger.info(
-        f"Статус компании {company_id} успешно обновлен на {db_company.is_active}"
+    logger.debug(
+        "Статус компании %s успешно обновлен на %s", company_id, db_company.is_active
     )
     return UpdateCompanyStatusDto(is_active=db_company.is_active)
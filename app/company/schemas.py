@@ -1,10 +1,12 @@
-from typing import Optional
+from dataclasses import dataclass, fields
+from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, Field
 from sqlalchemy import Column, Integer, String, Boolean, DateTime, func
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import relationship
 
-Base = declarative_base()
+from app.database import Base
+from app.employee.schemas import EmployeeResponse
 
 
 class CompanyTable(Base):
@@ -20,6 +22,76 @@ class CompanyTable(Base):
     name = Column(String(100), nullable=False)
     description = Column(String(300))
     deleted_at = Column(DateTime(timezone=True))
+    # Версия для оптимистичной блокировки: растет на каждом изменении, отдается как ETag
+    version = Column(Integer, default=1, server_default="1", nullable=False)
+
+    # Сотрудники удаляются самой БД (ON DELETE CASCADE), ORM их для этого не загружает
+    employees = relationship(
+        "EmployeeTable",
+        back_populates="company",
+        lazy="raise",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        order_by="EmployeeTable.id",
+    )
+
+
+class CompanyStatsTable(Base):
+    """
+    Агрегаты сотрудников по компании.
+
+    Поддерживается триггерами на таблице employee (см. миграцию company_stats),
+    поэтому учитываются любые пути записи, включая массовые вставки.
+    """
+    __tablename__ = "company_stats"
+    company_id = Column(Integer, primary_key=True)
+    employee_count = Column(Integer, default=0, nullable=False)
+    active_count = Column(Integer, default=0, nullable=False)
+    change_timestamp = Column(
+        DateTime(timezone=True), default=func.now(), onupdate=func.now(), nullable=False
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class CompanyRead:
+    """
+    Компания только для чтения.
+
+    Строится напрямую из строки Core-запроса по COMPANY_READ_COLUMNS,
+    минуя identity map и инструментирование ORM. Неизменяема, поэтому
+    один объект безопасно отдавать всем запросам, объединенным singleflight.
+    """
+    id: int
+    name: str
+    description: Optional[str]
+    is_active: bool
+    version: int
+
+
+@dataclass(frozen=True, slots=True)
+class CompanyWithEmployeeCountRead(CompanyRead):
+    employee_count: int
+
+
+@dataclass(frozen=True, slots=True)
+class CompanyWithEmployeesRead(CompanyRead):
+    # Сотрудники в виде, собранном json_agg на стороне PostgreSQL
+    employees: List[Dict[str, Any]]
+
+
+@dataclass(frozen=True, slots=True)
+class CompanyStatsRead:
+    company_id: int
+    name: str
+    is_active: bool
+    employee_count: int
+    active_count: int
+    inactive_count: int
+    active_ratio: float
+
+
+# Колонки в порядке полей CompanyRead: CompanyRead(*row)
+COMPANY_READ_COLUMNS = tuple(getattr(CompanyTable, f.name) for f in fields(CompanyRead))
 
 
 class CompanyCreateRequest(BaseModel):
@@ -37,6 +109,15 @@ class CompanyCreateResponse(BaseModel):
     is_active: bool = Field(
         default=True, description="Статус компании. false = неактивна."
     )
+    version: Optional[int] = Field(None, description="Версия записи, передается в If-Match при изменении")
+
+
+class CompanyWithEmployeesResponse(CompanyCreateResponse):
+    employees: List[EmployeeResponse] = Field(..., description="Сотрудники компании")
+
+
+class CompanyWithEmployeeCountResponse(CompanyCreateResponse):
+    employee_count: int = Field(..., description="Число сотрудников компании")
 
 
 class DeleteCompanyDto(BaseModel):
@@ -53,3 +134,13 @@ class UpdateCompanyStatusDto(BaseModel):
 class UpdateCompanyDto(BaseModel):
     name: Optional[str] = Field(None, description="Название компании")
     description: Optional[str] = Field(None, description="Слоган или описание")
+
+
+class CompanyStatsResponse(BaseModel):
+    company_id: int = Field(..., description="Идентификатор компании")
+    name: str = Field(..., description="Название компании")
+    is_active: bool = Field(..., description="Статус компании. false = неактивна.")
+    employee_count: int = Field(..., description="Всего сотрудников")
+    active_count: int = Field(..., description="Активных сотрудников")
+    inactive_count: int = Field(..., description="Неактивных сотрудников")
+    active_ratio: float = Field(..., description="Доля активных сотрудников (0..1)")
@@ -0,0 +1,111 @@
+import logging
+from uuid import uuid4
+
+from sqlalchemy.ext import asyncio as sa_asyncio
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from app.settings import settings
+from app.utils.query_profiler import install_query_profiler
+from app.utils.radis import close_redis, init_redis
+from app.utils.replicas import Replica, ReplicaRouter
+
+logger = logging.getLogger(__name__)
+
+
+def asyncpg_connect_args() -> dict:
+    """
+    Параметры соединений asyncpg для всех движков приложения.
+
+    За PgBouncer в режиме transaction каждая транзакция может попасть на другое
+    серверное соединение: выражение, подготовленное в одной, в следующей
+    не найдется, а автоматическое имя (__asyncpg_stmt_1__) совпадет с чужим.
+    Поэтому в этом режиме кеши подготовленных выражений выключены,
+    а имена выражений уникальны.
+    """
+    if not settings.db_pgbouncer:
+        return {"prepared_statement_cache_size": settings.db_prepared_statement_cache_size}
+    return {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+    }
+
+
+class Container:
+    """
+    Тяжелые зависимости приложения: движки БД, контекст паролей, Redis.
+
+    Ничего не создается при импорте: движки и CryptContext строятся
+    при первом обращении, обычно в start() из lifespan. Скрипты вне
+    приложения получают их так же - через первое обращение.
+    """
+
+    def __init__(self):
+        self._engine = None
+        self._session_factory = None
+        self._replica_router = None
+        self._pwd_context = None
+
+    def _create_engine(self, uri: str, **kwargs) -> AsyncEngine:
+        # Через атрибут модуля: init_tracing подменяет create_async_engine на трассируемый
+        engine = sa_asyncio.create_async_engine(
+            uri,
+            echo=settings.db_echo,
+            future=True,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+            query_cache_size=settings.db_query_cache_size,
+            connect_args=asyncpg_connect_args(),
+            **kwargs,
+        )
+        install_query_profiler(engine)
+        return engine
+
+    def _init_engine(self):
+        if self._engine is None:
+            self._engine = self._create_engine(settings.db_uri)
+            self._session_factory = async_sessionmaker(self._engine, class_=AsyncSession, expire_on_commit=False)
+
+    @property
+    def engine(self) -> AsyncEngine:
+        self._init_engine()
+        return self._engine
+
+    @property
+    def session_factory(self) -> async_sessionmaker:
+        self._init_engine()
+        return self._session_factory
+
+    @property
+    def replica_router(self) -> ReplicaRouter:
+        if self._replica_router is None:
+            self._replica_router = ReplicaRouter([
+                Replica(self._create_engine(uri, pool_pre_ping=True)) for uri in settings.replica_uris
+            ])
+        return self._replica_router
+
+    @property
+    def pwd_context(self):
+        if self._pwd_context is None:
+            # passlib и bcrypt нужны только для входа и создания пользователей
+            from passlib.context import CryptContext
+            self._pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+        return self._pwd_context
+
+    async def start(self):
+        """Вызывается из lifespan до приема запросов."""
+        self._init_engine()
+        await init_redis()
+        await self.replica_router.start()
+
+    async def stop(self):
+        if self._replica_router is not None:
+            await self._replica_router.stop()
+        await close_redis()
+        if self._engine is not None:
+            await self._engine.dispose()
+
+
+container = Container()
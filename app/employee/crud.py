@@ -1,26 +1,39 @@
 from datetime import date
+from itertools import starmap
+
+from typing import Dict, List, Optional
 
 from fastapi import HTTPException
-from sqlalchemy import select
+from sqlalchemy import Integer, any_, bindparam, lambda_stmt, select, update
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.sql import crud
 from starlette import status
 
 from app.auth.crud import is_user_admin
-from app.auth.jwt import decode_access_token
-from app.company.schemas import CompanyTable
-from app.database import engine
+from app.company.crud import load_company
+from app.container import container
 from app.employee import schemas
-from app.employee.schemas import Base, EmployeeTable, EmployeeCreate
+from app.employee.schemas import Base, EMPLOYEE_READ_COLUMNS, EmployeeTable, EmployeeCreate, EmployeeRead
+from app.outbox.crud import add_outbox_event
+from app.utils.dataloader import get_loader
+from app.utils.etag import precondition_failed
+from app.utils.singleflight import coalesced
+from app.utils.tracing import traced
 
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Запросы на горячем пути чтения - lambda_stmt, см. app.company.crud
+_EMPLOYEE_IDS = bindparam("ids", type_=ARRAY(Integer))
+_EMPLOYEES_BY_IDS = lambda_stmt(
+    lambda: select(*EMPLOYEE_READ_COLUMNS).where(EmployeeTable.id == any_(_EMPLOYEE_IDS))
+)
+
 
 async def create_employee_table():
-    async with engine.begin() as conn:
+    async with container.engine.begin() as conn:
         await conn.run_sync(create_employee_table_sync)
 
 
@@ -28,25 +41,32 @@ def create_employee_table_sync(conn):
     Base.metadata.tables["employee"].create(conn, checkfirst=True)
 
 
+@traced()
+async def _batch_load_employees(
+    db: AsyncSession, employee_ids: List[int]
+) -> Dict[int, EmployeeRead]:
+    # Один запрос на всю пачку: WHERE id = ANY(:ids)
+    result = await db.execute(_EMPLOYEES_BY_IDS, {"ids": employee_ids})
+    return {row.id: EmployeeRead(*row) for row in result}
+
+
+async def load_employee(db: AsyncSession, employee_id: int) -> Optional[EmployeeRead]:
+    """Возвращает сотрудника по ID или None; вызовы в рамках запроса собираются в один SELECT."""
+    loader = get_loader(db, "employee", lambda ids: _batch_load_employees(db, ids))
+    return await loader.load(employee_id)
+
+
+@traced()
+@coalesced
 async def get_employee(db: AsyncSession, employee_id: int):
-    result = await db.execute(
-        select(EmployeeTable).where(EmployeeTable.id == employee_id)
-    )
-    if result is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Не верно введен ID сотрудника. " "Сотрудник не найден",
-        )
-    return result.scalar_one_or_none()  # Возвращает одну запись или None
+    return await load_employee(db, employee_id)  # Возвращает одну запись или None
 
 
+@traced()
 async def create_employee(db: AsyncSession, employee: schemas.EmployeeCreate):
     try:
         # Пытаемся найти компанию по ID
-        company = await db.execute(
-            select(CompanyTable).where(CompanyTable.id == employee.company_id)
-        )
-        company_exists = company.scalar_one_or_none()
+        company_exists = await load_company(db, employee.company_id)
 
         if not company_exists:
             raise HTTPException(
@@ -59,6 +79,10 @@ async def create_employee(db: AsyncSession, employee: schemas.EmployeeCreate):
         # Добавляем сотрудника в сессиию
         db.add(db_employee)
 
+        # Получаем ID сотрудника и пишем событие в outbox в той же транзакции
+        await db.flush()
+        add_outbox_event(db, "employee.created", "employee", db_employee.id, employee.dict())
+
         # Асинхронно коммитим изменения в базе данных
         await db.commit()
 
@@ -176,36 +200,51 @@ async def create_test_employees(db: AsyncSession):
 #         raise HTTPException(status_code=400, detail="Ошибка при обновлении сотрудника") from e
 
 
+@traced()
 async def update_employee(
     db: AsyncSession,
     employee_id: int,
     update_data: schemas.UpdateEmployeeDto,
     client_token: str,
-):
+    expected_version: Optional[int] = None,
+) -> EmployeeRead:
     try:
         # Декодирование токена и проверка роли
         await is_user_admin(client_token)
 
-        # Пытаемся найти сотрудника по ID
-        result = await db.execute(
-            select(EmployeeTable).filter(EmployeeTable.id == employee_id)
+        # Одно выражение UPDATE ... RETURNING вместо чтения, изменения и refresh.
+        # С expected_version (If-Match) строка меняется, только если ее версию
+        # никто не увеличил с момента чтения клиентом - оптимистичная блокировка
+        changes = update_data.dict(exclude_unset=True)
+        query = (
+            update(EmployeeTable)
+            .where(EmployeeTable.id == employee_id)
+            .values(**changes, version=EmployeeTable.version + 1)
+            .returning(*EMPLOYEE_READ_COLUMNS)
+            .execution_options(synchronize_session=False)
         )
-        db_employee = result.scalars().first()
+        if expected_version is not None:
+            query = query.where(EmployeeTable.version == expected_version)
+        row = (await db.execute(query)).first()
 
-        if not db_employee:
-            raise HTTPException(status_code=404, detail="Сотрудник не найден")
+        if row is None:
+            current_version = await db.scalar(
+                select(EmployeeTable.version).where(EmployeeTable.id == employee_id)
+            )
+            if current_version is None:
+                raise HTTPException(status_code=404, detail="Сотрудник не найден")
+            logger.info(
+                "Конфликт версий сотрудника %s: ожидалась %s, текущая %s",
+                employee_id, expected_version, current_version,
+            )
+            raise precondition_failed(current_version)
 
-        # Обновляем поля, которые были переданы в update_data
-        for key, value in update_data.dict(exclude_unset=True).items():
-            setattr(db_employee, key, value)
+        add_outbox_event(db, "employee.updated", "employee", employee_id, changes)
 
         # Асинхронно коммитим изменения в базе данных
         await db.commit()
 
-        # Обновляем объект db_employee данными из базы
-        await db.refresh(db_employee)
-
-        return db_employee
+        return EmployeeRead(*row)
     except IntegrityError as e:
         await db.rollback()  # Откатываем изменения в случае ошибки
         raise HTTPException(
@@ -213,12 +252,11 @@ async def update_employee(
         ) from e
 
 
+@traced()
+@coalesced
 async def get_employees(db: AsyncSession, company_id: int):
     # Пытаемся найти компанию по ID
-    company = await db.execute(
-        select(CompanyTable).where(CompanyTable.id == company_id)
-    )
-    company_exists = company.scalar_one_or_none()
+    company_exists = await load_company(db, company_id)
     if not company_exists:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -226,18 +264,19 @@ async def get_employees(db: AsyncSession, company_id: int):
         )
 
     result = await db.execute(
-        select(EmployeeTable).where(EmployeeTable.company_id == company_id)
+        lambda_stmt(
+            lambda: select(*EMPLOYEE_READ_COLUMNS).where(EmployeeTable.company_id == company_id)
+        )
     )
-    employees = (
-        result.scalars().all()
-    )  # Получаем все записи сотрудников для данной компании
+    # Получаем все записи сотрудников для данной компании
+    employees = list(starmap(EmployeeRead, result.tuples()))
     if not employees:  # Проверяем, есть ли сотрудники
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Сотрудники не найдены для данной компании.",
         )
-    logger.info(
-        f"Retrieved {len(employees)} employees for company ID {company_id}"
+    logger.debug(
+        "Retrieved %s employees for company ID %s", len(employees), company_id
     )  # Отладочная информация
     return employees
 
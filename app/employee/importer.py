@@ -0,0 +1,270 @@
+import asyncio
+import csv
+import logging
+import os
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from itertools import chain
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+from pydantic import ValidationError
+from sqlalchemy import Column, Integer, MetaData, Table, func, insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
+
+from app.company.schemas import CompanyTable
+from app.employee.schemas import EmployeeCreate, EmployeeTable
+from app.outbox.schemas import OutboxTable
+from app.settings import settings
+from app.utils.spreadsheet import SPREADSHEET_FORMATS, SheetRow, SpreadsheetReader
+from app.utils.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# Колонки файла = поля EmployeeCreate, в этом порядке строки идут в COPY
+IMPORT_FIELDS = tuple(EmployeeCreate.model_fields)
+_EMPLOYEE_COLUMNS = {name: EmployeeTable.__table__.c[name] for name in IMPORT_FIELDS}
+
+# Обязательные колонки файла: обязательные поля схемы и NOT NULL колонки без значения по умолчанию
+REQUIRED_FIELDS = tuple(
+    name for name, field in EmployeeCreate.model_fields.items()
+    if field.is_required() or (not _EMPLOYEE_COLUMNS[name].nullable and field.default is None)
+)
+
+# Промежуточная таблица: живет до конца транзакции импорта и видна только ее соединению.
+# Пакеты строк пишутся в нее через COPY, в employee переносятся одним INSERT ... SELECT
+_staging = Table(
+    "employee_import",
+    MetaData(),
+    Column("line", Integer, nullable=False),
+    *(Column(name, column.type) for name, column in _EMPLOYEE_COLUMNS.items()),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+_STAGING_COLUMNS = [column.name for column in _staging.columns]
+
+REPORT_HEADER = ("строка", "поле", "ошибка")
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# ID загруженного файла: uuid4().hex
+UPLOAD_ID = re.compile(r"[0-9a-f]{32}")
+
+ProgressCallback = Callable[[float, Optional[str]], Awaitable[None]]
+
+
+@dataclass(frozen=True, slots=True)
+class ImportResult:
+    rows: int
+    imported: int
+    failed: int
+    seconds: float
+    rows_per_second: float
+
+
+def upload_path(upload_id: str, format: str) -> str:
+    """
+    Путь загруженного файла по его ID.
+
+    Задача импорта получает только ID и формат, а не путь: произвольный путь
+    из параметров задачи позволил бы прочитать и удалить любой файл сервера.
+    """
+    if not UPLOAD_ID.fullmatch(upload_id) or format not in SPREADSHEET_FORMATS.values():
+        raise ValueError(f"Некорректный файл импорта {upload_id!r} ({format!r})")
+    path = os.path.realpath(os.path.join(settings.import_dir, f"{upload_id}.{format}"))
+    if os.path.dirname(path) != os.path.realpath(settings.import_dir):
+        raise ValueError(f"Файл импорта {upload_id!r} вне каталога импорта")
+    return path
+
+
+def error_report_path(job_id: str) -> str:
+    return os.path.join(settings.import_dir, f"{job_id}-errors.csv")
+
+
+def cleanup_import_dir(max_age: float = settings.job_result_ttl):
+    """Удаляет файлы импорта и отчеты старше срока хранения результата задачи."""
+    deadline = time.time() - max_age
+    with os.scandir(settings.import_dir) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.stat().st_mtime < deadline:
+                os.remove(entry.path)
+
+
+async def save_upload(file: UploadFile, format: str) -> str:
+    """
+    Сохраняет загруженный файл в settings.import_dir частями по UPLOAD_CHUNK_SIZE
+    и возвращает его ID (путь - upload_path).
+
+    Файл должен пережить запрос: импорт выполняет фоновая задача,
+    возможно в другом процессе. Больше settings.import_max_file_size - 413.
+    """
+    os.makedirs(settings.import_dir, exist_ok=True)
+    await asyncio.to_thread(cleanup_import_dir)
+    upload_id = uuid.uuid4().hex
+    path = upload_path(upload_id, format)
+    size = 0
+    try:
+        with open(path, "wb") as out:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > settings.import_max_file_size:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"Файл больше {settings.import_max_file_size // (1024 * 1024)} МБ",
+                    )
+                await asyncio.to_thread(out.write, chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return upload_id
+
+
+def _row_errors(line: int, values: Dict[str, Any]) -> Tuple[Optional[tuple], List[tuple]]:
+    """Проверка строки схемой EmployeeCreate и ограничениями колонок employee."""
+    try:
+        # Пустая ячейка - поле не задано: действует значение по умолчанию схемы
+        employee = EmployeeCreate.model_validate(
+            {name: value for name, value in values.items() if value is not None}
+        )
+    except ValidationError as e:
+        return None, [
+            (line, ".".join(map(str, error["loc"])) or "-", error["msg"])
+            for error in e.errors(include_url=False)
+        ]
+
+    record = [line]
+    errors = []
+    for name, column in _EMPLOYEE_COLUMNS.items():
+        value = getattr(employee, name)
+        if value is None and not column.nullable:
+            errors.append((line, name, "Обязательное поле"))
+        elif isinstance(value, str) and column.type.length and len(value) > column.type.length:
+            errors.append((line, name, f"Длиннее {column.type.length} символов"))
+        record.append(value)
+    return (None if errors else tuple(record)), errors
+
+
+def _read_batch(rows: Iterator[SheetRow], size: int, report) -> Tuple[List[tuple], int]:
+    """
+    Читает и проверяет до size строк. Ошибки сразу пишутся в отчет.
+
+    Блокирующая: разбор файла и валидация выполняются в потоке (asyncio.to_thread),
+    event loop в это время обслуживает запросы.
+    """
+    records = []
+    read = 0
+    for line, values in rows:
+        read += 1
+        record, errors = _row_errors(line, values)
+        if record is not None:
+            records.append(record)
+        report.writerows(errors)
+        if read >= size:
+            break
+    return records, read
+
+
+def _merge_statement():
+    """
+    Перенос строк из промежуточной таблицы в employee одним выражением.
+
+    Строки с несуществующей компанией отсекает JOIN; для каждого
+    добавленного сотрудника в той же транзакции пишется событие
+    employee.created в outbox, как при создании через /employee/create.
+    """
+    known = (
+        select(*(_staging.c[name] for name in IMPORT_FIELDS))
+        .join(CompanyTable, CompanyTable.id == _staging.c.company_id)
+        .order_by(_staging.c.line)
+    )
+    imported = (
+        insert(EmployeeTable.__table__)
+        .from_select(IMPORT_FIELDS, known)
+        .returning(EmployeeTable.__table__.c.id, *_EMPLOYEE_COLUMNS.values())
+        .cte("imported")
+    )
+    payload = func.jsonb_build_object(*chain.from_iterable((literal(name), imported.c[name]) for name in IMPORT_FIELDS))
+    events = (
+        insert(OutboxTable.__table__)
+        .from_select(
+            ["event_type", "aggregate_type", "aggregate_id", "payload", "attempts"],
+            select(literal("employee.created"), literal("employee"), imported.c.id, payload, literal(0)),
+        )
+        .cte("events")
+    )
+    return select(func.count()).select_from(imported).add_cte(events)
+
+
+@traced()
+async def import_employees(
+    db: AsyncSession,
+    reader: SpreadsheetReader,
+    report_path: str,
+    batch_size: int = settings.import_batch_size,
+    progress: Optional[ProgressCallback] = None,
+) -> ImportResult:
+    """
+    Импорт сотрудников из таблицы в рамках текущей транзакции db (коммит - у вызывающего).
+
+    Файл читается пакетами по batch_size строк, поэтому память не растет
+    с размером файла. Проверенные строки пакета уходят в промежуточную
+    таблицу через COPY (asyncpg copy_records_to_table), затем все разом
+    переносятся в employee. Строки с ошибками в employee не попадают и
+    записываются в CSV-отчет report_path (строка файла, поле, ошибка).
+    """
+    missing = [name for name in REQUIRED_FIELDS if name not in reader.header]
+    if missing:
+        raise ValueError(f"В файле нет обязательных колонок: {', '.join(missing)}")
+
+    started = time.perf_counter()
+    conn = await db.connection()
+    await conn.run_sync(_staging.create)
+    # COPY идет по тому же соединению, что и сессия, - внутри ее транзакции
+    raw = (await conn.get_raw_connection()).driver_connection
+
+    rows = iter(reader)
+    total = failed = 0
+    with open(report_path, "w", encoding="utf-8-sig", newline="") as report_file:
+        report = csv.writer(report_file)
+        report.writerow(REPORT_HEADER)
+
+        while True:
+            records, read = await asyncio.to_thread(_read_batch, rows, batch_size, report)
+            if not read:
+                break
+            if records:
+                await raw.copy_records_to_table(_staging.name, records=records, columns=_STAGING_COLUMNS)
+            total += read
+            failed += read - len(records)
+            if progress is not None:
+                await progress(reader.progress() * 90, f"Прочитано строк: {total}, с ошибками: {failed}")
+
+        # Компании проверяются одним запросом по всей промежуточной таблице, а не на каждой строке
+        unknown = await db.stream(
+            select(_staging.c.line, _staging.c.company_id)
+            .where(~select(CompanyTable.id).where(CompanyTable.id == _staging.c.company_id).exists())
+            .order_by(_staging.c.line)
+        )
+        async for line, company_id in unknown:
+            report.writerow((line, "company_id", f"Компания с ID {company_id} не найдена"))
+            failed += 1
+
+        if progress is not None:
+            await progress(90, "Перенос в таблицу сотрудников")
+        imported = await db.scalar(_merge_statement())
+
+    if not failed:
+        os.remove(report_path)
+
+    seconds = time.perf_counter() - started
+    result = ImportResult(
+        rows=total,
+        imported=imported,
+        failed=failed,
+        seconds=round(seconds, 3),
+        rows_per_second=round(total / seconds) if seconds else 0,
+    )
+    logger.info("Импорт сотрудников: %s строк, добавлено %s, с ошибками %s, %s строк/с",
+                result.rows, result.imported, result.failed, result.rows_per_second)
+    return result
@@ -1,11 +1,21 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends
+import os
+
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Request, Response, UploadFile
+from fastapi.responses import FileResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
-from . import crud, schemas
-from ..database import get_db
+from . import crud, importer, schemas
+from ..auth.crud import is_user_admin
+from ..database import get_db, get_read_db
+from ..jobs.crud import enqueue_job, get_user_job
+from ..jobs.schemas import JobEnqueuedResponse
+from ..utils.etag import parse_if_match, version_etag
+from ..utils.idempotency import idempotency_subject, idempotent
+from ..utils.rate_limit import limit_by_ip
+from ..utils.spreadsheet import SPREADSHEET_FORMATS, spreadsheet_format
 
 router = APIRouter(prefix="/employee", tags=["employee"])
 
@@ -17,13 +27,15 @@ router = APIRouter(prefix="/employee", tags=["employee"])
     status_code=status.HTTP_200_OK,
     response_model=schemas.EmployeeResponse,
     responses={
-        200: {"description": "Сотрудник найден"},
+        200: {"description": "Сотрудник найден, версия - в заголовке ETag"},
         404: {"description": "Сотрудник не найден"},
         422: {"description": "Ошибка валидации"},
     },
 )
-async def read_employee(employee_id: int, db: AsyncSession = Depends(get_db)):
+async def read_employee(employee_id: int, response: Response, db: AsyncSession = Depends(get_read_db)):
     employee = await crud.get_employee(db, employee_id=employee_id)
+    if employee is not None:
+        response.headers["ETag"] = version_etag(employee.version)
     return employee
 
 
@@ -32,17 +44,32 @@ async def read_employee(employee_id: int, db: AsyncSession = Depends(get_db)):
     summary="Создание сотрудника",
     description="Запрос создает сотрудника с заданными параметрами",
     status_code=status.HTTP_200_OK,
+    dependencies=[Depends(limit_by_ip("write_ip"))],
     response_model=schemas.EmployeeResponse,
     responses={
         200: {"description": "Сотрудник создан"},
         404: {"description": "Сотрудник не создан или создан с ошибкой"},
+        409: {"description": "Запрос с этим Idempotency-Key еще выполняется"},
         422: {"description": "Ошибка валидации"},
     },
 )
 async def create_employee(
-    employee: schemas.EmployeeCreate, db: AsyncSession = Depends(get_db)
+    employee: schemas.EmployeeCreate,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    idempotency_key: Optional[str] = Header(
+        None, alias="Idempotency-Key", description="Ключ для безопасного повтора запроса"
+    ),
 ):
-    new_employee = await crud.create_employee(db=db, employee=employee)
+    new_employee = await idempotent(
+        "employee.create",
+        idempotency_key,
+        payload=employee,
+        response_model=schemas.EmployeeResponse,
+        status_code=status.HTTP_200_OK,
+        call=lambda: crud.create_employee(db=db, employee=employee),
+        subject=idempotency_subject(request),
+    )
     return new_employee
 
 
@@ -58,7 +85,7 @@ async def create_employee(
         422: {"description": "Ошибка валидации"},
     },
 )
-async def get_list_employee(company_id: int, db: AsyncSession = Depends(get_db)):
+async def get_list_employee(company_id: int, db: AsyncSession = Depends(get_read_db)):
     employees = await crud.get_employees(db, company_id=company_id)
     return employees
 
@@ -66,12 +93,16 @@ async def get_list_employee(company_id: int, db: AsyncSession = Depends(get_db))
 @router.patch(
     "/change/{employee_id}",
     summary="Изменение информации о сотруднике",
-    description="Запрос изменяет данные сотрудника",
+    description="Запрос изменяет данные сотрудника. "
+    "С заголовком If-Match (ETag из GET) изменение применяется, только если сотрудника "
+    "никто не изменил с момента чтения",
     status_code=status.HTTP_200_OK,
+    dependencies=[Depends(limit_by_ip("write_ip"))],
     response_model=schemas.EmployeeResponse,
     responses={
-        200: {"description": "Информация изменена"},
+        200: {"description": "Информация изменена, новая версия - в заголовке ETag"},
         404: {"description": "Сотрудник не найден"},
+        412: {"description": "Сотрудник изменен другим запросом, актуальная версия - в заголовке ETag"},
         422: {"description": "Ошибка валидации"},
     },
 )
@@ -79,11 +110,77 @@ async def update_employee(
     employee_id: int,
     client_token: str,
     updated_employee: schemas.UpdateEmployeeDto,
+    response: Response,
     db: AsyncSession = Depends(get_db),
+    if_match: Optional[str] = Header(
+        None, alias="If-Match", description="Версия сотрудника (ETag), на основе которой сделано изменение"
+    ),
 ):
-    return await crud.update_employee(
+    employee = await crud.update_employee(
         db,
         employee_id=employee_id,
         update_data=updated_employee,
         client_token=client_token,
+        expected_version=parse_if_match(if_match),
     )
+    response.headers["ETag"] = version_etag(employee.version)
+    return employee
+
+
+@router.post(
+    "/import",
+    summary="Массовый импорт сотрудников из CSV/XLSX",
+    description="Загружает таблицу сотрудников и запускает фоновую задачу импорта.\n"
+                "Первая строка - заголовки с именами полей как в /employee/create "
+                f"({', '.join(importer.IMPORT_FIELDS)}), обязательные: {', '.join(importer.REQUIRED_FIELDS)}. "
+                "CSV в UTF-8, разделитель , ; или табуляция.\n"
+                "Ход выполнения и итог - в GET /jobs/{job_id}; строки с ошибками не импортируются "
+                "и попадают в отчет GET /employee/import/{job_id}/errors.",
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(limit_by_ip("write_ip"))],
+    response_model=JobEnqueuedResponse,
+    responses={
+        202: {"description": "Файл принят, импорт поставлен в очередь"},
+        403: {"description": "Доступ запрещен"},
+        413: {"description": "Файл слишком большой"},
+        415: {"description": "Формат файла не поддерживается"},
+    },
+)
+async def import_employees(client_token: str, file: UploadFile = File(..., description="Файл .csv или .xlsx")):
+    decode = await is_user_admin(client_token)
+    file_format = spreadsheet_format(file.filename)
+    if file_format is None:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Поддерживаются файлы {', '.join(SPREADSHEET_FORMATS)}",
+        )
+    upload_id = await importer.save_upload(file, file_format)
+    try:
+        job_id = await enqueue_job("import", {"upload_id": upload_id, "format": file_format},
+                                   owner=decode["user_login"])
+    except BaseException:
+        os.remove(importer.upload_path(upload_id, file_format))
+        raise
+    return JobEnqueuedResponse(job_id=job_id, status="queued", status_url=f"/jobs/{job_id}")
+
+
+@router.get(
+    "/import/{job_id}/errors",
+    summary="Отчет об ошибках импорта",
+    description="CSV со строками файла, не прошедшими проверку: номер строки, поле и описание ошибки.",
+    status_code=status.HTTP_200_OK,
+    response_class=FileResponse,
+    responses={
+        200: {"description": "Отчет", "content": {"text/csv": {}}},
+        403: {"description": "Доступ запрещен"},
+        404: {"description": "Задача не найдена (или чужая), еще не завершена или ошибок не было"},
+    },
+)
+async def read_import_errors(job_id: str, client_token: str):
+    job = await get_user_job(job_id, client_token)
+    if job["operation"] != "import" or job["status"] not in ("succeeded", "failed"):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Завершенный импорт не найден")
+    path = importer.error_report_path(job["id"])
+    if not os.path.exists(path):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Ошибок при импорте не было")
+    return FileResponse(path, media_type="text/csv", filename=f"import-{job['id']}-errors.csv")
@@ -1,11 +1,12 @@
+from dataclasses import dataclass, fields
 from datetime import date
 from typing import Optional
 
 from pydantic import BaseModel, Field, EmailStr
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, func, DATE
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import Column, ForeignKey, Integer, String, Boolean, DateTime, func, DATE
+from sqlalchemy.orm import relationship
 
-Base = declarative_base()
+from app.database import Base
 
 
 class EmployeeTable(Base):
@@ -24,7 +25,37 @@ class EmployeeTable(Base):
     phone = Column(String(15), nullable=False)
     email = Column(String(256))
     birthdate = Column(DATE)
-    company_id = Column(Integer, nullable=False)
+    company_id = Column(Integer, ForeignKey("company.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Версия для оптимистичной блокировки: растет на каждом изменении, отдается как ETag
+    version = Column(Integer, default=1, server_default="1", nullable=False)
+
+    # lazy="raise": неявная подгрузка в async-коде невозможна, загружать явно (selectinload/joinedload)
+    company = relationship("CompanyTable", back_populates="employees", lazy="raise")
+
+
+@dataclass(frozen=True, slots=True)
+class EmployeeRead:
+    """
+    Сотрудник только для чтения.
+
+    Строится напрямую из строки Core-запроса по EMPLOYEE_READ_COLUMNS:
+    без identity map и отслеживания изменений ORM, поэтому заметно дешевле
+    EmployeeTable на больших списках. Для изменений по-прежнему EmployeeTable.
+    """
+    id: int
+    first_name: str
+    last_name: str
+    middle_name: Optional[str]
+    company_id: int
+    email: Optional[str]
+    phone: str
+    birthdate: Optional[date]
+    is_active: bool
+    version: int
+
+
+# Колонки в порядке полей EmployeeRead: EmployeeRead(*row)
+EMPLOYEE_READ_COLUMNS = tuple(getattr(EmployeeTable, f.name) for f in fields(EmployeeRead))
 
 
 class EmployeeCreate(BaseModel):
@@ -52,6 +83,7 @@ class EmployeeResponse(BaseModel):
     is_active: bool = Field(
         default=True, description="Статус сотрудника. false = неактивен."
     )
+    version: Optional[int] = Field(None, description="Версия записи, передается в If-Match при изменении")
 
 
 class UpdateEmployeeDto(BaseModel):
@@ -0,0 +1,227 @@
+import json
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException
+from starlette import status
+
+from app.auth.crud import is_superadmin, is_user_admin
+from app.settings import settings
+from app.utils.radis import get_redis, redis_pipeline
+
+logger = logging.getLogger(__name__)
+
+# Очередь идентификаторов задач: постановка LPUSH, выборка с правого края (FIFO).
+# Взятая задача до завершения лежит в списке выполняемых: если процесс упадет,
+# она не потеряется, а вернется в очередь по отсутствию пульса (requeue_stale)
+QUEUE_KEY = "jobs:queue"
+PROCESSING_KEY = "jobs:processing"
+# Сигналы свободным воркерам: постановка в очередь кладет сюда отметку, воркер ждет ее BLPOP.
+# Сама задача берется скриптом CLAIM_LUA, лишние отметки только будят воркер впустую
+WAKEUP_KEY = "jobs:wakeup"
+WAKEUP_MAX = 100
+
+# Взятие задачи одним скриптом: перенос ID в список выполняемых и отметка запуска
+# с пульсом атомарны, поэтому в списке выполняемых не бывает задачи без пульса.
+# KEYS[1] - очередь, KEYS[2] - выполняемые; ARGV: префикс ключа задачи, started_at, пульс.
+# Возвращает ID задачи или false, если очередь пуста.
+CLAIM_LUA = """
+local job_id = redis.call('LMOVE', KEYS[1], KEYS[2], 'RIGHT', 'LEFT')
+if not job_id then
+    return false
+end
+local key = ARGV[1] .. job_id
+redis.call('HSET', key, 'status', 'running', 'started_at', ARGV[2], 'heartbeat', ARGV[3])
+redis.call('HINCRBY', key, 'attempts', 1)
+return job_id
+"""
+
+
+def _job_key(job_id: str) -> str:
+    return f"job:{job_id}"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _wake(pipe):
+    """Добавляет в pipe сигнал свободному воркеру; список сигналов ограничен WAKEUP_MAX."""
+    pipe.lpush(WAKEUP_KEY, 1)
+    pipe.ltrim(WAKEUP_KEY, 0, WAKEUP_MAX - 1)
+
+
+def _decode(raw: Dict[bytes, bytes]) -> Dict[str, Any]:
+    job = {key.decode(): value.decode() for key, value in raw.items()}
+    job["params"] = json.loads(job.get("params") or "{}")
+    job["result"] = json.loads(job["result"]) if job.get("result") else None
+    job["progress"] = float(job.get("progress") or 0)
+    job["attempts"] = int(job.get("attempts") or 0)
+    return job
+
+
+async def enqueue_job(operation: str, params: Optional[Dict[str, Any]] = None, owner: str = "") -> str:
+    """
+    Создает задачу и ставит ее в очередь. Возвращает идентификатор для GET /jobs/{id}.
+
+    owner - логин поставившего задачу: читать состояние и результат может только он
+    (и суперадмин), см. get_user_job.
+    """
+    job_id = uuid.uuid4().hex
+    async with redis_pipeline(transaction=True) as pipe:
+        pipe.hset(_job_key(job_id), mapping={
+            "id": job_id,
+            "operation": operation,
+            "owner": owner,
+            "params": json.dumps(params or {}, ensure_ascii=False),
+            "status": "queued",
+            "progress": 0,
+            "attempts": 0,
+            "created_at": _now(),
+        })
+        pipe.lpush(QUEUE_KEY, job_id)
+        _wake(pipe)
+    logger.info("Задача %s (%s) поставлена в очередь", job_id, operation)
+    return job_id
+
+
+async def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    client = await get_redis()
+    raw = await client.hgetall(_job_key(job_id))
+    return _decode(raw) if raw else None
+
+
+async def get_user_job(job_id: str, client_token: str) -> Dict[str, Any]:
+    """
+    Задача, доступная владельцу токена: своя или любая для суперадмина.
+
+    Чужая задача неотличима от несуществующей (404): результат может
+    содержать персональные данные, например выгрузка export.
+    """
+    decode = await is_user_admin(client_token)
+    job = await get_job(job_id)
+    if job is None or not (is_superadmin(decode) or job.get("owner") == decode["user_login"]):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Задача не найдена")
+    return job
+
+
+async def _claim(client) -> Optional[str]:
+    job_id = await client.eval(CLAIM_LUA, 2, QUEUE_KEY, PROCESSING_KEY, _job_key(""), _now(), time.time())
+    return job_id.decode() if job_id else None
+
+
+async def claim_job(timeout: float) -> Optional[Dict[str, Any]]:
+    """
+    Берет следующую задачу из очереди, ожидая до timeout секунд.
+
+    CLAIM_LUA атомарно переносит идентификатор в список выполняемых,
+    поэтому одну задачу не возьмут два воркера. Пустая очередь - ожидание
+    сигнала WAKEUP_KEY (BLPOP) и повторная попытка.
+    """
+    client = await get_redis()
+    job_id = await _claim(client)
+    if job_id is None and await client.blpop([WAKEUP_KEY], timeout):
+        job_id = await _claim(client)
+    if job_id is None:
+        return None
+    job = await get_job(job_id)
+    if job is None or "operation" not in job:
+        # Состояние задачи истекло или удалено - выполнять нечего
+        await client.lrem(PROCESSING_KEY, 1, job_id)
+        await client.delete(_job_key(job_id))
+        return None
+    return job
+
+
+async def heartbeat(job_id: str):
+    client = await get_redis()
+    await client.hset(_job_key(job_id), "heartbeat", time.time())
+
+
+async def set_progress(job_id: str, percent: float, message: Optional[str] = None):
+    mapping = {"progress": round(min(max(percent, 0), 100), 1), "heartbeat": time.time()}
+    if message is not None:
+        mapping["message"] = message
+    client = await get_redis()
+    await client.hset(_job_key(job_id), mapping=mapping)
+
+
+async def _finish(job_id: str, mapping: Dict[str, Any]):
+    async with redis_pipeline(transaction=True) as pipe:
+        pipe.hset(_job_key(job_id), mapping={**mapping, "finished_at": _now()})
+        pipe.hdel(_job_key(job_id), "heartbeat")
+        pipe.expire(_job_key(job_id), settings.job_result_ttl)
+        pipe.lrem(PROCESSING_KEY, 1, job_id)
+
+
+async def complete_job(job_id: str, result: Any):
+    await _finish(job_id, {
+        "status": "succeeded",
+        "progress": 100,
+        "result": json.dumps(result, ensure_ascii=False),
+    })
+
+
+async def fail_job(job_id: str, error: str):
+    await _finish(job_id, {"status": "failed", "error": error[:2000]})
+
+
+async def requeue_job(job_id: str) -> bool:
+    """
+    Возвращает выполняемую задачу в начало очереди (следующей на выполнение).
+
+    Переносит только если задача еще в списке выполняемых: LREM атомарен,
+    поэтому при одновременном вызове из нескольких воркеров вернет один.
+    """
+    client = await get_redis()
+    if not await client.lrem(PROCESSING_KEY, 1, job_id):
+        return False
+    async with redis_pipeline(transaction=True) as pipe:
+        pipe.hset(_job_key(job_id), mapping={"status": "queued", "message": "Возвращена в очередь"})
+        pipe.hdel(_job_key(job_id), "heartbeat")
+        pipe.rpush(QUEUE_KEY, job_id)
+        _wake(pipe)
+    return True
+
+
+async def requeue_stale() -> int:
+    """
+    Находит выполняемые задачи без пульса дольше settings.job_stale_after
+    (процесс упал или был убит) и возвращает их в очередь.
+
+    После settings.job_max_attempts запусков задача помечается как failed.
+    """
+    client = await get_redis()
+    deadline = time.time() - settings.job_stale_after
+    requeued = 0
+    for raw_id in await client.lrange(PROCESSING_KEY, 0, -1):
+        job_id = raw_id.decode()
+        status, beat, attempts = await client.hmget(_job_key(job_id), "status", "heartbeat", "attempts")
+        if status is None:
+            # Состояние истекло - в списке остался только идентификатор
+            await client.lrem(PROCESSING_KEY, 1, job_id)
+            continue
+        # Задача берется вместе с пульсом (CLAIM_LUA), поэтому выполняемая задача
+        # без пульса - тоже брошенная: ее пульс никто уже не обновит
+        if beat is not None and float(beat) >= deadline:
+            continue
+        if int(attempts or 0) >= settings.job_max_attempts:
+            logger.error("Задача %s брошена после %s запусков", job_id, int(attempts or 0))
+            await fail_job(job_id, "Задача прервана: процесс-исполнитель остановился")
+        elif await requeue_job(job_id):
+            logger.warning("Задача %s без пульса возвращена в очередь", job_id)
+            requeued += 1
+    return requeued
+
+
+class JobContext:
+    """Передается операции: идентификатор задачи и отчет о прогрессе."""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+
+    async def progress(self, percent: float, message: Optional[str] = None):
+        await set_progress(self.job_id, percent, message)
@@ -0,0 +1,86 @@
+import logging
+import os
+from typing import List
+
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import FileResponse
+
+from . import crud
+from .operations import export_path, is_public_operation, operation_names
+from .schemas import JobCreateRequest, JobEnqueuedResponse, JobResponse
+from ..auth.crud import is_user_superadmin
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix='/jobs', tags=["jobs"])
+
+
+@router.get("/operations",
+            summary="Доступные операции",
+            description="Имена операций, которые можно поставить в очередь через POST /jobs.",
+            response_model=List[str],
+            status_code=status.HTTP_200_OK,
+            responses={
+                200: {"description": "Список операций"},
+                403: {"description": "Доступ запрещен"}
+            })
+async def list_operations(client_token: str):
+    await is_user_superadmin(client_token)
+    return operation_names()
+
+
+@router.post("",
+             summary="Запустить фоновую задачу",
+             description="Ставит долгую операцию в очередь и сразу возвращает ID задачи.\n"
+                         "Состояние, прогресс и результат - в GET /jobs/{job_id}.",
+             response_model=JobEnqueuedResponse,
+             status_code=status.HTTP_202_ACCEPTED,
+             responses={
+                 202: {"description": "Задача поставлена в очередь"},
+                 400: {"description": "Неизвестная операция"},
+                 403: {"description": "Доступ запрещен"}
+             })
+async def create_job(job: JobCreateRequest, client_token: str):
+    decode = await is_user_superadmin(client_token)
+    if not is_public_operation(job.operation):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Неизвестная операция {job.operation}. Доступны: {', '.join(operation_names())}"
+        )
+    job_id = await crud.enqueue_job(job.operation, job.params, owner=decode["user_login"])
+    return JobEnqueuedResponse(job_id=job_id, status="queued", status_url=f"/jobs/{job_id}")
+
+
+@router.get("/{job_id}",
+            summary="Состояние фоновой задачи",
+            description="Статус, прогресс и результат задачи. Доступна поставившему ее "
+                        "администратору и суперадмину. "
+                        "Завершенные задачи хранятся settings.job_result_ttl секунд.",
+            response_model=JobResponse,
+            status_code=status.HTTP_200_OK,
+            responses={
+                200: {"description": "Задача найдена"},
+                403: {"description": "Доступ запрещен"},
+                404: {"description": "Задача не найдена или срок хранения истек"}
+            })
+async def read_job(job_id: str, client_token: str):
+    return await crud.get_user_job(job_id, client_token)
+
+
+@router.get("/{job_id}/download",
+            summary="Скачать выгрузку",
+            description="Файл JSON Lines завершенной задачи export: строка - компания с сотрудниками. "
+                        "Доступен поставившему задачу и суперадмину.",
+            response_class=FileResponse,
+            status_code=status.HTTP_200_OK,
+            responses={
+                200: {"description": "Файл выгрузки", "content": {"application/x-ndjson": {}}},
+                403: {"description": "Доступ запрещен"},
+                404: {"description": "Выгрузка не найдена или срок хранения истек"}
+            })
+async def download_job_result(job_id: str, client_token: str):
+    job = await crud.get_user_job(job_id, client_token)
+    path = export_path(job["id"])
+    if job["operation"] != "export" or job["status"] != "succeeded" or not os.path.exists(path):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Выгрузка не найдена")
+    return FileResponse(path, media_type="application/x-ndjson", filename=f"export-{job['id']}.jsonl")
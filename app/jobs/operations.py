@@ -0,0 +1,194 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import suppress
+from dataclasses import asdict
+from itertools import starmap
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import Integer, any_, bindparam, func, select
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from app.company.crud import create_company_table_sync, create_test_companies
+from app.company.schemas import COMPANY_READ_COLUMNS, CompanyRead, CompanyTable
+from app.container import container
+from app.employee.crud import create_employee_table_sync, create_test_employees
+from app.employee.importer import error_report_path, import_employees, upload_path
+from app.employee.schemas import EMPLOYEE_READ_COLUMNS, EmployeeRead, EmployeeTable
+from app.jobs.crud import JobContext
+from app.settings import settings
+from app.superadmin.crud import delete_all_tables
+from app.users.crud import create_test_users, create_users_table_sync
+from app.utils.spreadsheet import SpreadsheetReader
+
+logger = logging.getLogger(__name__)
+
+# Операция получает JobContext и параметры задачи, возвращает JSON-совместимый результат
+JobOperation = Callable[..., Awaitable[Any]]
+
+_operations: Dict[str, JobOperation] = {}
+# Операции, которые можно поставить через POST /jobs; остальные ставит только свой эндпоинт
+_public_operations: Set[str] = set()
+
+
+def register_operation(name: str, public: bool = True):
+    """Декоратор регистрации операции фоновой задачи."""
+    def decorator(func: JobOperation) -> JobOperation:
+        _operations[name] = func
+        if public:
+            _public_operations.add(name)
+        return func
+    return decorator
+
+
+def get_operation(name: str) -> Optional[JobOperation]:
+    return _operations.get(name)
+
+
+def is_public_operation(name: str) -> bool:
+    return name in _public_operations
+
+
+def operation_names() -> List[str]:
+    """Операции, доступные через POST /jobs."""
+    return sorted(_public_operations)
+
+
+@register_operation("reseed")
+async def reseed(ctx: JobContext):
+    """Очистка таблиц, создание недостающих и тестовые данные (по /magic/delete_create_all)."""
+    async with container.session_factory() as db:
+        await ctx.progress(0, "Очистка таблиц")
+        await delete_all_tables(db)
+
+        await ctx.progress(10, "Создание таблиц")
+        async with container.engine.begin() as conn:
+            await conn.run_sync(create_users_table_sync)
+            await conn.run_sync(create_company_table_sync)
+            await conn.run_sync(create_employee_table_sync)
+
+        await ctx.progress(20, "Тестовые компании")
+        await create_test_companies(db)
+        # Пользователи - дольше всего: bcrypt на каждый пароль
+        await ctx.progress(30, "Тестовые пользователи")
+        await create_test_users(db)
+        await ctx.progress(80, "Тестовые сотрудники")
+        await create_test_employees(db)
+        await db.commit()
+    return {"message": "Все снесено и пересоздано - ты красава, "
+                       "но не увлекайся этой темной магией."}
+
+
+def export_path(job_id: str) -> str:
+    return os.path.join(settings.export_dir, f"{job_id}.jsonl")
+
+
+def cleanup_export_dir(max_age: float = settings.job_result_ttl):
+    """Удаляет выгрузки старше срока хранения результата задачи."""
+    deadline = time.time() - max_age
+    with os.scandir(settings.export_dir) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.stat().st_mtime < deadline:
+                os.remove(entry.path)
+
+
+@register_operation("export")
+async def export_companies(ctx: JobContext, active_only: Optional[bool] = None, batch_size: int = 500):
+    """
+    Выгрузка компаний вместе с сотрудниками в файл JSON Lines: строка - компания.
+
+    Компании читаются страницами по ID (keyset), сотрудники страницы - одним
+    запросом, и каждая страница сразу дописывается в файл settings.export_dir.
+    Память и транзакция ограничены одной страницей; в результате задачи -
+    только число компаний и адрес скачивания GET /jobs/{job_id}/download.
+    """
+    companies_query = select(*COMPANY_READ_COLUMNS).order_by(CompanyTable.id).limit(batch_size)
+    total_query = select(func.count()).select_from(CompanyTable)
+    if active_only is not None:
+        companies_query = companies_query.where(CompanyTable.is_active == active_only)
+        total_query = total_query.where(CompanyTable.is_active == active_only)
+    employees_query = (
+        select(*EMPLOYEE_READ_COLUMNS)
+        .where(EmployeeTable.company_id == any_(bindparam("ids", type_=ARRAY(Integer))))
+        .order_by(EmployeeTable.id)
+    )
+
+    os.makedirs(settings.export_dir, exist_ok=True)
+    await asyncio.to_thread(cleanup_export_dir)
+    path = export_path(ctx.job_id)
+    # Пишем во временный файл: недописанная выгрузка не будет отдана на скачивание
+    partial_path = path + ".partial"
+    exported = 0
+    last_id = 0
+    try:
+        with open(partial_path, "w", encoding="utf-8") as out:
+            async with container.session_factory() as db:
+                total = await db.scalar(total_query)
+                while True:
+                    result = await db.execute(companies_query.where(CompanyTable.id > last_id))
+                    companies = list(starmap(CompanyRead, result.tuples()))
+                    if not companies:
+                        break
+                    employees: Dict[int, list] = {company.id: [] for company in companies}
+                    result = await db.execute(employees_query, {"ids": list(employees)})
+                    for employee in starmap(EmployeeRead, result.tuples()):
+                        employees[employee.company_id].append(asdict(employee))
+                    lines = "".join(
+                        json.dumps({**asdict(company), "employees": employees[company.id]},
+                                   ensure_ascii=False, default=jsonable_encoder) + "\n"
+                        for company in companies
+                    )
+                    await asyncio.to_thread(out.write, lines)
+                    exported += len(companies)
+                    last_id = companies[-1].id
+                    # Транзакция на страницу: снимок не держится всю выгрузку
+                    await db.commit()
+                    await ctx.progress(exported / total * 100 if total else 100,
+                                       f"Выгружено компаний: {exported} из {total}")
+        os.replace(partial_path, path)
+    except BaseException:
+        _discard(partial_path)
+        raise
+    return {"count": exported, "download_url": f"/jobs/{ctx.job_id}/download"}
+
+
+def _discard(path: str):
+    with suppress(FileNotFoundError):
+        os.remove(path)
+
+
+@register_operation("import", public=False)
+async def import_employees_file(ctx: JobContext, upload_id: str, format: str,
+                                batch_size: int = settings.import_batch_size):
+    """
+    Импорт сотрудников из загруженного CSV/XLSX (POST /employee/import).
+
+    Ставится только эндпоинтом загрузки: файл задается ID загрузки в settings.import_dir.
+
+    Все строки добавляются одной транзакцией: при ошибке БД в employee не попадет ничего.
+    Файл удаляется после выполнения; если задачу прервала остановка воркера,
+    файл остается для перезапуска (старые файлы удалит cleanup_import_dir).
+    """
+    path = upload_path(upload_id, format)
+    report_path = error_report_path(ctx.job_id)
+    try:
+        reader = await asyncio.to_thread(SpreadsheetReader, path, format)
+        try:
+            async with container.session_factory() as db:
+                result = await import_employees(db, reader, report_path, batch_size, ctx.progress)
+                await db.commit()
+        finally:
+            reader.close()
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        _discard(path)
+        raise
+    _discard(path)
+    return {
+        **asdict(result),
+        "error_report": f"/employee/import/{ctx.job_id}/errors" if result.failed else None,
+    }
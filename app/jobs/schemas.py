@@ -0,0 +1,31 @@
+from datetime import datetime
+from typing import Any, Dict, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+JobStatus = Literal["queued", "running", "succeeded", "failed"]
+
+
+class JobCreateRequest(BaseModel):
+    operation: str = Field(..., description="Операция: reseed, export и др. (GET /jobs/operations)")
+    params: Dict[str, Any] = Field(default_factory=dict, description="Параметры операции")
+
+
+class JobEnqueuedResponse(BaseModel):
+    job_id: str = Field(..., description="Идентификатор задачи")
+    status: JobStatus = Field(..., description="Состояние задачи")
+    status_url: str = Field(..., description="Адрес для опроса состояния и результата")
+
+
+class JobResponse(BaseModel):
+    id: str = Field(..., description="Идентификатор задачи")
+    operation: str = Field(..., description="Операция")
+    status: JobStatus = Field(..., description="queued, running, succeeded или failed")
+    progress: float = Field(0, description="Выполнено, проценты")
+    message: Optional[str] = Field(None, description="Текущий шаг")
+    result: Optional[Any] = Field(None, description="Результат успешно завершенной задачи")
+    error: Optional[str] = Field(None, description="Ошибка, если задача завершилась неудачно")
+    attempts: int = Field(0, description="Число запусков (больше 1 - задача перезапускалась)")
+    created_at: datetime = Field(..., description="Постановка в очередь")
+    started_at: Optional[datetime] = Field(None, description="Начало последнего запуска")
+    finished_at: Optional[datetime] = Field(None, description="Завершение")
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+from typing import List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from redis.exceptions import RedisError
+
+from app.jobs import crud
+from app.jobs.crud import JobContext
+from app.jobs.operations import get_operation
+from app.settings import settings
+from app.utils.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# Сколько claim_job ждет задачу (BLPOP сигнала); меньше таймаута сокета Redis и определяет скорость остановки
+CLAIM_TIMEOUT = 1
+
+
+class JobWorker:
+    """
+    Исполнитель фоновых задач из очереди Redis.
+
+    В каждом процессе приложения работает settings.job_concurrency
+    asyncio-задач, которые забирают задачи из общей очереди, поэтому
+    задачи распределяются между всеми воркерами uvicorn. Пока задача
+    выполняется, ее пульс обновляется; задачи упавших процессов
+    возвращает в очередь периодическая проверка requeue_stale.
+    """
+
+    def __init__(self, concurrency: int = settings.job_concurrency):
+        self.concurrency = concurrency
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = asyncio.Event()
+
+    async def _beat(self, job_id: str):
+        while True:
+            await asyncio.sleep(settings.job_heartbeat_interval)
+            try:
+                await crud.heartbeat(job_id)
+            except RedisError as e:
+                logger.warning("Задача %s: не удалось обновить пульс: %r", job_id, e)
+
+    @traced("jobs.run")
+    async def run_job(self, job: dict):
+        job_id, name = job["id"], job["operation"]
+        operation = get_operation(name)
+        if operation is None:
+            await crud.fail_job(job_id, f"Неизвестная операция {name}")
+            return
+
+        logger.info("Задача %s (%s) запущена, попытка %s", job_id, name, job["attempts"])
+        beat = asyncio.create_task(self._beat(job_id))
+        try:
+            async with asyncio.timeout(settings.job_timeout):
+                result = await operation(JobContext(job_id), **job["params"])
+        except asyncio.CancelledError:
+            # Остановка процесса: задача вернется в очередь и продолжится другим воркером
+            await asyncio.shield(crud.requeue_job(job_id))
+            logger.warning("Задача %s прервана остановкой воркера и возвращена в очередь", job_id)
+            raise
+        except TimeoutError:
+            logger.error("Задача %s (%s) не уложилась в %s с", job_id, name, settings.job_timeout)
+            await crud.fail_job(job_id, f"Превышено время выполнения ({settings.job_timeout} с)")
+        except Exception as e:
+            logger.exception("Задача %s (%s) завершилась ошибкой", job_id, name)
+            await crud.fail_job(job_id, repr(e))
+        else:
+            await crud.complete_job(job_id, jsonable_encoder(result))
+            logger.info("Задача %s (%s) выполнена", job_id, name)
+        finally:
+            beat.cancel()
+
+    async def _consume(self):
+        while not self._stopping.is_set():
+            try:
+                job = await crud.claim_job(timeout=CLAIM_TIMEOUT)
+            except RedisError as e:
+                logger.warning("Очередь задач недоступна: %r", e)
+                await self._wait(CLAIM_TIMEOUT)
+                continue
+            if job is not None:
+                await self.run_job(job)
+
+    async def _sweep(self):
+        while not self._stopping.is_set():
+            try:
+                await crud.requeue_stale()
+            except RedisError as e:
+                logger.warning("Проверка брошенных задач не удалась: %r", e)
+            await self._wait(settings.job_stale_after / 2)
+
+    async def _wait(self, seconds: float):
+        try:
+            await asyncio.wait_for(self._stopping.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    def start(self):
+        if self._tasks:
+            return
+        self._stopping.clear()
+        self._tasks = [asyncio.create_task(self._consume(), name=f"job-worker-{i}") for i in range(self.concurrency)]
+        self._tasks.append(asyncio.create_task(self._sweep(), name="job-sweeper"))
+        logger.info("Исполнитель фоновых задач запущен (%s одновременно)", self.concurrency)
+
+    async def stop(self, timeout: Optional[float] = 10.0):
+        """Ждет завершения текущих задач до timeout секунд, остальные возвращает в очередь."""
+        if not self._tasks:
+            return
+        self._stopping.set()
+        _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+
+
+job_worker = JobWorker()
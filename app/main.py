@@ -1,17 +1,61 @@
+import asyncio
+import logging
 from contextlib import asynccontextmanager
 
-import uvicorn
 from fastapi import FastAPI
+from sqlalchemy import text
 
 from app.auth.crud import router as AuthRouter
-from app.company.crud import create_company_table_sync, create_test_companies
+from app.auth.sessions import session_listener
+from app.company.crud import create_company_table_sync, create_test_companies, run_company_stats_refresh
 from app.company.items import router as CompanyRouter
-from app.database import get_db, engine
+from app.container import container
+from app.database import get_db
 from app.employee.crud import create_employee_table_sync, create_test_employees
 from app.employee.items import router as EmployeeRouter
+from app.jobs.items import router as JobsRouter
+from app.jobs.worker import job_worker
+from app.outbox.worker import outbox_worker
+from app.settings import settings
 from app.superadmin.items import router as SuperAdminRouter
 from app.users.crud import create_test_users, create_users_table_sync
-from app.utils.radis import init_redis, close_redis
+from app.utils.logger import setup_logging, stop_logging
+from app.utils.metrics import mark_process_dead, metrics_endpoint, metrics_refresher
+from app.utils.query_profiler import query_budget_middleware
+from app.utils.radis import redis_health
+from app.utils.replicas import read_your_writes_middleware
+from app.utils.tracing import init_tracing, shutdown_tracing
+from app.utils.watchdog import loop_watchdog
+
+# Логирование настраивается один раз для всего приложения
+setup_logging()
+
+logger = logging.getLogger(__name__)
+
+# Ключ advisory-блокировки PostgreSQL на время создания тестовых данных
+SEED_LOCK_KEY = 7_340_001
+
+
+async def seed_database():
+    """
+    Пересоздает тестовых пользователей, компании и сотрудников.
+
+    Если несколько процессов стартуют одновременно (uvicorn --workers),
+    данные создает только тот, кто взял advisory-блокировку, остальные
+    пропускают этот шаг, а не очищают таблицы друг за другом.
+
+    Блокировка транзакционная: снимается с завершением транзакции lock_conn
+    и не оставляет состояния на серверном соединении (важно за PgBouncer).
+    """
+    async with container.engine.begin() as lock_conn:
+        locked = await lock_conn.scalar(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": SEED_LOCK_KEY})
+        if not locked:
+            logger.info("Тестовые данные создает другой процесс")
+            return
+        async for db in get_db():
+            await create_test_users(db)
+            await create_test_companies(db)
+            await create_test_employees(db)
 
 
 @asynccontextmanager
@@ -22,18 +66,44 @@ async def lifespan(_app: FastAPI):
     #     await conn.run_sync(create_users_table_sync)
     #     await conn.run_sync(create_company_table_sync)
     #     await conn.run_sync(create_employee_table_sync)
-    #     # Настройка Redis
-    # await init_redis()
+    # Движок БД, пул Redis и проверка реплик создаются до приема запросов
+    await container.start()
+    stats_refresh_task = None
     try:
         # Создание тестовых пользователей, компаний и сотрудников
-        async for db in get_db():
-            await create_test_users(db)
-            await create_test_companies(db)
-            await create_test_employees(db)
+        if settings.seed_on_startup:
+            await seed_database()
+        # Отзыв сессий из других процессов сразу очищает локальный кеш проверок токенов
+        session_listener.start()
+        # Фоновый разбор outbox (побочные эффекты записей вне запроса)
+        outbox_worker.start()
+        # Исполнитель долгих операций из очереди задач (app.jobs)
+        job_worker.start()
+        # Контроль задержки и блокировок event loop
+        loop_watchdog.start()
+        # Метрики-снимки процесса (пул Redis) для /metrics
+        metrics_refresher.start()
+        # Периодическая сверка агрегатов по компаниям (если включена)
+        if settings.company_stats_refresh_interval > 0:
+            stats_refresh_task = asyncio.create_task(run_company_stats_refresh())
         yield
     finally:
-        # Закрываем соединение с Redis
-        await close_redis()
+        if stats_refresh_task is not None:
+            stats_refresh_task.cancel()
+            await asyncio.gather(stats_refresh_task, return_exceptions=True)
+        await metrics_refresher.stop()
+        await loop_watchdog.stop()
+        await job_worker.stop()
+        await session_listener.stop()
+        await outbox_worker.stop()
+        # Закрываем соединения с БД и Redis
+        await container.stop()
+        # Метрики пула завершенного воркера не должны попадать в сумму по живым процессам
+        mark_process_dead()
+        # Выгружаем накопленные span
+        shutdown_tracing()
+        # Дописываем оставшиеся логи
+        stop_logging()
 
 
 app = FastAPI(title="X-Clients",
@@ -62,6 +132,23 @@ app.include_router(AuthRouter)
 app.include_router(CompanyRouter)
 app.include_router(EmployeeRouter)
 app.include_router(SuperAdminRouter)
+app.include_router(JobsRouter)
+app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
+
+
+@app.get("/health", include_in_schema=False)
+async def health():
+    """Проверка готовности: доступность Redis и состояние реплик БД."""
+    return {"redis": await redis_health(), "replicas": container.replica_router.status()}
+
+
+# Учет числа и времени SQL-запросов на каждый HTTP-запрос
+# (обработчики событий движков подключает app.container при их создании)
+app.middleware("http")(query_budget_middleware())
+# Чтения клиента сразу после его записи идут на основную БД
+app.middleware("http")(read_your_writes_middleware)
+
+# Трассировка маршрутов, SQL и Redis (включается через OTEL_TRACES_EXPORTER)
+init_tracing(app)
 
-# if __name__ == "__main__":
-#     uvicorn.run("main:app", reload=True)
+# Запуск в продакшене: python -m app.server (несколько воркеров, uvloop, httptools)
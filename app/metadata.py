@@ -1,7 +1,9 @@
-from app.users.schemas import UserTable
-from app.company.schemas import CompanyTable
-from app.employee.schemas import EmployeeTable
+from app.database import Base
 
-metadata = (UserTable.metadata,
-            CompanyTable.metadata,
-            EmployeeTable.metadata)
+# Модели импортируются ради регистрации таблиц в общих метаданных
+from app.users.schemas import UserTable  # noqa: F401
+from app.company.schemas import CompanyTable  # noqa: F401
+from app.employee.schemas import EmployeeTable  # noqa: F401
+from app.outbox.schemas import OutboxTable  # noqa: F401
+
+metadata = Base.metadata
@@ -0,0 +1,38 @@
+from typing import Any, Dict, Optional
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.container import container
+from app.outbox.schemas import Base, OutboxTable
+
+
+async def create_outbox_table():
+    async with container.engine.begin() as conn:
+        await conn.run_sync(create_outbox_table_sync)
+
+
+def create_outbox_table_sync(conn):
+    Base.metadata.tables["outbox"].create(conn, checkfirst=True)
+
+
+def add_outbox_event(db: AsyncSession,
+                     event_type: str,
+                     aggregate_type: str,
+                     aggregate_id: int,
+                     payload: Optional[Dict[str, Any]] = None) -> OutboxTable:
+    """
+    Добавляет событие в outbox в рамках текущей транзакции сессии.
+
+    Событие попадет в БД только вместе с коммитом изменения сущности,
+    поэтому побочные эффекты (кеш, вебхуки, индексация) не потеряются
+    и не выполнятся для откатившейся транзакции.
+    """
+    event = OutboxTable(
+        event_type=event_type,
+        aggregate_type=aggregate_type,
+        aggregate_id=aggregate_id,
+        payload=jsonable_encoder(payload or {}),
+    )
+    db.add(event)
+    return event
@@ -0,0 +1,30 @@
+import logging
+from collections import defaultdict
+from typing import Awaitable, Callable, Dict, List
+
+from app.outbox.schemas import OutboxTable
+
+logger = logging.getLogger(__name__)
+
+OutboxHandler = Callable[[OutboxTable], Awaitable[None]]
+
+# Подписчики по типу события. "*" - получает все события.
+_handlers: Dict[str, List[OutboxHandler]] = defaultdict(list)
+
+
+def register_handler(event_type: str = "*"):
+    """Декоратор регистрации обработчика события outbox."""
+    def decorator(func: OutboxHandler) -> OutboxHandler:
+        _handlers[event_type].append(func)
+        return func
+    return decorator
+
+
+def get_handlers(event_type: str) -> List[OutboxHandler]:
+    return [*_handlers.get(event_type, ()), *_handlers.get("*", ())]
+
+
+@register_handler()
+async def log_event(event: OutboxTable):
+    # Подробное логирование изменений вынесено из запроса в воркер
+    logger.info("Outbox: %s %s#%s", event.event_type, event.aggregate_type, event.aggregate_id)
@@ -0,0 +1,32 @@
+from sqlalchemy import (Column, BigInteger, Integer, String, Text,
+                        DateTime, Index, func, text)
+from sqlalchemy.dialects.postgresql import JSONB
+
+from app.database import Base
+
+
+class OutboxTable(Base):
+    """Событие outbox: пишется в той же транзакции, что и изменение сущности,
+    и разбирается фоновым воркером (app/outbox/worker.py)."""
+    __tablename__ = "outbox"
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    event_type = Column(String(100), nullable=False)
+    aggregate_type = Column(String(50), nullable=False)
+    aggregate_id = Column(Integer, nullable=False)
+    payload = Column(JSONB, nullable=False, server_default=text("'{}'::jsonb"))
+    # Значения по умолчанию есть и в БД: события пишут и выражения INSERT ... SELECT мимо ORM
+    create_timestamp = Column(DateTime(timezone=True), default=func.now(), server_default=func.now(), nullable=False)
+    attempts = Column(Integer, default=0, server_default="0", nullable=False)
+    next_attempt_at = Column(DateTime(timezone=True), default=func.now(), server_default=func.now(), nullable=False)
+    processed_at = Column(DateTime(timezone=True))
+    failed_at = Column(DateTime(timezone=True))
+    last_error = Column(Text)
+
+    __table_args__ = (
+        # Воркер выбирает только необработанные события - частичный индекс остается маленьким
+        Index("ix_outbox_pending", "next_attempt_at",
+              postgresql_where=text("processed_at IS NULL AND failed_at IS NULL")),
+        # Очистка по settings.outbox_retention удаляет обработанные события по этому индексу
+        Index("ix_outbox_processed_at", "processed_at",
+              postgresql_where=text("processed_at IS NOT NULL")),
+    )
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, select
+
+from app.container import container
+from app.outbox.handlers import get_handlers
+from app.outbox.schemas import OutboxTable
+from app.settings import settings
+from app.utils.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    """Экспоненциальная задержка между повторами: 2, 4, 8 ... секунд, не более 10 минут."""
+    return timedelta(seconds=min(2 ** attempts, 600))
+
+
+async def _dispatch(event: OutboxTable):
+    for handler in get_handlers(event.event_type):
+        await asyncio.wait_for(handler(event), timeout=settings.outbox_handler_timeout)
+
+
+class OutboxWorker:
+    """
+    Фоновый воркер, который пачками разбирает таблицу outbox.
+
+    Пачка забирается короткой транзакцией с FOR UPDATE SKIP LOCKED:
+    next_attempt_at сдвигается на settings.outbox_lease, и до истечения срока
+    другие воркеры (в том числе в разных процессах) ее не выбирают.
+    Обработчики выполняются уже вне транзакции - блокировки строк и соединение
+    не держатся на время их работы; результаты пишутся второй транзакцией.
+    Упавшие события переносятся на потом с экспоненциальной задержкой,
+    после settings.outbox_max_attempts попыток помечаются как failed.
+    Обработанные события старше settings.outbox_retention периодически удаляются;
+    failed остаются для разбора вручную.
+    """
+
+    def __init__(self, batch_size: int = settings.outbox_batch_size, poll_interval: float = settings.outbox_poll_interval):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+        self._next_cleanup = 0.0
+
+    @traced("outbox.process_batch")
+    async def process_batch(self) -> int:
+        """Обрабатывает одну пачку событий и возвращает ее размер."""
+        async with container.session_factory() as db:
+            async with db.begin():
+                result = await db.execute(
+                    select(OutboxTable)
+                    .where(OutboxTable.processed_at.is_(None),
+                           OutboxTable.failed_at.is_(None),
+                           OutboxTable.next_attempt_at <= datetime.now(timezone.utc))
+                    .order_by(OutboxTable.id)
+                    .limit(self.batch_size)
+                    .with_for_update(skip_locked=True)
+                )
+                events = result.scalars().all()
+                lease_until = datetime.now(timezone.utc) + timedelta(seconds=settings.outbox_lease)
+                for event in events:
+                    event.next_attempt_at = lease_until
+
+            # Сессия не истекает после коммита (expire_on_commit=False): события читаются без запросов
+            for event in events:
+                now = datetime.now(timezone.utc)
+                try:
+                    await _dispatch(event)
+                    event.processed_at = now
+                except Exception as e:
+                    event.attempts += 1
+                    event.last_error = repr(e)[:1000]
+                    if event.attempts >= settings.outbox_max_attempts:
+                        event.failed_at = now
+                        logger.error("Outbox: событие %s отброшено после %s попыток: %r",
+                                     event.id, event.attempts, e)
+                    else:
+                        event.next_attempt_at = now + _retry_delay(event.attempts)
+                        logger.warning("Outbox: ошибка обработки события %s (попытка %s): %r",
+                                       event.id, event.attempts, e)
+            await db.commit()
+        return len(events)
+
+    @traced("outbox.delete_processed")
+    async def delete_processed(self, retention: float = settings.outbox_retention,
+                               batch_size: int = settings.outbox_retention_batch_size) -> int:
+        """
+        Удаляет обработанные события старше retention секунд и возвращает их число.
+        Каждая пачка удаляется отдельной короткой транзакцией: блокировки строк
+        и WAL не копятся, параллельные воркеры пропускают чужие пачки (SKIP LOCKED).
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=retention)
+        batch = (
+            select(OutboxTable.id)
+            .where(OutboxTable.processed_at < cutoff)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        deleted = 0
+        while not self._stopping.is_set():
+            async with container.session_factory() as db:
+                async with db.begin():
+                    result = await db.execute(delete(OutboxTable).where(OutboxTable.id.in_(batch)),
+                                              execution_options={"synchronize_session": False})
+            deleted += result.rowcount
+            if result.rowcount < batch_size:
+                break
+        if deleted:
+            logger.info("Outbox: удалено %s обработанных событий старше %s с", deleted, retention)
+        return deleted
+
+    async def _cleanup_if_due(self):
+        if settings.outbox_retention <= 0 or time.monotonic() < self._next_cleanup:
+            return
+        self._next_cleanup = time.monotonic() + settings.outbox_retention_interval
+        try:
+            await self.delete_processed()
+        except Exception:
+            logger.exception("Outbox: ошибка при удалении обработанных событий")
+
+    async def run(self):
+        logger.info("Outbox воркер запущен")
+        while not self._stopping.is_set():
+            try:
+                processed = await self.process_batch()
+            except Exception:
+                logger.exception("Outbox: ошибка при выборке событий")
+                processed = 0
+            await self._cleanup_if_due()
+
+            # Если пачка неполная - очередь разобрана, ждем следующий опрос
+            if processed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        logger.info("Outbox воркер остановлен")
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._stopping.clear()
+            self._task = asyncio.create_task(self.run(), name="outbox-worker")
+
+    async def stop(self, timeout: float = 10.0):
+        if self._task is None:
+            return
+        self._stopping.set()
+        try:
+            await asyncio.wait_for(self._task, timeout=timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+        self._task = None
+
+
+outbox_worker = OutboxWorker()
@@ -0,0 +1,61 @@
+"""
+Запуск приложения в продакшене: python -m app.server
+
+Несколько процессов uvicorn с uvloop и httptools. Число воркеров по умолчанию
+равно числу доступных процессу ядер, остальные параметры - в app.settings.
+"""
+import asyncio
+import logging
+import os
+
+import uvicorn
+
+from app.settings import settings
+from app.utils.logger import setup_logging
+from app.utils.metrics import prepare_multiprocess_dir
+
+logger = logging.getLogger(__name__)
+
+
+async def _seed_once():
+    from app.container import container
+    from app.main import seed_database
+
+    try:
+        await seed_database()
+    finally:
+        # Соединения главного процесса не должны переживать запуск воркеров
+        await container.engine.dispose()
+
+
+def main():
+    setup_logging()
+    workers = settings.workers
+    if workers > 1:
+        # Каждый воркер пишет метрики в общий каталог, /metrics любого воркера отдает сумму.
+        # Переменная должна быть в окружении до импорта prometheus_client воркерами
+        prepare_multiprocess_dir()
+        # Тестовые данные создаются один раз в главном процессе, воркеры их не трогают.
+        # Воркеры - новые процессы, настройки они читают из окружения заново.
+        asyncio.run(_seed_once())
+        os.environ["SEED_ON_STARTUP"] = "false"
+
+    logger.info("Запуск: %s воркеров на %s:%s", workers, settings.host, settings.port)
+    uvicorn.run(
+        "app.main:app",
+        host=settings.host,
+        port=settings.port,
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
+        backlog=settings.backlog,
+        timeout_keep_alive=settings.keep_alive,
+        timeout_graceful_shutdown=settings.graceful_timeout,
+        proxy_headers=True,
+        # Логирование настраивает приложение (JSON через очередь), uvicorn его не переопределяет
+        log_config=None,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import os
+import tempfile
+from typing import List
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    """
+    Все настройки приложения в одном месте.
+
+    Значения берутся из переменных окружения (имя поля в верхнем регистре)
+    и из файла .env; окружение имеет приоритет. Значения по умолчанию
+    подходят для локального запуска, для продакшена их переопределяют.
+    """
+
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    # --- База данных ---
+    db_uri: str
+    # Логирование каждого SQL-запроса
+    db_echo: bool = False
+    # Реплики только для чтения, через запятую. Без них все запросы идут на основную БД.
+    db_replica_uris: str = ""
+    # Пул соединений на процесс: постоянные + временные сверх них, ожидание свободного
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    # Пересоздание соединений старше N секунд (-1 - не пересоздавать)
+    db_pool_recycle: int = -1
+    # Кеш скомпилированных SQLAlchemy выражений на движок (ключ - структура запроса)
+    db_query_cache_size: int = 500
+    # Подготовленные выражения asyncpg на соединение: повторный запрос не разбирается
+    # и не планируется PostgreSQL заново. В режиме PgBouncer не используется
+    db_prepared_statement_cache_size: int = 256
+    # DB_URI ведет в PgBouncer в режиме transaction: без кеша подготовленных выражений
+    # и с уникальными именами выражений (см. app.container.asyncpg_connect_args)
+    db_pgbouncer: bool = False
+    # Прямое подключение к PostgreSQL в обход PgBouncer - для миграций (CREATE INDEX CONCURRENTLY).
+    # Пусто - миграции идут через DB_URI
+    db_direct_uri: str = ""
+
+    # --- Реплики ---
+    # Как часто проверяются реплики и допустимое отставание репликации
+    replica_check_interval: float = 5
+    replica_check_timeout: float = 2
+    replica_max_lag: float = 5
+    # Сколько секунд после записи клиент читает с основной БД (read-your-writes)
+    read_your_writes_seconds: int = 5
+
+    # --- Redis ---
+    redis_host: str = "localhost"
+    redis_port: int = 6379
+    # Размер пула на процесс и сколько ждать свободное соединение, прежде чем упасть
+    redis_max_connections: int = 50
+    redis_pool_timeout: float = 5
+    redis_socket_timeout: float = 5
+    # Проверка простаивающего соединения PING-ом перед использованием
+    redis_health_check_interval: int = 30
+
+    # --- Аутентификация ---
+    # Обязателен для приложения (проверяется в app.auth.jwt), миграциям не нужен
+    secret_key: str = ""
+    access_token_expire_minutes: int = 300
+    # Сессии (app.auth.sessions): одновременных входов одного пользователя
+    # (сверх лимита завершаются самые старые, 0 - без ограничения)
+    max_sessions_per_user: int = 20
+    # Сколько процесс доверяет проверенной сессии без обращения к Redis
+    # и сколько таких сессий помнит; отзыв приходит сразу через pub/sub
+    session_cache_ttl: float = 30
+    session_cache_size: int = 10000
+
+    # --- Ограничение частоты запросов ---
+    # Переопределение лимитов: "login_ip=20/60,login_user=5/60,write_ip=60/60"
+    rate_limits: str = ""
+    # Сколько лимитер ждет Redis (с учетом повторов клиента) и сколько секунд после
+    # ошибки Redis не опрашивается: запросы идут по локальному счетчику без задержки
+    rate_limit_redis_timeout: float = 0.25
+    rate_limit_redis_cooldown: float = 5
+
+    # --- Идемпотентность ---
+    # Сколько хранится ответ по ключу, время жизни блокировки и сколько ждет повторный запрос
+    idempotency_ttl: int = 86400
+    idempotency_lock_ttl: int = 30
+    idempotency_wait_timeout: float = 10
+
+    # --- Outbox ---
+    outbox_batch_size: int = 100
+    outbox_poll_interval: float = 1.0
+    outbox_max_attempts: int = 10
+    outbox_handler_timeout: float = 10.0
+    # На сколько секунд воркер забирает пачку: пока срок не истек, другие воркеры ее не берут.
+    # Если процесс упал во время обработки, пачка снова доступна по истечении срока
+    outbox_lease: float = 300
+    # Сколько секунд хранятся обработанные события (0 - не удалять). Воркер раз в
+    # outbox_retention_interval удаляет более старые пачками по outbox_retention_batch_size
+    outbox_retention: float = 7 * 86400
+    outbox_retention_interval: float = 3600
+    outbox_retention_batch_size: int = 1000
+
+    # --- Фоновые задачи (app.jobs) ---
+    # Одновременно выполняемых задач на процесс
+    job_concurrency: int = 2
+    # Сколько хранится состояние и результат завершенной задачи
+    job_result_ttl: int = 86400
+    # Предельное время выполнения одной задачи
+    job_timeout: float = 3600
+    # Пульс выполняемой задачи; без пульса дольше job_stale_after задача считается
+    # брошенной (процесс упал) и возвращается в очередь, не более job_max_attempts раз
+    job_heartbeat_interval: float = 5
+    job_stale_after: float = 60
+    job_max_attempts: int = 3
+    # Каталог файлов выгрузки export (JSON Lines), общий для всех процессов приложения;
+    # файлы хранятся job_result_ttl секунд
+    export_dir: str = os.path.join(tempfile.gettempdir(), "xclients-export")
+
+    # --- Импорт сотрудников из CSV/XLSX ---
+    # Каталог загруженных файлов и отчетов об ошибках, общий для всех процессов приложения
+    import_dir: str = os.path.join(tempfile.gettempdir(), "xclients-import")
+    # Предельный размер загружаемого файла, байты
+    import_max_file_size: int = 50 * 1024 * 1024
+    # Строк в пакете проверки и COPY: ограничивает память импорта
+    import_batch_size: int = 5000
+
+    # --- Агрегаты по компаниям ---
+    # Период полной сверки company_stats в секундах (0 - выключено, агрегаты ведут триггеры)
+    company_stats_refresh_interval: int = 0
+
+    # --- Бюджет SQL на запрос ---
+    query_count_budget: int = 10
+    query_time_budget_ms: float = 200
+    # Порог медленного выражения; для медленных SELECT снимается план через EXPLAIN
+    slow_query_ms: float = 100
+    slow_query_explain: bool = True
+
+    # --- Watchdog event loop ---
+    # Период пульса и порог, после которого цикл считается заблокированным
+    watchdog_interval: float = 0.1
+    watchdog_threshold: float = 0.25
+    # Отладочный режим: asyncio debug и накопление стеков для assert_no_blocking
+    watchdog_debug: bool = False
+
+    # --- Метрики Prometheus ---
+    # Каталог метрик воркеров: при нескольких воркерах app.server очищает его при запуске,
+    # каждый процесс пишет туда свои значения, /metrics отдает сумму по всем процессам
+    prometheus_multiproc_dir: str = os.path.join(tempfile.gettempdir(), "xclients-metrics")
+    # Период обновления метрик-снимков (пул Redis) в каждом процессе
+    metrics_refresh_interval: float = 5
+
+    # --- Логирование ---
+    log_level: str = "INFO"
+    # Уровни по модулям: "app.auth=DEBUG,sqlalchemy.engine=WARNING"
+    log_levels: str = ""
+    # Доля сохраняемых INFO/DEBUG записей по модулям: "app.company=0.1"
+    log_sampling: str = ""
+
+    # --- Трассировка ---
+    # none (выключено), otlp (коллектор) или file (JSON-строки, для тестов)
+    otel_traces_exporter: str = "none"
+    otel_traces_file: str = "traces.jsonl"
+    otel_service_name: str = "x-clients"
+
+    # --- Сервер (app.server) ---
+    host: str = "0.0.0.0"
+    port: int = 8000
+    # Число воркеров; 0 - по числу ядер, доступных процессу
+    web_concurrency: int = 0
+    # За балансировщиком должен быть больше его idle-таймаута, иначе возможны 502
+    keep_alive: int = 5
+    # Очередь принятых ядром соединений, пока воркеры заняты (ограничена net.core.somaxconn)
+    backlog: int = 2048
+    # Сколько секунд при остановке дожидаемся завершения текущих запросов
+    graceful_timeout: int = 30
+    # app.server при нескольких воркерах создает тестовые данные сам и выключает это в воркерах
+    seed_on_startup: bool = True
+
+    @property
+    def replica_uris(self) -> List[str]:
+        return [uri.strip() for uri in self.db_replica_uris.split(",") if uri.strip()]
+
+    @property
+    def workers(self) -> int:
+        return self.web_concurrency or len(os.sched_getaffinity(0))
+
+
+settings = Settings()
@@ -1,16 +1,28 @@
+from fastapi import HTTPException
 from sqlalchemy import text, delete
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette import status
 
 from app.auth.crud import is_user_superadmin
 from app.company.schemas import CompanyTable
 from app.employee.schemas import EmployeeTable
 from app.users.schemas import UserTable
+from app.utils.profiler import ProfileResult, capture_profile, profiler_lock
 
 
-async def delete_all_tables(db: AsyncSession, client_token: str):
-    await is_user_superadmin(client_token)
+async def delete_all_tables(db: AsyncSession):
+    # Права проверяются при постановке задачи (выполняется фоновой задачей reseed)
     async with db.begin():
         await db.execute(delete(UserTable))
         await db.execute(delete(CompanyTable))
         await db.execute(delete(EmployeeTable))
     await db.commit()
+
+
+async def profile_worker(client_token: str, seconds: float, interval_ms: float) -> ProfileResult:
+    await is_user_superadmin(client_token)
+    if profiler_lock.locked():
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                            detail="Профилирование на этом воркере уже выполняется")
+    async with profiler_lock:
+        return await capture_profile(seconds, interval_ms)
@@ -1,13 +1,16 @@
 import logging
+import os
+from datetime import datetime
+from typing import Literal
 
-from fastapi import APIRouter, Depends, status
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Query, status
+from fastapi.responses import PlainTextResponse
 
 from . import crud
-from ..company.crud import create_company_table_sync, create_test_companies
-from ..database import get_db, engine
-from ..employee.crud import create_employee_table_sync, create_test_employees
-from ..users.crud import create_users_table_sync, create_test_users
+from ..auth.crud import is_user_superadmin
+from ..jobs.crud import enqueue_job
+from ..jobs.schemas import JobEnqueuedResponse
+from ..settings import settings
 
 logger = logging.getLogger(__name__)
 
@@ -18,26 +21,62 @@ router = APIRouter(prefix='/magic', tags=["superuser"])
             summary="Полный рефреш",
             description="Только темные силы смогут это сделать.\n"
                         "Подумай - нужно ли тебе это?\n"
-                        "Мы уничтожим все таблицы, потом пересоздадим их и заполним тестовыми данными.",
-            status_code=status.HTTP_200_OK,
+                        "Мы уничтожим все таблицы, потом пересоздадим их и заполним тестовыми данными.\n"
+                        "Выполняется фоновой задачей reseed: ответ сразу содержит ее ID, "
+                        "ход выполнения - в GET /jobs/{job_id}.",
+            response_model=JobEnqueuedResponse,
+            status_code=status.HTTP_202_ACCEPTED,
             responses={
-                200: {"description": "Шалось удалась"},
+                202: {"description": "Шалость запущена"},
                 403: {"description": "Доступ запрещен"}
             })
-async def refresh_db(client_token: str, db: AsyncSession = Depends(get_db)):
-    await crud.delete_all_tables(db, client_token=client_token)
-    # Создание таблиц
-    async with engine.begin() as conn:
-        await conn.run_sync(create_users_table_sync)
-        await conn.run_sync(create_company_table_sync)
-        await conn.run_sync(create_employee_table_sync)
-
-    # Создание тестовых данных
-    await create_test_companies(db)
-    await create_test_users(db)
-    await create_test_employees(db)
-
-    await db.commit()
-    return {"message": "Все снесено и пересоздано - ты красава, "
-                       "но не увлекайся этой темной магией."}
+async def refresh_db(client_token: str):
+    decode = await is_user_superadmin(client_token)
+    job_id = await enqueue_job("reseed", owner=decode["user_login"])
+    return JobEnqueuedResponse(job_id=job_id, status="queued", status_url=f"/jobs/{job_id}")
+
+
+@router.get("/profile",
+            summary="Профилирование воркера",
+            description="Снимает сэмплирующий профиль event loop воркера, обработавшего запрос, "
+                        "в течение заданного числа секунд.\n"
+                        "Профилируется только один воркер - тот, которому балансировщик отдал запрос; "
+                        "при нескольких воркерах (WEB_CONCURRENCY) это случайный из них, "
+                        "его PID возвращается в ответе.\n"
+                        "format=collapsed - файл для flamegraph (flamegraph.pl, speedscope), "
+                        "format=json - сводка: задержка event loop и самые тяжелые корутины.",
+            status_code=status.HTTP_200_OK,
+            responses={
+                200: {"description": "Профиль снят"},
+                403: {"description": "Доступ запрещен"},
+                409: {"description": "Профилирование уже выполняется"}
+            })
+async def profile(client_token: str,
+                  seconds: float = Query(10, gt=0, le=60, description="Длительность сбора, секунды"),
+                  interval_ms: float = Query(5, ge=1, le=100, description="Интервал выборки, мс"),
+                  format: Literal["json", "collapsed"] = "json"):
+    result = await crud.profile_worker(client_token, seconds=seconds, interval_ms=interval_ms)
+    lag = result.lag_summary()
+
+    if format == "collapsed":
+        filename = f"profile-{datetime.now():%Y%m%d-%H%M%S}.collapsed"
+        return PlainTextResponse(result.collapsed(), headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Loop-Lag-Max-Ms": str(lag["max_ms"]),
+            "X-Profile-Samples": str(result.samples),
+            "X-Profile-Worker-Pid": str(os.getpid()),
+            "X-Profile-Workers": str(settings.workers),
+        })
 
+    return {
+        # Профиль одного процесса из settings.workers, остальные воркеры не затронуты
+        "worker_pid": os.getpid(),
+        "workers": settings.workers,
+        "scope": "Профиль только воркера, обработавшего запрос",
+        "seconds": result.seconds,
+        "interval_ms": result.interval_ms,
+        "samples": result.samples,
+        "loop_lag": lag,
+        "slowest_coroutines": result.slowest_coroutines(),
+        "collapsed": result.collapsed(),
+    }
@@ -1,15 +1,15 @@
-from passlib.context import CryptContext
+import asyncio
+
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
-from app.database import engine
+from app.container import container
 from app.users.schemas import UserTable, User, Base
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 
 async def create_users_table():
-    async with engine.begin() as conn:
+    async with container.engine.begin() as conn:
         await conn.run_sync(create_users_table_sync)
 
 
@@ -40,9 +40,12 @@ async def create_test_users(db: AsyncSession):
         User(username='voldemort', password='ExpectoPatronum123!', role='admin')
     ]
 
-    for user in users:
-        # Хеширование пароля - чтобы не было видно все пароли в общей таблице
-        hashed_password = pwd_context.hash(user.password)
+    # Хеширование пароля - чтобы не было видно все пароли в общей таблице.
+    # bcrypt отпускает GIL: хеши считаются параллельно в пуле потоков, а не по очереди
+    hashed_passwords = await asyncio.gather(
+        *(run_in_threadpool(container.pwd_context.hash, user.password) for user in users)
+    )
+    for user, hashed_password in zip(users, hashed_passwords):
         db_user = UserTable(
             login=user.username,
             password=hashed_password,
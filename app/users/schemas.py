@@ -2,9 +2,8 @@ from enum import Enum
 from pydantic import BaseModel
 from sqlalchemy import (Column, Integer, String, Boolean,
                         DateTime, func, Enum as SAEnum)
-from sqlalchemy.ext.declarative import declarative_base
 
-Base = declarative_base()
+from app.database import Base
 
 
 class RoleEnum(str, Enum):
@@ -27,7 +26,7 @@ class UserTable(Base):
     is_active = Column(Boolean, default=True, nullable=False)
     create_timestamp = Column(DateTime(timezone=True), default=func.now(), nullable=False)
     change_timestamp = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now(), nullable=False)
-    login = Column(String(20), nullable=False)
+    login = Column(String(20), nullable=False, index=True)
     password = Column(String(100), nullable=False)
     display_name = Column(String(40), nullable=False)
     role = Column(SAEnum(RoleEnum), nullable=False)
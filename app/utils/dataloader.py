@@ -0,0 +1,108 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Generic, Hashable, Iterable, List, Optional, Set, Tuple, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+BatchFunction = Callable[[List[K]], Awaitable[Dict[K, V]]]
+
+
+class DataLoader(Generic[K, V]):
+    """
+    Пакетная загрузка по ключам в стиле DataLoader.
+
+    Все load(), вызванные до следующей итерации event loop, собираются
+    в один вызов batch_fn (один SQL-запрос). Результаты кешируются на время
+    жизни загрузчика, то есть в пределах одной сессии/запроса.
+    Отсутствующий ключ возвращает None.
+
+    lock сериализует пачки: загрузчики одной сессии получают общий lock
+    (get_loader), потому что AsyncSession нельзя использовать конкурентно.
+    """
+
+    def __init__(self, batch_fn: BatchFunction, lock: Optional[asyncio.Lock] = None):
+        self._batch_fn = batch_fn
+        self._lock = lock or asyncio.Lock()
+        self._cache: Dict[K, asyncio.Future] = {}
+        self._queue: List[Tuple[K, asyncio.Future]] = []
+        # Ссылки на задачи отправки, чтобы их не собрал сборщик мусора
+        self._tasks: Set[asyncio.Task] = set()
+
+    def load(self, key: K) -> Awaitable[Optional[V]]:
+        future = self._cache.get(key)
+        if future is not None:
+            return future
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._cache[key] = future
+        self._queue.append((key, future))
+        if len(self._queue) == 1:
+            # Первый ключ в пачке - отправка после того, как отработают остальные корутины этого тика
+            loop.call_soon(self._schedule_dispatch)
+        return future
+
+    def _schedule_dispatch(self):
+        task = asyncio.ensure_future(self._dispatch())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def load_many(self, keys: Iterable[K]) -> List[Optional[V]]:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def clear(self):
+        self._cache.clear()
+
+    def _forget(self, batch: List[Tuple[K, asyncio.Future]]):
+        # Ошибку не кешируем - следующий load() повторит запрос
+        for key, future in batch:
+            if self._cache.get(key) is future:
+                del self._cache[key]
+
+    async def _dispatch(self):
+        batch = None
+        try:
+            # Еще один проход loop: корутины, запущенные в том же тике, успевают добавить свои ключи
+            await asyncio.sleep(0)
+            batch, self._queue = self._queue, []
+            async with self._lock:
+                results = await self._batch_fn([key for key, _ in batch])
+        except asyncio.CancelledError:
+            # Отмена (остановка loop, отмена запроса): ожидающие не должны висеть вечно
+            if batch is None:
+                batch, self._queue = self._queue, []
+            self._forget(batch)
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            self._forget(batch)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for key, future in batch:
+            if not future.done():
+                future.set_result(results.get(key))
+
+
+def get_loader(db: AsyncSession, name: str, batch_fn: BatchFunction) -> DataLoader:
+    """Загрузчик, привязанный к сессии: у каждого HTTP-запроса свой набор."""
+    loaders = db.info.setdefault("loaders", {})
+    loader = loaders.get(name)
+    if loader is None:
+        if "loader_lock" not in db.info:
+            db.info["loader_lock"] = asyncio.Lock()
+        loader = loaders[name] = DataLoader(batch_fn, db.info["loader_lock"])
+    return loader
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _clear_loaders(session: Session):
+    # После коммита/отката закешированные строки могли устареть
+    for loader in session.info.get("loaders", {}).values():
+        loader.clear()
@@ -0,0 +1,45 @@
+import re
+from typing import Optional
+
+from fastapi import HTTPException
+from starlette import status
+
+# ETag версии записи: "3". Слабая форма W/"3" в If-Match не совпадает ни с чем:
+# сравнение If-Match строгое (RFC 9110, 13.1.1)
+_ETAG = re.compile(r'^"(\d+)"$')
+
+
+def version_etag(version: int) -> str:
+    return f'"{version}"'
+
+
+def parse_if_match(value: Optional[str]) -> Optional[int]:
+    """
+    Ожидаемая версия записи из заголовка If-Match.
+
+    None - заголовка нет или передан "*": изменение без проверки версии
+    (поведение клиентов, которые еще не передают If-Match).
+    """
+    if value is None or value.strip() == "*":
+        return None
+    if value.strip().startswith("W/"):
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail='Слабый ETag в If-Match не подходит: передайте ETag из ответа GET, например "3"',
+        )
+    match = _ETAG.match(value.strip())
+    if match is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Некорректный If-Match: ожидается ETag из ответа GET, например "3"',
+        )
+    return int(match.group(1))
+
+
+def precondition_failed(current_version: int) -> HTTPException:
+    """412: запись уже изменил другой запрос; актуальная версия - в ETag ответа."""
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="Запись изменена другим запросом: получите актуальную версию и повторите изменение",
+        headers={"ETag": version_etag(current_version)},
+    )
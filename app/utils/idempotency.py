@@ -0,0 +1,114 @@
+import asyncio
+import hashlib
+import json
+import logging
+import uuid
+from typing import Awaitable, Callable, Optional, Type
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from redis.exceptions import RedisError
+from starlette import status
+from starlette.requests import Request
+
+from app.settings import settings
+from app.utils.radis import get_redis
+from app.utils.rate_limit import client_ip
+
+logger = logging.getLogger(__name__)
+
+# Пауза между проверками, пока ключ занят другим запросом
+IDEMPOTENCY_POLL_INTERVAL = 0.05
+
+# Снимаем блокировку, только если она все еще наша
+RELEASE_LOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def request_fingerprint(scope: str, payload: BaseModel) -> str:
+    body = json.dumps(jsonable_encoder(payload), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(f"{scope}:{body}".encode()).hexdigest()
+
+
+def idempotency_subject(request: Request, user_login: Optional[str] = None) -> str:
+    """
+    Владелец ключа: проверенный пользователь, для анонимных маршрутов - IP клиента.
+    Чужой запрос с тем же Idempotency-Key не получит сохраненный ответ.
+    """
+    return f"user:{user_login}" if user_login else f"ip:{client_ip(request)}"
+
+
+def _replay(raw: bytes, fingerprint: str) -> JSONResponse:
+    stored = json.loads(raw)
+    if stored["fingerprint"] != fingerprint:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key уже использован с другим телом запроса",
+        )
+    return JSONResponse(stored["body"], status_code=stored["status"],
+                        headers={"Idempotent-Replayed": "true"})
+
+
+async def idempotent(scope: str,
+                     idempotency_key: Optional[str],
+                     payload: BaseModel,
+                     response_model: Type[BaseModel],
+                     status_code: int,
+                     call: Callable[[], Awaitable],
+                     subject: str):
+    """
+    Выполняет создание не более одного раза для одного Idempotency-Key.
+
+    Ответ сохраняется в Redis на settings.idempotency_ttl секунд и отдается повторным
+    запросам без обращения к БД. Пока первый запрос выполняется, он держит
+    короткую блокировку: параллельные дубликаты ждут его результат, а не
+    вставляют вторую строку. Ошибки не кешируются - запрос можно повторить.
+    Без заголовка или при недоступном Redis запрос выполняется как обычно.
+    Ключ действует только для своего subject (см. idempotency_subject).
+    """
+    if not idempotency_key:
+        return await call()
+
+    fingerprint = request_fingerprint(scope, payload)
+    result_key = f"idempotency:{scope}:{subject}:{idempotency_key}"
+    lock_key = f"{result_key}:lock"
+    lock_token = uuid.uuid4().hex
+
+    try:
+        client = await get_redis()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.idempotency_wait_timeout
+        while True:
+            cached = await client.get(result_key)
+            if cached is not None:
+                return _replay(cached, fingerprint)
+            if await client.set(lock_key, lock_token, nx=True, ex=settings.idempotency_lock_ttl):
+                break
+            if loop.time() >= deadline:
+                raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                                    detail="Запрос с этим Idempotency-Key еще выполняется")
+            await asyncio.sleep(IDEMPOTENCY_POLL_INTERVAL)
+    except RedisError as e:
+        logger.warning("Idempotency: Redis недоступен (%r), запрос выполняется без защиты от повторов", e)
+        return await call()
+
+    try:
+        result = response_model.model_validate(await call(), from_attributes=True)
+        stored = {"fingerprint": fingerprint, "status": status_code, "body": result.model_dump(mode="json")}
+        try:
+            await client.set(result_key, json.dumps(stored, ensure_ascii=False), ex=settings.idempotency_ttl)
+        except RedisError as e:
+            # Запись в БД уже выполнена - отдаем ответ, даже если сохранить его не удалось
+            logger.warning("Idempotency: не удалось сохранить ответ %s: %r", result_key, e)
+        return result
+    finally:
+        try:
+            await client.eval(RELEASE_LOCK_LUA, 1, lock_key, lock_token)
+        except RedisError as e:
+            logger.warning("Idempotency: не удалось снять блокировку %s: %r", lock_key, e)
@@ -0,0 +1,183 @@
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from app.settings import settings
+from app.utils.tracing import current_trace_ids
+
+# Атрибуты LogRecord, которые не считаются пользовательскими полями (extra=...)
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+# JWT (header.payload.signature) и значения параметров с токенами в тексте сообщения
+_TOKEN_PATTERNS = (
+    re.compile(r"eyJ[\w-]+\.[\w-]+\.[\w-]*"),
+    re.compile(r"(?i)((?:client_token|user_token|token|password)\s*[=:]\s*)[^\s,&'\"]+"),
+)
+REDACTED = "***"
+
+# Аргументы этих типов не меняются после вызова логгера - запись можно форматировать позже, в потоке слушателя
+_IMMUTABLE_ARG_TYPES = (str, int, float, complex, bool, bytes, type(None), Decimal, date, time, timedelta, uuid.UUID)
+
+_listener: Optional[QueueListener] = None
+
+
+def redact(text: str) -> str:
+    """Вырезает токены и пароли из строки."""
+    text = _TOKEN_PATTERNS[0].sub(REDACTED, text)
+    return _TOKEN_PATTERNS[1].sub(r"\1" + REDACTED, text)
+
+
+def _parse_mapping(raw: str) -> Dict[str, str]:
+    """Разбирает строку вида "app.auth=DEBUG,sqlalchemy.engine=WARNING"."""
+    result = {}
+    for item in filter(None, (part.strip() for part in raw.split(","))):
+        name, _, value = item.partition("=")
+        result[name.strip()] = value.strip()
+    return result
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирует запись в одну JSON-строку. Выполняется в потоке QueueListener."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": redact(record.getMessage()),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Пропускает только долю записей уровня INFO и ниже для шумных логгеров.
+    Предупреждения и ошибки не сэмплируются.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO or not self.rates:
+            return True
+        name = record.name
+        while name:
+            rate = self.rates.get(name)
+            if rate is not None:
+                return random.random() < rate
+            name = name.rpartition(".")[0]
+        return True
+
+
+class TraceContextFilter(logging.Filter):
+    """Добавляет trace_id/span_id текущего span, чтобы по логам находить трассу запроса."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace_id, span_id = current_trace_ids()
+        if trace_id is not None:
+            record.trace_id = trace_id
+            record.span_id = span_id
+        return True
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    QueueHandler, который не форматирует запись в вызывающем потоке.
+
+    Стандартный QueueHandler.prepare() склеивает msg % args еще на event loop,
+    здесь форматирование (и редактирование токенов) целиком уходит в поток слушателя.
+    Исключение - изменяемые аргументы (списки, словари, объекты): к моменту
+    форматирования их могли изменить, поэтому такое сообщение склеивается сразу.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.args and not _immutable(record.args):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+def _immutable(value) -> bool:
+    if isinstance(value, _IMMUTABLE_ARG_TYPES):
+        return True
+    if isinstance(value, (tuple, frozenset)):
+        return all(map(_immutable, value))
+    # logger.info("%(name)s", {...}) - словарь передается единственным аргументом
+    if isinstance(value, dict):
+        return all(map(_immutable, value.values()))
+    return False
+
+
+def setup_logging():
+    """
+    Единая настройка логирования приложения.
+
+    Логи пишутся в очередь неблокирующим обработчиком и выводятся в stdout
+    отдельным потоком в формате JSON. Настройки (app.settings):
+    log_level - общий уровень, log_levels - уровни по модулям,
+    log_sampling - доля сохраняемых INFO/DEBUG записей по модулям.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    levels = {"sqlalchemy.engine": "WARNING", **_parse_mapping(settings.log_levels)}
+    sampling = {name: float(rate) for name, rate in _parse_mapping(settings.log_sampling).items()}
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = LazyQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(sampling))
+    # Контекст трассы берется в вызывающем потоке, пока span еще активен
+    queue_handler.addFilter(TraceContextFilter())
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(settings.log_level.upper())
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    """
+    Дописывает оставшиеся в очереди записи и останавливает поток слушателя.
+
+    Обработчики слушателя (с фильтрами очереди) подключаются к корневому логгеру
+    напрямую: записи после остановки, например при завершении процесса, не теряются в очереди.
+    """
+    global _listener
+    if _listener is None:
+        return
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        if isinstance(handler, LazyQueueHandler):
+            root.removeHandler(handler)
+            for target in _listener.handlers:
+                for log_filter in handler.filters:
+                    target.addFilter(log_filter)
+    for handler in _listener.handlers:
+        root.addHandler(handler)
+    _listener.stop()
+    _listener = None
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import os
+from typing import Callable, List, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Режим нескольких процессов (uvicorn --workers): переменную ставит app.server до запуска воркеров.
+# Тогда значения метрик лежат в файлах каталога, и любой воркер отдает сумму по всем
+MULTIPROC_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+# Задержка event loop: насколько позже запланированного проснулась корутина-пульс
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds",
+    "Задержка event loop",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+# Блокировки event loop дольше порога, по месту в коде приложения
+EVENT_LOOP_BLOCKS = Counter(
+    "event_loop_blocking_total",
+    "Число блокировок event loop дольше порога",
+    ["offender"],
+)
+
+# Вызовы чтения, получившие результат уже выполняющегося одинакового запроса
+SINGLEFLIGHT_SHARED = Counter(
+    "singleflight_shared_total",
+    "Запросы чтения, объединенные с одновременным одинаковым запросом",
+    ["function"],
+)
+
+# Функции, которые записывают в Gauge текущее состояние процесса (например, пул Redis).
+# Gauge.set_function в режиме нескольких процессов не работает: значение должно попасть в файл
+_refreshers: List[Callable[[], None]] = []
+
+
+def is_multiprocess() -> bool:
+    return MULTIPROC_ENV in os.environ
+
+
+def prepare_multiprocess_dir(path: str = settings.prometheus_multiproc_dir):
+    """
+    Включает режим нескольких процессов. Вызывается главным процессом до импорта
+    prometheus_client воркерами: каталог очищается от файлов прошлого запуска.
+    """
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name.endswith(".db"):
+            os.remove(os.path.join(path, name))
+    os.environ[MULTIPROC_ENV] = path
+
+
+def mark_process_dead():
+    """Убирает live-метрики завершающегося процесса, чтобы они не суммировались с живыми."""
+    if is_multiprocess():
+        multiprocess.mark_process_dead(os.getpid())
+
+
+def register_refresher(func: Callable[[], None]) -> Callable[[], None]:
+    _refreshers.append(func)
+    return func
+
+
+def refresh_metrics():
+    for func in _refreshers:
+        try:
+            func()
+        except Exception as e:
+            logger.debug("Не удалось обновить метрику %s: %r", func.__name__, e)
+
+
+class MetricsRefresher:
+    """Периодически обновляет метрики-снимки процесса (settings.metrics_refresh_interval)."""
+
+    def __init__(self, interval: float = settings.metrics_refresh_interval):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            refresh_metrics()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="metrics-refresher")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+
+metrics_refresher = MetricsRefresher()
+
+
+async def metrics_endpoint(_request: Request) -> Response:
+    """Отдает метрики в текстовом формате Prometheus (при нескольких воркерах - по всем процессам)."""
+    refresh_metrics()
+    if not is_multiprocess():
+        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,110 @@
+import asyncio
+import inspect
+import statistics
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+# Одновременно на воркере выполняется только один сбор профиля
+profiler_lock = asyncio.Lock()
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{code.co_qualname}".replace(";", ",")
+
+
+@dataclass
+class ProfileResult:
+    seconds: float
+    interval_ms: float
+    samples: int
+    stacks: Counter = field(default_factory=Counter)
+    coroutines: Counter = field(default_factory=Counter)
+    loop_lag_ms: List[float] = field(default_factory=list)
+
+    def collapsed(self) -> str:
+        """Стек в формате collapsed (flamegraph.pl, speedscope, inferno)."""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def lag_summary(self) -> Dict[str, float]:
+        lags = sorted(self.loop_lag_ms) or [0.0]
+        return {
+            "mean_ms": round(statistics.fmean(lags), 2),
+            "p50_ms": round(lags[len(lags) // 2], 2),
+            "p99_ms": round(lags[min(len(lags) - 1, int(len(lags) * 0.99))], 2),
+            "max_ms": round(lags[-1], 2),
+        }
+
+    def slowest_coroutines(self, limit: int = 20) -> List[Dict]:
+        """Корутины, дольше всего занимавшие event loop (оценка по числу выборок)."""
+        return [
+            {"coroutine": name, "samples": count, "cpu_ms": round(count * self.interval_ms, 1)}
+            for name, count in self.coroutines.most_common(limit)
+        ]
+
+
+class _Sampler(threading.Thread):
+    """Поток, который с заданным интервалом снимает стек потока event loop."""
+
+    def __init__(self, target_thread_id: int, interval: float, result: ProfileResult):
+        super().__init__(name="sampling-profiler", daemon=True)
+        self.target_thread_id = target_thread_id
+        self.interval = interval
+        self.result = result
+        self.stop_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target_thread_id)
+            if frame is None:
+                continue
+            stack = []
+            coroutines = set()
+            while frame is not None:
+                label = _frame_label(frame)
+                stack.append(label)
+                if frame.f_code.co_flags & inspect.CO_COROUTINE:
+                    coroutines.add(label)
+                frame = frame.f_back
+            self.result.stacks[";".join(reversed(stack))] += 1
+            self.result.coroutines.update(coroutines)
+            self.result.samples += 1
+
+
+async def _measure_loop_lag(interval: float, stop: asyncio.Event, lags: List[float]):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, (loop.time() - started - interval) * 1000))
+
+
+async def capture_profile(seconds: float, interval_ms: float = 5.0) -> ProfileResult:
+    """
+    Снимает профиль потока event loop текущего воркера в течение seconds секунд.
+
+    Профилировщик сэмплирующий: целевой поток не инструментируется, поэтому
+    накладные расходы ограничены одним обходом стека на выборку.
+    Параллельно измеряется задержка event loop.
+    """
+    result = ProfileResult(seconds=seconds, interval_ms=interval_ms, samples=0)
+    sampler = _Sampler(threading.get_ident(), interval_ms / 1000, result)
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(_measure_loop_lag(0.05, stop, result.loop_lag_ms))
+
+    sampler.start()
+    started = time.perf_counter()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        sampler.stop_event.set()
+        stop.set()
+        await lag_task
+        await asyncio.to_thread(sampler.join)
+    result.seconds = round(time.perf_counter() - started, 3)
+    return result
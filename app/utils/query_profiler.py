@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import partial
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class SlowQuery(NamedTuple):
+    statement: str
+    parameters: object
+    elapsed_ms: float
+    # Движок, на котором выражение выполнено (основная БД или реплика): EXPLAIN снимается там же
+    engine: AsyncEngine
+
+
+@dataclass
+class QueryStats:
+    """Статистика SQL за один HTTP-запрос (или блок count_queries)."""
+    count: int = 0
+    total_ms: float = 0.0
+    statements: List[str] = field(default_factory=list)
+    slow: List[SlowQuery] = field(default_factory=list)
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+# Ссылки на фоновые задачи EXPLAIN, чтобы их не собрал сборщик мусора
+_explain_tasks = set()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Время начала - в контексте выполнения этого выражения: стек в conn.info
+    # рассинхронизируется, если выражение упало и after_cursor_execute не вызван
+    context._query_start_time = time.perf_counter()
+
+
+def _after_cursor_execute(engine, conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    elapsed_ms = (time.perf_counter() - context._query_start_time) * 1000
+    stats.count += 1
+    stats.total_ms += elapsed_ms
+    stats.statements.append(statement)
+    if elapsed_ms >= settings.slow_query_ms:
+        stats.slow.append(SlowQuery(statement, parameters, elapsed_ms, engine))
+        logger.warning("Медленный SQL (%.1f мс): %s", elapsed_ms, statement)
+
+
+def install_query_profiler(engine):
+    """Подписывается на события движка. Контекст запроса проходит в greenlet SQLAlchemy через contextvars."""
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", partial(_after_cursor_execute, engine))
+
+
+async def _explain_slow_queries(slow: List[SlowQuery]):
+    """
+    Снимает план медленных SELECT отдельным соединением, уже после ответа клиенту.
+    План берется с того же движка, что выполнил выражение: у реплики он может отличаться.
+    """
+    for statement, parameters, elapsed_ms, engine in slow:
+        if not statement.lstrip().upper().startswith("SELECT"):
+            continue
+        try:
+            async with engine.connect() as conn:
+                result = await conn.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+                plan = "\n".join(row[0] for row in result)
+            logger.warning("План медленного SQL (%.1f мс): %s\n%s", elapsed_ms, statement, plan)
+        except Exception as e:
+            logger.warning("Не удалось получить EXPLAIN: %r", e)
+
+
+def query_budget_middleware():
+    """
+    HTTP middleware: считает SQL-выражения и время БД на запрос.
+
+    Результат отдается в заголовках X-DB-Query-Count и Server-Timing,
+    превышение бюджета пишется в лог с путем запроса.
+    """
+    async def middleware(request, call_next):
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+        try:
+            response = await call_next(request)
+        finally:
+            _current_stats.reset(token)
+
+        response.headers["X-DB-Query-Count"] = str(stats.count)
+        response.headers["Server-Timing"] = f'db;dur={stats.total_ms:.1f};desc="{stats.count} queries"'
+        if stats.count > settings.query_count_budget or stats.total_ms > settings.query_time_budget_ms:
+            logger.warning("Превышен бюджет SQL: %s %s - %s запросов, %.1f мс",
+                           request.method, request.url.path, stats.count, stats.total_ms,
+                           extra={"db_query_count": stats.count, "db_time_ms": round(stats.total_ms, 1)})
+        if stats.slow and settings.slow_query_explain:
+            task = asyncio.create_task(_explain_slow_queries(stats.slow))
+            _explain_tasks.add(task)
+            task.add_done_callback(_explain_tasks.discard)
+        return response
+    return middleware
+
+
+@contextmanager
+def count_queries():
+    """
+    Считает SQL-выражения внутри блока (для тестов и отладки).
+
+        with count_queries() as stats:
+            await crud.get_company(db, 1)
+        assert stats.count == 1
+    """
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+@contextmanager
+def assert_max_queries(expected: int):
+    """Падает, если внутри блока выполнено больше expected SQL-выражений (ловит N+1)."""
+    with count_queries() as stats:
+        yield stats
+    assert stats.count <= expected, (
+        f"Ожидалось не более {expected} SQL-запросов, выполнено {stats.count}:\n"
+        + "\n".join(stats.statements)
+    )
+
+
+def assert_response_queries(response, expected: int):
+    """Проверка бюджета по заголовку ответа - для запросов через TestClient/httpx."""
+    actual = int(response.headers["X-DB-Query-Count"])
+    assert actual <= expected, f"{response.request.url.path}: ожидалось не более {expected} SQL-запросов, выполнено {actual}"
@@ -1,56 +1,110 @@
+import asyncio
 import logging
+from contextlib import asynccontextmanager
+from typing import Optional
 
-import redis
-from dotenv import load_dotenv
-from redis.exceptions import ConnectionError
-from redis.asyncio import Redis
-import os
+from prometheus_client import Gauge
+from redis.asyncio import BlockingConnectionPool, Redis
+from redis.asyncio.retry import Retry
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError, RedisError, TimeoutError
 
-load_dotenv()  # Загружаем переменные окружения из .env файла
+from app.settings import settings
+from app.utils.metrics import register_refresher
 
-REDIS_HOST = os.getenv("REDIS_HOST")
-REDIS_PORT = os.getenv("REDIS_PORT")
-
-# Настройка логирования
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-redis_instance = None
+redis_pool: Optional[BlockingConnectionPool] = None
+redis_instance: Optional[Redis] = None
+
+# У каждого процесса свой пул: при нескольких воркерах значения суммируются по живым процессам
+REDIS_POOL_IN_USE = Gauge("redis_pool_in_use_connections", "Занятые соединения пула Redis",
+                          multiprocess_mode="livesum")
+REDIS_POOL_AVAILABLE = Gauge("redis_pool_available_connections", "Свободные соединения пула Redis",
+                             multiprocess_mode="livesum")
+REDIS_POOL_MAX = Gauge("redis_pool_max_connections", "Размер пула Redis", multiprocess_mode="livesum")
+
+
+@register_refresher
+def _refresh_pool_metrics():
+    REDIS_POOL_IN_USE.set(len(redis_pool._in_use_connections) if redis_pool else 0)
+    REDIS_POOL_AVAILABLE.set(len(redis_pool._available_connections) if redis_pool else 0)
+    REDIS_POOL_MAX.set(redis_pool.max_connections if redis_pool else 0)
 
 
 async def init_redis():
-    global redis_instance
-    try:
-        logger.info("Инициализация подключения к Redis...")
-        redis_instance = Redis(host=REDIS_HOST, port=int(REDIS_PORT))
-        await redis_instance.ping()  # Проверка соединения с Redis
+    """
+    Создает пул соединений и клиента Redis. Вызывается один раз из lifespan.
+
+    Разорванные соединения переподключаются автоматически: команды
+    повторяются с экспоненциальной задержкой, простаивающие соединения
+    проверяются PING-ом раз в settings.redis_health_check_interval секунд.
+    """
+    global redis_pool, redis_instance
+    if redis_instance is not None:
+        return
+    redis_pool = BlockingConnectionPool(
+        host=settings.redis_host,
+        port=settings.redis_port,
+        max_connections=settings.redis_max_connections,
+        timeout=settings.redis_pool_timeout,
+        socket_timeout=settings.redis_socket_timeout,
+        socket_connect_timeout=settings.redis_socket_timeout,
+        health_check_interval=settings.redis_health_check_interval,
+        retry=Retry(ExponentialBackoff(cap=1, base=0.05), retries=3),
+        retry_on_error=[ConnectionError, TimeoutError],
+    )
+    redis_instance = Redis(connection_pool=redis_pool)
+    logger.info("Инициализация подключения к Redis (пул %s соединений)...", settings.redis_max_connections)
+    if await redis_health():
         logger.info("Подключение к Redis успешно установлено.")
-    except ConnectionError as e:
-        logger.error("Ошибка подключения к Redis: %s", e)
+    else:
+        logger.error("Redis недоступен, подключение будет восстановлено при следующих запросах.")
 
 
-async def get_redis():
-    global redis_instance
-    if redis_instance is None:  # Использование сравнения с None
+async def get_redis() -> Redis:
+    if redis_instance is None:  # Например, при вызове вне приложения (скрипты)
         await init_redis()
-    else:
-        logger.info("Используется существующее подключение к Redis.")
     return redis_instance
 
 
+async def redis_health(timeout: float = 1.0) -> bool:
+    """Проверка доступности Redis для /health и при старте."""
+    if redis_instance is None:
+        return False
+    try:
+        return bool(await asyncio.wait_for(redis_instance.ping(), timeout=timeout))
+    # RedisError - любая ошибка клиента: нет соединения, пул исчерпан, ответ с ошибкой (LOADING, READONLY)
+    except (RedisError, asyncio.TimeoutError) as e:
+        logger.warning("Redis не отвечает: %r", e)
+        return False
+
+
 async def close_redis():
-    global redis_instance
+    global redis_pool, redis_instance
     if redis_instance is not None:  # Дополнительная проверка на None
         logger.info("Закрытие соединения с Redis...")
-        await redis_instance.close()
+        await redis_instance.aclose()
+        await redis_pool.aclose()
         redis_instance = None  # Установка в None после закрытия соединения
+        redis_pool = None
         logger.info("Соединение с Redis закрыто.")
     else:
         logger.warning("Попытка закрыть соединение с Redis, но оно уже не открыто.")
 
 
-async def save_decoded_token_to_redis(user_login: str, decoded_data: dict, redis_client: redis.Redis):
+@asynccontextmanager
+async def redis_pipeline(transaction: bool = False):
     """
-    Сохранение декодированных данных токена в Redis.
+    Копит команды и отправляет их в Redis одним обращением при выходе из блока.
+
+        async with redis_pipeline() as pipe:
+            pipe.hset(f"job:{job_id}", mapping=state)
+            pipe.lpush("jobs:queue", job_id)
+
+    transaction=True оборачивает пачку в MULTI/EXEC.
     """
-    await redis_client.set(f"decoded_user:{user_login}", str(decoded_data))
+    client = await get_redis()
+    async with client.pipeline(transaction=transaction) as pipe:
+        yield pipe
+        await pipe.execute()
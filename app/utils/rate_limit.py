@@ -0,0 +1,154 @@
+import asyncio
+import logging
+import math
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Tuple
+
+from fastapi import HTTPException, Request
+from redis.exceptions import RedisError
+from starlette import status
+
+from app.settings import settings
+from app.utils.radis import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Скользящее окно по журналу запросов в ZSET. Проверка и запись атомарны - это один Lua-скрипт.
+# KEYS[1] - ключ; ARGV: текущее время (мс), окно (мс), лимит, уникальный id запроса.
+# Возвращает {1, 0}, если запрос пропущен, иначе {0, через сколько мс освободится слот}.
+SLIDING_WINDOW_LUA = """
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, now - window)
+if redis.call('ZCARD', KEYS[1]) < limit then
+    redis.call('ZADD', KEYS[1], now, ARGV[4])
+    redis.call('PEXPIRE', KEYS[1], window)
+    return {1, 0}
+end
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+return {0, tonumber(oldest[2]) + window - now}
+"""
+
+# Лимиты по умолчанию: имя -> (число запросов, окно в секундах).
+# Переопределяются через RATE_LIMITS="login_ip=20/60,login_user=5/60,write_ip=60/60".
+DEFAULT_RATE_LIMITS = {
+    "login_ip": (20, 60),
+    "login_user": (5, 60),
+    "write_ip": (60, 60),
+}
+# Максимум ключей в локальном резервном лимитере одного процесса
+LOCAL_FALLBACK_MAX_KEYS = 10_000
+
+# Общий для всех лимитеров процесса момент (time.monotonic), до которого Redis не опрашивается.
+# Без этого при недоступном Redis каждый запрос ждал бы повторов клиента (Retry в app.utils.radis)
+_redis_skip_until = 0.0
+
+
+def _load_limits() -> Dict[str, Tuple[int, int]]:
+    limits = dict(DEFAULT_RATE_LIMITS)
+    for item in filter(None, (part.strip() for part in settings.rate_limits.split(","))):
+        name, _, value = item.partition("=")
+        count, _, window = value.partition("/")
+        limits[name.strip()] = (int(count), int(window))
+    return limits
+
+
+RATE_LIMITS = _load_limits()
+
+
+@dataclass
+class RateLimiter:
+    """
+    Распределенный лимитер запросов со скользящим окном.
+
+    Счетчики хранятся в Redis и общие для всех воркеров. Если Redis
+    недоступен, работает локальное окно в памяти процесса: лимит
+    становится приблизительным, но дорогие запросы все равно отсекаются.
+    Обращение к Redis ограничено settings.rate_limit_redis_timeout, после
+    ошибки Redis пропускается settings.rate_limit_redis_cooldown секунд.
+    """
+    name: str
+    limit: int
+    window: int
+
+    def __post_init__(self):
+        self._local: Dict[str, Deque[float]] = {}
+        self._script = None
+
+    async def _hit_redis(self, key: str) -> Tuple[bool, float]:
+        client = await get_redis()
+        if self._script is None or self._script.registered_client is not client:
+            # Скрипт вызывается через EVALSHA, тело отправляется только при первом NOSCRIPT
+            self._script = client.register_script(SLIDING_WINDOW_LUA)
+        now_ms = int(time.time() * 1000)
+        allowed, retry_ms = await self._script(
+            keys=[f"rate_limit:{self.name}:{key}"],
+            args=[now_ms, self.window * 1000, self.limit, f"{now_ms}-{uuid.uuid4().hex}"],
+        )
+        return bool(allowed), retry_ms / 1000
+
+    def _hit_local(self, key: str) -> Tuple[bool, float]:
+        now = time.monotonic()
+        if key not in self._local and len(self._local) >= LOCAL_FALLBACK_MAX_KEYS:
+            self._local.clear()
+        hits = self._local.setdefault(key, deque())
+        while hits and hits[0] <= now - self.window:
+            hits.popleft()
+        if len(hits) < self.limit:
+            hits.append(now)
+            return True, 0.0
+        return False, hits[0] + self.window - now
+
+    async def hit(self, key: str):
+        """Учитывает запрос; при превышении лимита - 429 с заголовком Retry-After."""
+        global _redis_skip_until
+        if time.monotonic() < _redis_skip_until:
+            allowed, retry_after = self._hit_local(key)
+        else:
+            try:
+                async with asyncio.timeout(settings.rate_limit_redis_timeout):
+                    allowed, retry_after = await self._hit_redis(key)
+            except (RedisError, TimeoutError) as e:
+                logger.warning("Лимитер %s: Redis недоступен (%r), локальный счетчик на %s с",
+                               self.name, e, settings.rate_limit_redis_cooldown)
+                _redis_skip_until = time.monotonic() + settings.rate_limit_redis_cooldown
+                allowed, retry_after = self._hit_local(key)
+        if not allowed:
+            logger.warning("Лимит запросов %s превышен для %s", self.name, key)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Слишком много запросов. Повторите позже.",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+
+
+_limiters: Dict[str, RateLimiter] = {}
+
+
+def get_limiter(name: str) -> RateLimiter:
+    if name not in _limiters:
+        limit, window = RATE_LIMITS[name]
+        _limiters[name] = RateLimiter(name, limit, window)
+    return _limiters[name]
+
+
+def client_ip(request: Request) -> str:
+    return request.client.host if request.client else "unknown"
+
+
+def limit_by_ip(name: str):
+    """
+    Зависимость FastAPI: лимит по IP клиента, проверяется до обращения к БД.
+
+    Счетчик у каждого маршрута свой: один лимит (например, write_ip) на нескольких
+    эндпоинтах не делит окно между ними, и запросы к одному не исчерпывают другие.
+    """
+    async def dependency(request: Request):
+        route = request.scope.get("route")
+        path = route.path if route is not None else request.url.path
+        await get_limiter(name).hit(f"{request.method} {path}:{client_ip(request)}")
+    return dependency
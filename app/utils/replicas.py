@@ -0,0 +1,131 @@
+import asyncio
+import itertools
+import logging
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.requests import Request
+
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+READ_YOUR_WRITES_COOKIE = "db_primary"
+
+# Отставание: время с последней примененной транзакции.
+# Если новых записей на основной БД нет, отставание считаем нулевым - но только
+# при живом потоке WAL: без него равенство LSN значит лишь, что реплика применила
+# все, что успела получить. Нет WAL receiver в статусе streaming - NULL (реплика неисправна).
+# status в pg_stat_wal_receiver виден суперпользователю и роли pg_read_all_stats
+LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+
+
+@dataclass
+class Replica:
+    engine: AsyncEngine
+    healthy: bool = False
+    lag: Optional[float] = None
+    checked: bool = False
+
+    @property
+    def name(self) -> str:
+        return self.engine.url.render_as_string(hide_password=True)
+
+
+@dataclass
+class ReplicaRouter:
+    """
+    Выбор реплики для чтения: round-robin среди здоровых реплик.
+
+    Фоновая задача периодически опрашивает реплики. Недоступная реплика
+    или реплика с отставанием больше settings.replica_max_lag исключается из ротации
+    до следующей успешной проверки. Если подходящих реплик нет (или проверка
+    еще не выполнялась), чтение идет на основную БД.
+    """
+
+    replicas: List[Replica] = field(default_factory=list)
+    _task: Optional[asyncio.Task] = field(default=None, init=False, repr=False)
+
+    def __post_init__(self):
+        self._counter = itertools.count()
+
+    def pick(self) -> Optional[AsyncEngine]:
+        candidates = [replica for replica in self.replicas if replica.healthy]
+        if not candidates:
+            return None
+        return candidates[next(self._counter) % len(candidates)].engine
+
+    async def check(self, replica: Replica):
+        try:
+            async with asyncio.timeout(settings.replica_check_timeout):
+                async with replica.engine.connect() as conn:
+                    lag = (await conn.execute(LAG_QUERY)).scalar()
+            if lag is None:
+                raise RuntimeError("нет потока WAL с основной БД (pg_stat_wal_receiver)")
+            lag = float(lag)
+        except Exception as e:
+            if replica.healthy or not replica.checked:
+                logger.warning("Реплика %s недоступна, чтение переключено: %r", replica.name, e)
+            replica.healthy, replica.lag, replica.checked = False, None, True
+            return
+        healthy = lag <= settings.replica_max_lag
+        if healthy != replica.healthy:
+            logger.warning("Реплика %s %s ротации, отставание %.1f с",
+                           replica.name, "возвращена в" if healthy else "исключена из", lag)
+        replica.healthy, replica.lag, replica.checked = healthy, lag, True
+
+    async def check_all(self):
+        await asyncio.gather(*(self.check(replica) for replica in self.replicas))
+
+    async def run(self):
+        while True:
+            await self.check_all()
+            await asyncio.sleep(settings.replica_check_interval)
+
+    async def start(self):
+        if not self.replicas or self._task is not None:
+            return
+        # Первая проверка до приема запросов, чтобы сразу читать с реплик
+        await self.check_all()
+        self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+    def status(self) -> dict:
+        return {replica.name: {"healthy": replica.healthy, "lag": replica.lag} for replica in self.replicas}
+
+
+def wants_primary(request: Request) -> bool:
+    """Клиент недавно писал - его чтения идут на основную БД."""
+    return READ_YOUR_WRITES_COOKIE in request.cookies
+
+
+async def read_your_writes_middleware(request: Request, call_next):
+    """
+    После успешного изменяющего запроса ставит короткоживущую cookie:
+    пока она есть, GET этого клиента не уходят на реплику и видят свою запись.
+    """
+    response = await call_next(request)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        response.set_cookie(READ_YOUR_WRITES_COOKIE, "1", max_age=settings.read_your_writes_seconds, httponly=True)
+    return response
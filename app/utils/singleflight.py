@@ -0,0 +1,87 @@
+import asyncio
+import functools
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+from app.utils.metrics import SINGLEFLIGHT_SHARED
+
+T = TypeVar("T")
+
+
+def _clone_exception(exc: BaseException) -> BaseException:
+    """
+    Копия исключения первого вызова для ожидающего.
+
+    Одно и то же исключение, поднятое в нескольких задачах, получает общий
+    __traceback__ и __context__, которые перезаписывает каждый raise.
+    copy.copy не подходит: он вызывает __init__ с args, а у многих исключений
+    (HTTPException) другие обязательные параметры.
+    """
+    clone = exc.__class__.__new__(exc.__class__, *exc.args)
+    clone.__dict__.update(exc.__dict__)
+    return clone
+
+
+class SingleFlight:
+    """
+    Объединяет одновременные одинаковые вызовы внутри процесса.
+
+    Пока первый вызов с ключом выполняется, остальные с тем же ключом
+    не идут в БД, а ждут его результат (или исключение). После завершения
+    ключ удаляется - кеширования между запросами нет.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        future = self._calls.get(key)
+        if future is not None:
+            SINGLEFLIGHT_SHARED.labels(function=self.name).inc()
+            try:
+                # shield - отмена ожидающего запроса не должна отменять общий вызов
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if future.cancelled():
+                    # Отменили первый запрос (клиент отключился) - выполняем сами
+                    return await self.do(key, func)
+                raise
+            except Exception as e:
+                # Исходное исключение остается причиной (__cause__): видна трасса первого вызова
+                raise _clone_exception(e) from e
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Помечаем как полученное, если ожидающих не было
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._calls.pop(key, None)
+
+
+def coalesced(func):
+    """
+    Декоратор для функций чтения вида func(db, *args, **kwargs).
+
+    Ключ строится из аргументов без сессии: одновременные запросы разных
+    клиентов за одной и той же записью выполняют один SQL-запрос.
+    В ключ входит движок сессии - чтение с реплики не подменяет чтение
+    с основной БД (read-your-writes).
+    Результат общий, поэтому вызывающий код не должен его изменять.
+    """
+    group = SingleFlight(func.__qualname__)
+
+    @functools.wraps(func)
+    async def wrapper(db, *args, **kwargs):
+        key = (db.bind, args, tuple(sorted(kwargs.items())))
+        return await group.do(key, lambda: func(db, *args, **kwargs))
+    return wrapper
@@ -0,0 +1,120 @@
+import csv
+import io
+import os
+from datetime import date, datetime, time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Форматы загружаемых таблиц по расширению файла
+SPREADSHEET_FORMATS = {".csv": "csv", ".xlsx": "xlsx"}
+
+# Строка таблицы: номер строки в файле (как видит пользователь) и значения по заголовкам
+SheetRow = Tuple[int, Dict[str, Any]]
+
+
+def spreadsheet_format(filename: Optional[str]) -> Optional[str]:
+    """Формат по имени файла: csv, xlsx или None, если формат не поддерживается."""
+    return SPREADSHEET_FORMATS.get(os.path.splitext(filename or "")[1].lower())
+
+
+def _normalize_header(value: Any) -> str:
+    return str(value or "").strip().lower()
+
+
+def _cell(value: Any) -> Any:
+    """
+    Значение ячейки XLSX в виде, в котором оно пришло бы из CSV.
+
+    Числа и даты Excel приводятся к строкам, чтобы телефон 79001234567
+    не стал int, а дата рождения - datetime с полуночью; проверку типов
+    дальше выполняет pydantic-схема, как для CSV.
+    """
+    if value is None or isinstance(value, (bool, str)):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime):
+        return value.date().isoformat() if value.time() == time() else value.isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+class SpreadsheetReader:
+    """
+    Потоковое чтение CSV/XLSX построчно.
+
+    В памяти только текущая строка: CSV читается через csv.reader,
+    XLSX - openpyxl в режиме read_only (лист разбирается по мере чтения XML).
+    Первая строка - заголовки, они приводятся к нижнему регистру.
+    Пустые ячейки и пустые строки CSV превращаются в None, полностью
+    пустые строки пропускаются.
+
+    Чтение блокирующее - из асинхронного кода вызывать через asyncio.to_thread.
+    """
+
+    def __init__(self, path: str, format: str):
+        self.path = path
+        self.format = format
+        self.header: List[str] = []
+        self._size = os.path.getsize(path) or 1
+        self._total_rows: Optional[int] = None
+        self._position = 0
+        self._file = None
+        self._workbook = None
+        self._rows: Iterator[Tuple[int, List[Any]]] = self._open()
+        first = next(self._rows, None)
+        self.header = [_normalize_header(value) for value in first[1]] if first else []
+
+    def _open(self) -> Iterator[Tuple[int, List[Any]]]:
+        if self.format == "csv":
+            self._file = open(self.path, "rb")
+            text = io.TextIOWrapper(self._file, encoding="utf-8-sig", newline="")
+            sample = text.read(64 * 1024)
+            text.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+            except csv.Error:
+                dialect = csv.excel
+            reader = csv.reader(text, dialect)
+            return ((reader.line_num, [value.strip() or None for value in row]) for row in reader)
+
+        if self.format == "xlsx":
+            # Импорт здесь: openpyxl нужен только для загрузки XLSX
+            from openpyxl import load_workbook
+
+            self._workbook = load_workbook(self.path, read_only=True, data_only=True)
+            sheet = self._workbook.worksheets[0]
+            self._total_rows = sheet.max_row
+            return (
+                (line, [_cell(value) for value in row])
+                for line, row in enumerate(sheet.iter_rows(values_only=True), start=1)
+            )
+
+        raise ValueError(f"Неподдерживаемый формат {self.format}")
+
+    def __iter__(self) -> Iterator[SheetRow]:
+        for line, values in self._rows:
+            self._position = line
+            if not any(value not in (None, "") for value in values):
+                continue
+            yield line, {name: value for name, value in zip(self.header, values) if name}
+
+    def progress(self) -> float:
+        """Прочитанная доля файла от 0 до 1 (по строкам для XLSX, по байтам для CSV)."""
+        if self._total_rows:
+            return min(self._position / self._total_rows, 1.0)
+        if self._file is not None and not self._file.closed:
+            return min(self._file.tell() / self._size, 1.0)
+        return 0.0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        if self._workbook is not None:
+            self._workbook.close()
+
+    def __enter__(self) -> "SpreadsheetReader":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,114 @@
+import functools
+import json
+import logging
+import os
+import threading
+from typing import Optional, Sequence
+
+from opentelemetry import trace
+
+from app.settings import settings
+
+logger = logging.getLogger(__name__)
+
+tracer = trace.get_tracer("app")
+
+
+def traced(name: Optional[str] = None):
+    """
+    Декоратор: оборачивает асинхронную функцию в span.
+
+    Пока трассировка не включена, используется no-op трассировщик
+    и накладные расходы сводятся к одному вызову контекстного менеджера.
+    """
+    def decorator(func):
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with tracer.start_as_current_span(span_name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_trace_ids():
+    """Возвращает (trace_id, span_id) текущего span в hex или (None, None)."""
+    context = trace.get_current_span().get_span_context()
+    if not context.is_valid:
+        return None, None
+    return format(context.trace_id, "032x"), format(context.span_id, "016x")
+
+
+def _file_exporter(path: str):
+    from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+
+    class FileSpanExporter(SpanExporter):
+        """Пишет завершенные span в файл по одному JSON на строку."""
+
+        def __init__(self):
+            self._lock = threading.Lock()
+
+        def export(self, spans: Sequence) -> SpanExportResult:
+            with self._lock, open(path, "a", encoding="utf-8") as f:
+                for span in spans:
+                    f.write(json.dumps(json.loads(span.to_json()), ensure_ascii=False) + "\n")
+            return SpanExportResult.SUCCESS
+
+        def shutdown(self):
+            pass
+
+    return FileSpanExporter()
+
+
+def init_tracing(app):
+    """
+    Включает трассировку маршрутов FastAPI, SQL-запросов и вызовов Redis.
+    Вызывается до создания движков БД: инструментирование оборачивает
+    create_async_engine, и все движки, созданные после, трассируются.
+
+    Инструментирование импортируется лениво, только если экспортер задан.
+    Адрес коллектора для otlp берется из стандартной OTEL_EXPORTER_OTLP_ENDPOINT.
+    """
+    exporter = settings.otel_traces_exporter.lower()
+    if exporter == "none":
+        return
+
+    from dotenv import dotenv_values
+
+    # SDK OpenTelemetry читает свои OTEL_* только из окружения процесса, а .env читают лишь
+    # настройки приложения - переносим их в окружение (заданные в окружении важнее)
+    for name, value in dotenv_values(settings.model_config["env_file"]).items():
+        if name.startswith("OTEL_") and value is not None:
+            os.environ.setdefault(name, value)
+
+    from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+    from opentelemetry.instrumentation.redis import RedisInstrumentor
+    from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor
+
+    provider = TracerProvider(resource=Resource.create({"service.name": settings.otel_service_name}))
+    if exporter == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+    elif exporter == "file":
+        provider.add_span_processor(SimpleSpanProcessor(_file_exporter(settings.otel_traces_file)))
+    else:
+        logger.warning("Неизвестный OTEL_TRACES_EXPORTER=%s (допустимы none, otlp, file), трассировка выключена",
+                       exporter)
+        return
+    trace.set_tracer_provider(provider)
+
+    FastAPIInstrumentor.instrument_app(app)
+    SQLAlchemyInstrumentor().instrument()
+    RedisInstrumentor().instrument()
+    logger.info("Трассировка включена, экспортер: %s", exporter)
+
+
+def shutdown_tracing():
+    """Выгружает накопленные span перед остановкой приложения."""
+    provider = trace.get_tracer_provider()
+    if hasattr(provider, "shutdown"):
+        provider.shutdown()
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from app.settings import settings
+from app.utils.metrics import EVENT_LOOP_BLOCKS, EVENT_LOOP_LAG
+
+logger = logging.getLogger(__name__)
+
+
+def _offender(frame) -> str:
+    """Самый глубокий кадр кода приложения в стеке - туда и смотреть."""
+    fallback = None
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith("app.") and not module.startswith("app.utils.watchdog"):
+            return f"{module}:{frame.f_code.co_name}"
+        if fallback is None:
+            fallback = f"{module}:{frame.f_code.co_name}"
+        frame = frame.f_back
+    return fallback or "unknown"
+
+
+class LoopWatchdog:
+    """
+    Следит за event loop текущего процесса.
+
+    Корутина-пульс на loop каждые settings.watchdog_interval секунд отмечается и пишет
+    задержку в гистограмму. Отдельный поток проверяет, что пульс не пропал:
+    если loop занят дольше settings.watchdog_threshold, снимается стек потока loop
+    и увеличивается счетчик блокировок для виновного места в коде.
+    """
+
+    def __init__(self, interval: float = settings.watchdog_interval, threshold: float = settings.watchdog_threshold):
+        self.interval = interval
+        self.threshold = threshold
+        self.offenders: Counter = Counter()
+        self.stacks: List[str] = []
+        self._last_beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    async def _heartbeat(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            self._last_beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            EVENT_LOOP_LAG.observe(max(0.0, loop.time() - started - self.interval))
+
+    def _watch(self):
+        reported_beat = None
+        while not self._stop.wait(self.threshold / 2):
+            last_beat = self._last_beat
+            stalled = time.monotonic() - last_beat - self.interval
+            # Одна блокировка фиксируется один раз, даже если длится несколько проверок
+            if stalled < self.threshold or last_beat == reported_beat:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            reported_beat = last_beat
+            offender = _offender(frame)
+            stack = "".join(traceback.format_stack(frame))
+            self.offenders[offender] += 1
+            EVENT_LOOP_BLOCKS.labels(offender=offender).inc()
+            if settings.watchdog_debug:
+                self.stacks.append(stack)
+            logger.warning("Event loop заблокирован дольше %.0f мс в %s\n%s",
+                           self.threshold * 1000, offender, stack)
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        if settings.watchdog_debug:
+            # asyncio сам сообщит о колбэках дольше порога
+            loop.set_debug(True)
+            loop.slow_callback_duration = self.threshold
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat(), name="loop-watchdog")
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread is not None:
+            await asyncio.to_thread(self._thread.join)
+            self._thread = None
+
+
+loop_watchdog = LoopWatchdog()
+
+
+@asynccontextmanager
+async def assert_no_blocking(watchdog: Optional[LoopWatchdog] = None):
+    """
+    Для тестов: падает, если внутри блока event loop блокировался дольше порога.
+
+        async with assert_no_blocking():
+            await client.post("/auth/login", json=...)
+    """
+    watchdog = watchdog or loop_watchdog
+    started_here = watchdog._task is None
+    if started_here:
+        watchdog.start()
+    before = sum(watchdog.offenders.values())
+    stacks_before = len(watchdog.stacks)
+    try:
+        yield watchdog
+        # Даем потоку-наблюдателю завершить последнюю проверку
+        await asyncio.sleep(watchdog.threshold)
+    finally:
+        if started_here:
+            await watchdog.stop()
+    blocked = sum(watchdog.offenders.values()) - before
+    assert blocked == 0, (
+        f"Event loop блокировался {blocked} раз(а): {dict(watchdog.offenders)}\n"
+        + "\n".join(watchdog.stacks[stacks_before:])
+    )
@@ -0,0 +1,157 @@
+"""
+Проверка всех эндпоинтов под параллельной нагрузкой (например, за PgBouncer).
+
+    docker compose --profile pgbouncer up -d     # приложение с DB_PGBOUNCER=true
+    python benchmarks/concurrency_smoke.py --url http://localhost:8000
+    python benchmarks/concurrency_smoke.py --rounds 50 --concurrency 200
+
+Каждый раунд запускает все сценарии одновременно; чтения и записи идут
+вперемешку через одни и те же соединения пула. Сценарии с записью работают
+со своими компаниями и сотрудниками и удаляют созданные компании.
+Провал - любой ответ 5xx, неожиданный код или эндпоинт, ни разу не
+ответивший успехом. 429 от ограничителя частоты провалом не считается,
+для полной нагрузки лимиты стоит поднять:
+RATE_LIMITS=login_ip=100000/60,login_user=100000/60,write_ip=100000/60
+
+Не проверяются /magic/delete_create_all (пересоздает все таблицы)
+и /magic/profile (блокирует воркер на время профилирования).
+"""
+import argparse
+import asyncio
+import sys
+import uuid
+from collections import Counter, defaultdict
+
+import httpx
+
+RATE_LIMITED = 429
+
+
+class Smoke:
+    def __init__(self, client: httpx.AsyncClient, token: str, concurrency: int):
+        self.client = client
+        self.token = token
+        self.semaphore = asyncio.Semaphore(concurrency)
+        # эндпоинт -> Counter кодов ответа
+        self.statuses = defaultdict(Counter)
+        self.failures = []
+
+    async def call(self, name: str, method: str, url: str, expected, **kwargs):
+        async with self.semaphore:
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except httpx.HTTPError as e:
+                self.statuses[name]["error"] += 1
+                self.failures.append(f"{name}: {e!r}")
+                return None
+        self.statuses[name][response.status_code] += 1
+        if response.status_code not in expected and response.status_code != RATE_LIMITED:
+            self.failures.append(f"{name}: {response.status_code} {response.text[:200]}")
+        return response if response.status_code in expected else None
+
+    def admin(self):
+        return {"client_token": self.token}
+
+    async def reads(self, company_id: int, employee_id: int):
+        await asyncio.gather(
+            self.call("GET /health", "GET", "/health", {200}),
+            self.call("GET /metrics", "GET", "/metrics", {200}),
+            self.call("GET /company/list", "GET", "/company/list", {200}),
+            self.call("GET /company/list?include", "GET", "/company/list",
+                      {200}, params={"include": "employee_count", "limit": 10}),
+            self.call("GET /company/stats", "GET", "/company/stats", {200}),
+            self.call("GET /company/{id}", "GET", f"/company/{company_id}", {200}),
+            self.call("GET /company/{id}?include", "GET", f"/company/{company_id}",
+                      {200}, params={"include": "employees"}),
+            self.call("GET /employee/list/{id}", "GET", f"/employee/list/{company_id}", {200}),
+            self.call("GET /employee/info/{id}", "GET", f"/employee/info/{employee_id}", {200}),
+        )
+
+    async def writes(self):
+        """Полный цикл записи: компания, сотрудник, изменения, удаление."""
+        response = await self.call("POST /company/create", "POST", "/company/create", {201},
+                                   json={"name": f"smoke {uuid.uuid4().hex[:8]}", "description": "smoke"},
+                                   headers={"Idempotency-Key": str(uuid.uuid4())})
+        if response is None:
+            return
+        company_id = response.json()["id"]
+        response = await self.call("POST /employee/create", "POST", "/employee/create", {200},
+                                   json={"first_name": "Smoke", "last_name": "Test", "company_id": company_id,
+                                         "phone": "+79000000000", "email": "smoke@example.com"})
+        if response is not None:
+            await self.call("PATCH /employee/change/{id}", "PATCH", f"/employee/change/{response.json()['id']}",
+                            {200, 202}, params=self.admin(), json={"last_name": "Changed", "is_active": False})
+        await asyncio.gather(
+            self.call("PATCH /company/update/{id}", "PATCH", f"/company/update/{company_id}", {202},
+                      params=self.admin(), json={"name": "smoke updated", "description": "smoke"}),
+            self.call("PATCH /company/status_update/{id}", "PATCH", f"/company/status_update/{company_id}",
+                      {202}, params=self.admin(), json={"is_active": False}),
+        )
+        await self.call("DELETE /company/{id}", "DELETE", f"/company/{company_id}", {200}, params=self.admin())
+
+    async def login(self, username: str, password: str):
+        await self.call("POST /auth/login", "POST", "/auth/login", {200},
+                        json={"username": username, "password": password})
+
+
+async def prepare(client: httpx.AsyncClient):
+    """Компания с сотрудником для сценариев чтения."""
+    response = await client.post("/company/create", json={"name": "smoke readers", "description": "smoke"})
+    response.raise_for_status()
+    company_id = response.json()["id"]
+    response = await client.post("/employee/create", json={
+        "first_name": "Reader", "last_name": "Smoke", "company_id": company_id, "phone": "+79000000000",
+    })
+    response.raise_for_status()
+    return company_id, response.json()["id"]
+
+
+async def run(args) -> int:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        response = await client.post("/auth/login", json={"username": args.user, "password": args.password})
+        response.raise_for_status()
+        token = response.json()["user_token"]
+        company_id, employee_id = await prepare(client)
+
+        smoke = Smoke(client, token, args.concurrency)
+        try:
+            for _ in range(args.rounds):
+                await asyncio.gather(
+                    *(smoke.reads(company_id, employee_id) for _ in range(args.readers)),
+                    *(smoke.writes() for _ in range(args.writers)),
+                    smoke.login(args.user, args.password),
+                )
+        finally:
+            await client.delete(f"/company/{company_id}", params={"client_token": token})
+
+    for name, counter in sorted(smoke.statuses.items()):
+        codes = ", ".join(f"{code}: {count}" for code, count in sorted(counter.items(), key=str))
+        print(f"{name:<40} {codes}")
+        if not any(isinstance(code, int) and code < 300 for code in counter):
+            smoke.failures.append(f"{name}: ни одного успешного ответа")
+
+    if smoke.failures:
+        print(f"\nОшибок: {len(smoke.failures)}")
+        for failure in smoke.failures[:20]:
+            print(f"  {failure}")
+        return 1
+    print("\nВсе эндпоинты отвечают корректно")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--user", default="harrypotter", help="администратор из тестовых данных")
+    parser.add_argument("--password", default="expelliarmus")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--readers", type=int, default=20, help="сценариев чтения в раунде")
+    parser.add_argument("--writers", type=int, default=5, help="сценариев записи в раунде")
+    parser.add_argument("--concurrency", type=int, default=100, help="одновременных запросов")
+    parser.add_argument("--timeout", type=float, default=30)
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
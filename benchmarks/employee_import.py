@@ -0,0 +1,113 @@
+"""
+Массовое добавление сотрудников: по строке через crud.create_employee
+(как N вызовов /employee/create) против импорта файла (app.employee.importer).
+
+    python benchmarks/employee_import.py                    # 50 000 строк, 2 000 по одной
+    python benchmarks/employee_import.py --rows 100000 --single 1000 --batch 10000
+
+Генерируется CSV на --rows строк, каждая 50-я с ошибкой (неверный email).
+Построчный путь прогоняется на первых --single строках - он в десятки раз
+медленнее, строк/с сравниваются напрямую. Пик памяти импорта (tracemalloc,
+отдельным прогоном) ограничен размером пакета --batch и почти не зависит от --rows.
+
+Все выполняется в одной транзакции и откатывается в конце: коммиты
+create_employee становятся точками сохранения, поэтому построчный путь здесь
+даже немного быстрее, чем с настоящими коммитами. Нужна БД из DB_URI
+с примененными миграциями.
+"""
+import argparse
+import asyncio
+import csv
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import insert  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+
+from app.company.schemas import CompanyTable  # noqa: E402
+from app.container import container  # noqa: E402
+from app.employee.crud import create_employee  # noqa: E402
+from app.employee.importer import IMPORT_FIELDS, import_employees  # noqa: E402
+from app.employee.schemas import EmployeeCreate  # noqa: E402
+from app.utils.spreadsheet import SpreadsheetReader  # noqa: E402
+
+
+def write_csv(path: str, rows: int, company_id: int):
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file, delimiter=";")
+        writer.writerow(IMPORT_FIELDS)
+        for i in range(rows):
+            email = f"user{i}@example" if i % 50 == 49 else f"user{i}@example.com"
+            writer.writerow([f"Имя{i}", f"Фамилия{i}", "Отчество", company_id, email,
+                             f"+7900{i:07d}", "1990-01-01", "true"])
+
+
+async def run_single(db: AsyncSession, path: str, limit: int) -> float:
+    with SpreadsheetReader(path, "csv") as reader:
+        employees = []
+        for _, values in reader:
+            if len(employees) == limit:
+                break
+            if not values["email"].endswith(".com"):
+                continue
+            employees.append(EmployeeCreate.model_validate(values))
+    started = time.perf_counter()
+    for employee in employees:
+        await create_employee(db, employee)
+    return len(employees) / (time.perf_counter() - started)
+
+
+async def run(rows: int, single: int, batch: int):
+    path = os.path.join(tempfile.mkdtemp(), "employees.csv")
+    async with container.engine.connect() as conn:
+        transaction = await conn.begin()
+        try:
+            db = AsyncSession(bind=conn, expire_on_commit=False, join_transaction_mode="create_savepoint")
+            company_id = (await db.execute(
+                insert(CompanyTable).values(name="benchmark", is_active=True).returning(CompanyTable.id)
+            )).scalar_one()
+            await db.commit()
+            write_csv(path, rows, company_id)
+            print(f"Файл: {rows} строк, {os.path.getsize(path) / 2**20:.1f} МБ")
+
+            per_row = await run_single(db, path, single)
+            print(f"{'create_employee по строке':>26}: {per_row:10.0f} строк/с ({single} строк)")
+
+            with SpreadsheetReader(path, "csv") as reader:
+                result = await import_employees(db, reader, path + ".errors.csv", batch)
+            # Откат к точке сохранения: второй прогон снова создает промежуточную таблицу
+            await db.rollback()
+            # Память - отдельным прогоном: tracemalloc замедляет Python в разы
+            tracemalloc.start()
+            with SpreadsheetReader(path, "csv") as reader:
+                await import_employees(db, reader, path + ".errors.csv", batch)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            await db.rollback()
+            print(f"{'импорт файла':>26}: {result.rows_per_second:10.0f} строк/с "
+                  f"(добавлено {result.imported}, с ошибками {result.failed}, {result.seconds:.2f} с, "
+                  f"пик памяти {peak / 2**20:.1f} МБ)")
+            print(f"\nУскорение: x{result.rows_per_second / per_row:.0f}")
+            await db.close()
+        finally:
+            await transaction.rollback()
+    await container.engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--single", type=int, default=2_000)
+    parser.add_argument("--batch", type=int, default=5_000)
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.single, args.batch))
+
+
+if __name__ == "__main__":
+    main()
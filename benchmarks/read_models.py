@@ -0,0 +1,98 @@
+"""
+Чтение большого списка сотрудников: ORM-объекты EmployeeTable против EmployeeRead.
+
+    python benchmarks/read_models.py               # 100 000 строк, 5 повторов
+    python benchmarks/read_models.py --rows 20000 --repeat 3
+
+Строки вставляются во временную транзакцию и откатываются в конце,
+данные в БД не меняются. Нужна БД из настроек (DB_URI) с примененными миграциями.
+Время - лучшее из повторов, память - пик tracemalloc при построении списка.
+"""
+import argparse
+import asyncio
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from itertools import starmap
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import insert, select  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+
+from app.company.schemas import CompanyTable  # noqa: E402
+from app.container import container  # noqa: E402
+from app.employee.schemas import EMPLOYEE_READ_COLUMNS, EmployeeRead, EmployeeTable  # noqa: E402
+
+
+async def read_orm(db: AsyncSession, company_id: int):
+    result = await db.execute(select(EmployeeTable).where(EmployeeTable.company_id == company_id))
+    employees = result.scalars().all()
+    # Объекты живут в identity map до конца сессии - очищаем, чтобы повторы были независимы
+    db.expunge_all()
+    return employees
+
+
+async def read_core(db: AsyncSession, company_id: int):
+    result = await db.execute(select(*EMPLOYEE_READ_COLUMNS).where(EmployeeTable.company_id == company_id))
+    return list(starmap(EmployeeRead, result.tuples()))
+
+
+async def measure(db: AsyncSession, read, company_id: int, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        rows = await read(db, company_id)
+        best = min(best, time.perf_counter() - started)
+        del rows
+
+    gc.collect()
+    tracemalloc.start()
+    rows = await read(db, company_id)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, len(rows)
+
+
+async def run(rows: int, repeat: int):
+    async with container.engine.connect() as conn:
+        transaction = await conn.begin()
+        try:
+            db = AsyncSession(bind=conn, expire_on_commit=False)
+            company_id = (await db.execute(
+                insert(CompanyTable).values(name="benchmark", is_active=True).returning(CompanyTable.id)
+            )).scalar_one()
+            await db.execute(insert(EmployeeTable), [
+                {"first_name": f"Имя{i}", "last_name": f"Фамилия{i}", "middle_name": None,
+                 "phone": "+79000000000", "email": f"user{i}@example.com", "company_id": company_id}
+                for i in range(rows)
+            ])
+
+            print(f"{'':>14} {'время, мс':>10} {'строк/с':>10} {'пик памяти, МБ':>15}")
+            results = {}
+            for name, read in (("EmployeeTable", read_orm), ("EmployeeRead", read_core)):
+                seconds, peak, count = await measure(db, read, company_id, repeat)
+                results[name] = (seconds, peak)
+                print(f"{name:>14} {seconds * 1000:10.0f} {count / seconds:10.0f} {peak / 2**20:15.1f}")
+            orm, core = results["EmployeeTable"], results["EmployeeRead"]
+            print(f"\nУскорение: x{orm[0] / core[0]:.1f}, память: x{orm[1] / core[1]:.1f} меньше")
+            await db.close()
+        finally:
+            await transaction.rollback()
+    await container.engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.rows, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
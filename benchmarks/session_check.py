@@ -0,0 +1,81 @@
+"""
+Цена проверки сессии на каждый запрос с токеном (decode_access_token).
+
+    python benchmarks/session_check.py
+    python benchmarks/session_check.py --checks 50000 --concurrency 50
+
+Сравниваются:
+- только подпись JWT - как было до сессий, отозвать токен нельзя;
+- подпись + EXISTS session:{jti} в Redis на каждый запрос (кеш отключен);
+- подпись + локальный кеш процесса (SESSION_CACHE_TTL), Redis - раз в TTL.
+
+Проверки идут пачками по --concurrency одновременно, как запросы в воркере;
+время - лучшее из --repeat прогонов.
+Нужен Redis из настроек (REDIS_HOST, REDIS_PORT); создается одна сессия,
+в конце удаляется.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import jwt  # noqa: E402
+
+from app.auth import sessions  # noqa: E402
+from app.auth.jwt import ALGORITHM, create_access_token, decode_access_token  # noqa: E402
+from app.settings import settings  # noqa: E402
+from app.utils.radis import close_redis  # noqa: E402
+
+
+async def signature_only(token: str):
+    jwt.decode(token, settings.secret_key, algorithms=[ALGORITHM])
+
+
+async def measure(check, token: str, checks: int, concurrency: int) -> float:
+    started = time.perf_counter()
+    for _ in range(checks // concurrency):
+        await asyncio.gather(*(check(token) for _ in range(concurrency)))
+    return (time.perf_counter() - started) / checks
+
+
+async def run(checks: int, concurrency: int, repeat: int):
+    login = f"benchmark-{uuid.uuid4().hex[:8]}"
+    session_id = uuid.uuid4().hex
+    token = create_access_token(data={"sub": login, "role": "admin", "jti": session_id})
+    await sessions.create_session(login, session_id, ttl=600)
+    try:
+        print(f"{'':>22} {'мкс/проверка':>13} {'проверок/с':>11}")
+        results = {}
+        for name, ttl in (("только подпись", None), ("Redis на каждый", 0), ("локальный кеш", 30)):
+            if ttl is not None:
+                sessions.session_cache.ttl = ttl
+                sessions.session_cache.clear()
+            check = signature_only if ttl is None else decode_access_token
+            await measure(check, token, concurrency * 10, concurrency)  # прогрев
+            seconds = min([await measure(check, token, checks, concurrency) for _ in range(repeat)])
+            results[name] = seconds
+            print(f"{name:>22} {seconds * 1e6:13.1f} {1 / seconds:11.0f}")
+        base = results["только подпись"]
+        print(f"\nНакладные расходы: Redis на каждый +{(results['Redis на каждый'] - base) * 1e6:.1f} мкс, "
+              f"с кешем +{(results['локальный кеш'] - base) * 1e6:.1f} мкс на запрос")
+    finally:
+        await sessions.revoke_all_sessions(login)
+        await close_redis()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--checks", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(run(args.checks, args.concurrency, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Бюджет холодного старта: время импорта app.main и запуска lifespan.
+
+    python benchmarks/startup.py                    # отчет по импорту
+    python benchmarks/startup.py --budget-ms 1500   # код возврата 1 при превышении
+    python benchmarks/startup.py --lifespan         # плюс запуск lifespan (нужны БД и Redis)
+
+Импорт замеряется в отдельном процессе через python -X importtime,
+чтобы модули, уже загруженные этим скриптом, не искажали результат.
+"""
+import argparse
+import asyncio
+import os
+import re
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def import_report(top: int):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        sys.exit(proc.stderr.strip().splitlines()[-1])
+
+    modules = []
+    for line in proc.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    total_ms = next(cumulative for name, _, cumulative, _ in modules if name == "app.main") / 1000
+
+    # Самые тяжелые пакеты верхнего уровня (по накопленному времени) и модули приложения
+    roots = sorted((m for m in modules if m[3] <= 1), key=lambda m: m[2], reverse=True)
+    print(f"Импорт app.main: {total_ms:.0f} мс\n")
+    print(f"{'накоплено, мс':>14} {'свое, мс':>10}  модуль")
+    for name, self_us, cumulative_us, _ in roots[:top]:
+        print(f"{cumulative_us / 1000:14.1f} {self_us / 1000:10.1f}  {name}")
+    own = sorted((m for m in modules if m[0].startswith("app.")), key=lambda m: m[1], reverse=True)
+    print("\nСобственное время модулей приложения:")
+    for name, self_us, _, _ in own[:top]:
+        print(f"{self_us / 1000:14.1f}  {name}")
+    return total_ms
+
+
+async def lifespan_ms() -> float:
+    sys.path.insert(0, ROOT)
+    from app.main import app, lifespan
+
+    started = time.perf_counter()
+    async with lifespan(app):
+        return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=None, help="бюджет на импорт app.main")
+    parser.add_argument("--lifespan", action="store_true", help="замерить и запуск lifespan")
+    args = parser.parse_args()
+
+    total_ms = import_report(args.top)
+    if args.lifespan:
+        print(f"\nЗапуск lifespan: {asyncio.run(lifespan_ms()):.0f} мс")
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"\nБюджет импорта превышен: {total_ms:.0f} > {args.budget_ms:.0f} мс")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Стоимость частых запросов: обычный select(...) против lambda_stmt и кеша
+подготовленных выражений asyncpg.
+
+    python benchmarks/statement_cache.py
+    python benchmarks/statement_cache.py --build 20000 --execute 2000
+
+Построение - создание выражения и вычисление ключа кеша компиляции,
+то есть работа Python до обращения к БД на каждый запрос.
+Выполнение - полный круг через соединение: "до" - select(...) с настройками
+движка по умолчанию, "после" - lambda_stmt с кешами из настроек
+(DB_QUERY_CACHE_SIZE, DB_PREPARED_STATEMENT_CACHE_SIZE). Для сравнения -
+select(...) без подготовленных выражений (prepared_statement_cache_size=0), как
+за PgBouncer. Нужна БД из DB_URI с тестовыми данными.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import lambda_stmt, select  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+
+from app.company.schemas import COMPANY_READ_COLUMNS, CompanyTable  # noqa: E402
+from app.employee.schemas import EMPLOYEE_READ_COLUMNS, EmployeeTable  # noqa: E402
+from app.settings import settings  # noqa: E402
+from app.users.schemas import UserTable  # noqa: E402
+
+
+def company_by_id(company_id=1):
+    return select(*COMPANY_READ_COLUMNS).where(CompanyTable.id == company_id)
+
+
+def company_by_id_lambda(company_id=1):
+    return lambda_stmt(lambda: select(*COMPANY_READ_COLUMNS).where(CompanyTable.id == company_id))
+
+
+def companies(active_only=True, limit=100, offset=0):
+    query = select(*COMPANY_READ_COLUMNS).order_by(CompanyTable.id).limit(limit).offset(offset)
+    return query.where(CompanyTable.is_active == active_only)
+
+
+def companies_lambda(active_only=True, limit=100, offset=0):
+    query = lambda_stmt(lambda: select(*COMPANY_READ_COLUMNS).order_by(CompanyTable.id))
+    query += lambda q: q.where(CompanyTable.is_active == active_only)
+    query += lambda q: q.limit(limit).offset(offset)
+    return query
+
+
+def employees_by_company(company_id=2):
+    return select(*EMPLOYEE_READ_COLUMNS).where(EmployeeTable.company_id == company_id)
+
+
+def employees_by_company_lambda(company_id=2):
+    return lambda_stmt(lambda: select(*EMPLOYEE_READ_COLUMNS).where(EmployeeTable.company_id == company_id))
+
+
+def user_by_login(login="admin"):
+    return select(UserTable).where(UserTable.login == login)
+
+
+def user_by_login_lambda(login="admin"):
+    return lambda_stmt(lambda: select(UserTable).where(UserTable.login == login))
+
+
+QUERIES = [
+    ("компания по ID", company_by_id, company_by_id_lambda),
+    ("список компаний", companies, companies_lambda),
+    ("сотрудники компании", employees_by_company, employees_by_company_lambda),
+    ("пользователь по логину", user_by_login, user_by_login_lambda),
+]
+
+
+def build_us(factory, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        factory()._generate_cache_key()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+async def execute_us(engine, factory, iterations: int) -> float:
+    async with engine.connect() as conn:
+        # Прогрев: компиляция и подготовка выражения не входят в замер
+        await conn.execute(factory())
+        started = time.perf_counter()
+        for _ in range(iterations):
+            (await conn.execute(factory())).all()
+        return (time.perf_counter() - started) / iterations * 1e6
+
+
+async def run(build_iterations: int, execute_iterations: int):
+    unprepared = create_async_engine(settings.db_uri, connect_args={"prepared_statement_cache_size": 0})
+    before = create_async_engine(settings.db_uri)
+    after = create_async_engine(
+        settings.db_uri,
+        query_cache_size=settings.db_query_cache_size,
+        connect_args={"prepared_statement_cache_size": settings.db_prepared_statement_cache_size},
+    )
+    print(f"{'':>24} {'построение, мкс':>24} {'выполнение, мкс':>36}")
+    print(f"{'запрос':>24} {'select':>11} {'lambda':>12} {'без кеша':>11} {'до':>12} {'после':>12}")
+    try:
+        for name, plain, cached in QUERIES:
+            build_plain, build_cached = build_us(plain, build_iterations), build_us(cached, build_iterations)
+            execute_unprepared = await execute_us(unprepared, plain, execute_iterations)
+            execute_plain = await execute_us(before, plain, execute_iterations)
+            execute_cached = await execute_us(after, cached, execute_iterations)
+            print(f"{name:>24} {build_plain:11.1f} {build_cached:12.1f} "
+                  f"{execute_unprepared:11.0f} {execute_plain:12.0f} {execute_cached:12.0f}")
+    finally:
+        await unprepared.dispose()
+        await before.dispose()
+        await after.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--build", type=int, default=20_000, help="повторов построения")
+    parser.add_argument("--execute", type=int, default=2_000, help="повторов выполнения")
+    args = parser.parse_args()
+    asyncio.run(run(args.build, args.execute))
+
+
+if __name__ == "__main__":
+    main()
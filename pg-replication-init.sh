@@ -0,0 +1,5 @@
+#!/bin/bash
+# Разрешает потоковую репликацию для реплики из docker compose --profile replica.
+# Выполняется образом postgres только при создании нового тома с данными.
+set -e
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"
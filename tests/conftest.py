@@ -0,0 +1,44 @@
+"""
+Общие фикстуры тестов.
+
+Тесты с БД используют DB_URI (как приложение) и пропускаются, если база
+недоступна. Каждый тест работает в транзакции, которая откатывается в конце:
+коммиты кода приложения становятся точками сохранения.
+"""
+import os
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+
+from app.settings import settings  # noqa: E402
+from app.utils.query_profiler import install_query_profiler  # noqa: E402
+
+
+@pytest.fixture
+async def engine():
+    engine = create_async_engine(settings.db_uri)
+    install_query_profiler(engine)
+    try:
+        async with engine.connect():
+            pass
+    except Exception as e:
+        await engine.dispose()
+        pytest.skip(f"БД из DB_URI недоступна: {e!r}")
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+async def db(engine):
+    async with engine.connect() as conn:
+        transaction = await conn.begin()
+        session = AsyncSession(bind=conn, expire_on_commit=False, join_transaction_mode="create_savepoint")
+        # Точка сохранения сессии создается сразу, а не первым выражением теста
+        await session.connection()
+        try:
+            yield session
+        finally:
+            await session.close()
+            await transaction.rollback()
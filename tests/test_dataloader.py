@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from app.utils.dataloader import DataLoader
+
+
+async def test_loads_in_one_batch():
+    calls = []
+
+    async def batch(keys):
+        calls.append(keys)
+        return {key: key * 10 for key in keys if key != 3}
+
+    loader = DataLoader(batch)
+    assert await loader.load_many([1, 2, 3, 1]) == [10, 20, None, 10]
+    assert calls == [[1, 2, 3]]
+
+
+async def test_shared_lock_serializes_batches():
+    lock = asyncio.Lock()
+    running = 0
+    overlapped = False
+
+    async def batch(keys):
+        nonlocal running, overlapped
+        running += 1
+        overlapped = overlapped or running > 1
+        await asyncio.sleep(0.01)
+        running -= 1
+        return {key: key for key in keys}
+
+    first, second = DataLoader(batch, lock), DataLoader(batch, lock)
+    assert await asyncio.gather(first.load(1), second.load(2)) == [1, 2]
+    assert not overlapped
+
+
+async def test_error_is_not_cached():
+    attempts = 0
+
+    async def batch(keys):
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise RuntimeError("БД недоступна")
+        return {key: key for key in keys}
+
+    loader = DataLoader(batch)
+    with pytest.raises(RuntimeError):
+        await loader.load(1)
+    assert await loader.load(1) == 1
+
+
+async def test_cancelled_dispatch_cancels_waiters():
+    started = asyncio.Event()
+
+    async def batch(keys):
+        started.set()
+        await asyncio.sleep(10)
+
+    loader = DataLoader(batch)
+    future = loader.load(1)
+    await started.wait()
+    for task in list(loader._tasks):
+        task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await future
+    assert 1 not in loader._cache
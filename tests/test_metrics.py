@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+
+from app.utils.metrics import MULTIPROC_ENV
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER = """
+import sys
+from app.utils.metrics import SINGLEFLIGHT_SHARED, mark_process_dead
+from app.utils.radis import REDIS_POOL_MAX
+SINGLEFLIGHT_SHARED.labels("test").inc(2)
+REDIS_POOL_MAX.set(50)
+if sys.argv[1] == "stopped":
+    mark_process_dead()
+"""
+
+SCRAPE = """
+import asyncio
+from app.utils.metrics import metrics_endpoint
+print(asyncio.run(metrics_endpoint(None)).body.decode())
+"""
+
+
+def _run(code: str, env: dict, *args: str) -> str:
+    return subprocess.run([sys.executable, "-c", code, *args], cwd=ROOT, env=env,
+                          check=True, capture_output=True, text=True).stdout
+
+
+def test_metrics_summed_across_workers(tmp_path):
+    # Как при uvicorn --workers: каждый процесс пишет в общий каталог, /metrics отдает сумму
+    env = {**os.environ, MULTIPROC_ENV: str(tmp_path)}
+    _run(WORKER, env, "running")
+    _run(WORKER, env, "stopped")
+
+    output = _run(SCRAPE, env)
+    assert 'singleflight_shared_total{function="test"} 4.0' in output
+    # Пул Redis считается только по живым процессам: остановленный воркер снят mark_process_dead
+    assert "redis_pool_max_connections 50.0" in output
@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.container import Container
+from app.outbox.schemas import OutboxTable
+from app.outbox.worker import OutboxWorker
+
+
+async def test_delete_processed_keeps_recent_pending_and_failed(db, monkeypatch):
+    # Сессии воркера работают в транзакции теста: их коммиты - точки сохранения
+    factory = async_sessionmaker(bind=db.bind, class_=AsyncSession, expire_on_commit=False,
+                                 join_transaction_mode="create_savepoint")
+    monkeypatch.setattr(Container, "session_factory", property(lambda self: factory))
+
+    now = datetime.now(timezone.utc)
+    old = now - timedelta(days=30)
+    events = {
+        "old_processed": dict(processed_at=old),
+        "recent_processed": dict(processed_at=now),
+        "old_pending": dict(create_timestamp=old),
+        "old_failed": dict(failed_at=old),
+    }
+    for name, fields in events.items():
+        db.add(OutboxTable(event_type=name, aggregate_type="test", aggregate_id=1, **fields))
+    db.add_all(OutboxTable(event_type="old_processed", aggregate_type="test", aggregate_id=1, processed_at=old)
+               for _ in range(4))
+    await db.flush()
+
+    # Пачки по 2: пять старых обработанных событий удаляются за три транзакции
+    deleted = await OutboxWorker().delete_processed(retention=86400, batch_size=2)
+
+    assert deleted == 5
+    left = (await db.execute(select(OutboxTable.event_type).where(OutboxTable.aggregate_type == "test"))).scalars()
+    assert sorted(left) == ["old_failed", "old_pending", "recent_processed"]
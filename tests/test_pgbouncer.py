@@ -0,0 +1,111 @@
+"""
+Все эндпоинты под параллельной нагрузкой за PgBouncer в режиме transaction.
+
+    PGBOUNCER_TESTS=1 python -m pytest tests/test_pgbouncer.py
+
+Поднимает db, pgbouncer и redis из docker compose (профиль pgbouncer),
+применяет миграции мимо пула (DB_DIRECT_URI) и запускает приложение
+(python -m app.server, два воркера) с DB_PGBOUNCER=true и DB_URI через
+PgBouncer. Затем гоняет сценарии benchmarks/concurrency_smoke.py: чтения,
+записи и входы одновременно через одни и те же серверные соединения.
+Нужны docker и ".env" проекта (DB_NAME, DB_USER, DB_PASSWORD, DB_PORT, REDIS_PORT).
+"""
+import argparse
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+from dotenv import dotenv_values
+
+from benchmarks import concurrency_smoke
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMPOSE = ["docker", "compose", "--profile", "pgbouncer"]
+STARTUP_TIMEOUT = 120
+
+pytestmark = pytest.mark.skipif(
+    not os.environ.get("PGBOUNCER_TESTS") or shutil.which("docker") is None,
+    reason="нужны docker и PGBOUNCER_TESTS=1",
+)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait(check, what: str):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    error = None
+    while True:
+        try:
+            if check():
+                return
+        except (httpx.HTTPError, subprocess.CalledProcessError) as e:
+            error = e
+        if time.monotonic() > deadline:
+            details = getattr(error, "stderr", None) or error
+            pytest.fail(f"Не дождались: {what}. Последняя ошибка: {details}")
+        time.sleep(1)
+
+
+@pytest.fixture(scope="module")
+def pgbouncer_app():
+    env_file = {**dotenv_values(os.path.join(ROOT, ".env")), **os.environ}
+    credentials = f"{env_file['DB_USER']}:{env_file['DB_PASSWORD']}"
+    database = env_file["DB_NAME"]
+    port = _free_port()
+    env = {
+        **os.environ,
+        "DB_URI": f"postgresql+asyncpg://{credentials}@localhost:"
+                  f"{env_file.get('PGBOUNCER_PORT', 6432)}/{database}",
+        "DB_DIRECT_URI": f"postgresql+asyncpg://{credentials}@localhost:{env_file['DB_PORT']}/{database}",
+        "DB_PGBOUNCER": "true",
+        "DB_REPLICA_URIS": "",
+        "REDIS_HOST": "localhost",
+        "REDIS_PORT": str(env_file["REDIS_PORT"]),
+        "PORT": str(port),
+        "WEB_CONCURRENCY": "2",
+        "SEED_ON_STARTUP": "true",
+        # Нагрузка идет с одного IP: лимиты частоты не должны отсекать сценарии
+        "RATE_LIMITS": "login_ip=100000/60,login_user=100000/60,write_ip=100000/60",
+    }
+
+    subprocess.run([*COMPOSE, "up", "-d", "db", "pgbouncer", "redis"], cwd=ROOT, check=True)
+    # Первый запуск БД в контейнере занимает время: миграции повторяются, пока она не примет соединение
+    # Команда alembic из того же окружения: python -m alembic в корне проекта нашел бы каталог alembic/
+    migrate = [os.path.join(os.path.dirname(sys.executable), "alembic"), "upgrade", "head"]
+    _wait(lambda: subprocess.run(migrate, cwd=ROOT, env=env, check=True, capture_output=True, text=True), "миграции")
+
+    app = subprocess.Popen([sys.executable, "-m", "app.server"], cwd=ROOT, env=env)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        _wait(lambda: app.poll() is None and httpx.get(f"{url}/health").status_code == 200, "запуск приложения")
+        yield url
+    finally:
+        app.terminate()
+        app.wait(timeout=60)
+        subprocess.run([*COMPOSE, "stop", "pgbouncer"], cwd=ROOT, check=False)
+
+
+async def test_all_endpoints_under_concurrency(pgbouncer_app):
+    args = argparse.Namespace(
+        url=pgbouncer_app, user="harrypotter", password="expelliarmus",
+        rounds=10, readers=20, writers=5, concurrency=100, timeout=30,
+    )
+    assert await concurrency_smoke.run(args) == 0
+
+
+async def test_prepared_statements_across_transactions(pgbouncer_app):
+    # Одни и те же выражения из разных транзакций попадают на разные серверные соединения:
+    # без уникальных имен подготовленных выражений asyncpg падает на повторе
+    async with httpx.AsyncClient(base_url=pgbouncer_app, timeout=30) as client:
+        for _ in range(5):
+            responses = [await client.get("/company/list") for _ in range(20)]
+            assert [response.status_code for response in responses] == [200] * 20
@@ -0,0 +1,54 @@
+import pytest
+from sqlalchemy import insert, select, text
+from sqlalchemy.exc import DBAPIError
+
+from app.company import crud
+from app.company.schemas import CompanyTable
+from app.employee.schemas import EmployeeTable
+from app.settings import settings
+from app.utils.query_profiler import assert_max_queries, count_queries
+
+
+async def test_count_queries_counts_statements(db):
+    with count_queries() as stats:
+        await db.execute(text("SELECT 1"))
+        await db.execute(text("SELECT 2"))
+    assert stats.count == 2
+    assert stats.statements == ["SELECT 1", "SELECT 2"]
+    assert stats.total_ms > 0
+
+
+async def test_get_company_is_one_query(db):
+    company_id = await db.scalar(insert(CompanyTable).values(name="profiler").returning(CompanyTable.id))
+    with assert_max_queries(1):
+        company = await crud.get_company(db, company_id)
+    assert company.name == "profiler"
+
+
+async def test_assert_max_queries_catches_n_plus_one(db):
+    company_ids = [
+        await db.scalar(insert(CompanyTable).values(name=f"profiler-{i}").returning(CompanyTable.id))
+        for i in range(3)
+    ]
+    with pytest.raises(AssertionError, match="не более 1 SQL-запросов, выполнено 3"):
+        with assert_max_queries(1):
+            for company_id in company_ids:
+                await db.execute(select(EmployeeTable.id).where(EmployeeTable.company_id == company_id))
+
+
+async def test_failed_statement_does_not_break_profiling(db):
+    # Для упавшего выражения after_cursor_execute не вызывается
+    with count_queries() as stats:
+        with pytest.raises(DBAPIError):
+            async with db.begin_nested():
+                await db.execute(text("SELECT 1 / 0"))
+        await db.execute(text("SELECT 1"))
+    assert stats.statements[-1] == "SELECT 1"
+
+
+async def test_slow_query_records_executing_engine(db, engine, monkeypatch):
+    # EXPLAIN снимается с движка, выполнившего выражение (реплика или основная БД)
+    monkeypatch.setattr(settings, "slow_query_ms", 0)
+    with count_queries() as stats:
+        await db.execute(text("SELECT 1"))
+    assert [(slow.statement, slow.engine) for slow in stats.slow] == [("SELECT 1", engine)]
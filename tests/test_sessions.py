@@ -0,0 +1,34 @@
+from app.auth import sessions
+from app.auth.sessions import SessionCache
+
+
+class _RevokingRedis:
+    """EXISTS отвечает "есть", но пока ответ в пути, сессию отзывает другой процесс."""
+
+    def __init__(self, cache: SessionCache):
+        self.cache = cache
+
+    async def exists(self, key):
+        self.cache.discard(["jti-1"])  # сообщение SESSIONS_CHANNEL
+        return 1
+
+
+async def test_revocation_during_check_is_not_cached(monkeypatch):
+    cache = SessionCache(ttl=30, max_size=10)
+    monkeypatch.setattr(sessions, "session_cache", cache)
+
+    async def get_redis():
+        return _RevokingRedis(cache)
+
+    monkeypatch.setattr(sessions, "get_redis", get_redis)
+    assert await sessions.is_session_active("jti-1")
+    assert not cache.contains("jti-1")
+
+
+def test_cache_add_and_discard():
+    cache = SessionCache(ttl=30, max_size=2)
+    for jti in ("a", "b", "c"):
+        cache.add(jti, cache.revision)
+    assert not cache.contains("a") and cache.contains("b") and cache.contains("c")
+    cache.discard(["b"])
+    assert not cache.contains("b") and cache.contains("c")
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.utils.singleflight import SingleFlight
+
+
+async def test_concurrent_calls_share_result():
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"id": 1}
+
+    group = SingleFlight("test")
+    results = await asyncio.gather(*(group.do("key", load) for _ in range(5)))
+    assert calls == 1
+    assert results == [{"id": 1}] * 5
+
+
+async def test_followers_get_own_exception_copy():
+    async def load():
+        await asyncio.sleep(0.01)
+        raise HTTPException(status_code=404, detail="Компания не найдена")
+
+    group = SingleFlight("test")
+    errors = await asyncio.gather(*(group.do("key", load) for _ in range(3)), return_exceptions=True)
+    leader, *followers = errors
+    assert all(isinstance(error, HTTPException) for error in errors)
+    assert [(error.status_code, error.detail) for error in followers] == [(404, "Компания не найдена")] * 2
+    assert len({id(error) for error in errors}) == 3
+    assert all(error.__cause__ is leader for error in followers)
+
+
+async def test_cancelled_leader_is_replaced():
+    started = asyncio.Event()
+
+    async def slow():
+        started.set()
+        await asyncio.sleep(10)
+
+    async def fast():
+        return 42
+
+    group = SingleFlight("test")
+    leader = asyncio.create_task(group.do("key", slow))
+    await started.wait()
+    follower = asyncio.create_task(group.do("key", fast))
+    await asyncio.sleep(0)
+    leader.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    assert await follower == 42
@@ -0,0 +1,29 @@
+import asyncio
+import time
+
+import pytest
+
+from app.settings import settings
+from app.utils.watchdog import LoopWatchdog, assert_no_blocking
+
+
+@pytest.fixture
+def watchdog(monkeypatch):
+    monkeypatch.setattr(settings, "watchdog_debug", True)
+    return LoopWatchdog(interval=0.01, threshold=0.05)
+
+
+async def test_blocking_call_fails(watchdog):
+    with pytest.raises(AssertionError, match="Event loop блокировался 1 раз") as error:
+        async with assert_no_blocking(watchdog):
+            time.sleep(0.3)
+    # В отладочном режиме в сообщении есть стек блокирующего места
+    assert "time.sleep(0.3)" in str(error.value)
+    assert watchdog.offenders == {f"{__name__}:test_blocking_call_fails": 1}
+
+
+async def test_awaiting_does_not_fail(watchdog):
+    async with assert_no_blocking(watchdog):
+        await asyncio.sleep(0.3)
+        await asyncio.to_thread(time.sleep, 0.3)
+    assert not watchdog.offenders